@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+MCP Manager Startup Benchmark - cold-start time of mcp-manager subcommands
+
+Runs each subcommand many times, every time in a fresh Python process,
+against a generated configuration and a scratch MCP_MANAGER_HOME, and
+reports the wall time per subcommand. Nothing here starts an MCP server.
+
+  python3 scripts/bench-startup.py --output startup.json
+  python3 scripts/bench-startup.py --compare startup.json --threshold 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MANAGER = Path(__file__).resolve().with_name("mcp-manager.py")
+
+# label -> arguments (the config is added in front)
+COMMANDS = {
+    "help": ["--help"],
+    "list": ["list"],
+    "list --json": ["--json", "list"],
+    "list -v": ["list", "-v"],
+    "validate": ["validate"],
+    "registry": ["registry"],
+    "registry search": ["registry", "search", "browser"],
+    "backups list": ["backups", "list"],
+}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def write_config(path: Path, servers: int):
+    """A config in Claude's layout, with unrelated state around mcpServers"""
+    config = {
+        "numStartups": 42,
+        "projects": {f"/home/user/project-{i}": {"history": ["x" * 200] * 20} for i in range(50)},
+        "mcpServers": {
+            f"server-{i}": {"command": "npx", "args": ["-y", f"@example/server-{i}"],
+                            "env": {"API_TOKEN": "${API_TOKEN}"}}
+            for i in range(servers)
+        },
+    }
+    path.write_text(json.dumps(config, indent=2))
+
+def time_command(args, env, runs):
+    """Wall time in ms of each run; the first run is reported separately"""
+    samples = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        proc = subprocess.run(args, env=env, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        samples.append((time.perf_counter() - start) * 1000)
+        if proc.returncode not in (0, 1):
+            raise RuntimeError(f"{' '.join(args)} failed: {proc.stderr.decode().strip()}")
+    return {"first": samples[0], "p50": statistics.median(samples[1:]),
+            "p95": percentile(samples[1:], 95), "min": min(samples[1:]), "runs": runs}
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of mcp-manager subcommands")
+    parser.add_argument('commands', nargs='*', metavar='command',
+                        help=f'Subcommands to time (default: all of {", ".join(COMMANDS)})')
+    parser.add_argument('-n', '--runs', type=int, default=10,
+                        help='Timed runs per subcommand, after one untimed first run (default: 10)')
+    parser.add_argument('--servers', type=int, default=20,
+                        help='Servers in the generated config (default: 20)')
+    parser.add_argument('--output', metavar='FILE', help='Save the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='Compare p50 with saved results')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help='Percent slowdown that counts as a regression (default: 20)')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.commands if name not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown command(s): {', '.join(unknown)} (choose from: {', '.join(COMMANDS)})")
+    names = args.commands or list(COMMANDS)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json.load(f)["commands"]
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"cannot read {args.compare}: {e}")
+
+    with tempfile.TemporaryDirectory(prefix="mcp-startup-") as scratch:
+        config = Path(scratch) / "claude.json"
+        write_config(config, args.servers)
+        env = dict(os.environ, MCP_MANAGER_HOME=str(Path(scratch) / "home"),
+                   MCP_MANAGER_NO_DAEMON="1", MCP_REGISTRY_PATH="")
+
+        results = {"interpreter": time_command([sys.executable, "-c", "pass"], env, args.runs)}
+        for name in names:
+            cmd = [sys.executable, str(MANAGER), "--config", str(config)] + COMMANDS[name]
+            results[name] = time_command(cmd, env, args.runs)
+
+    width = max(len(name) for name in results)
+    print(f"{'Command':<{width}}  {'first':>8}  {'p50':>8}  {'p95':>8}  {'min':>8}  (ms)")
+    regressions = []
+    for name, stats in results.items():
+        line = (f"{name:<{width}}  {stats['first']:8.1f}  {stats['p50']:8.1f}  "
+                f"{stats['p95']:8.1f}  {stats['min']:8.1f}")
+        if baseline and name in baseline:
+            change = 100 * (stats["p50"] - baseline[name]["p50"]) / baseline[name]["p50"]
+            line += f"  {change:+6.1f}%"
+            if change > args.threshold and name != "interpreter":
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.output:
+        report = {
+            "version": 1,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "servers": args.servers,
+            "commands": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    if regressions:
+        print(f"\nSlower than {args.compare} by more than {args.threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
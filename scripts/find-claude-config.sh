@@ -22,40 +22,54 @@ CONFIG_PATHS=(
 )
 
 found=false
-
-# Check known locations
+found_paths=()
 for path in "${CONFIG_PATHS[@]}"; do
     if [ -f "$path" ]; then
-        echo -e "${GREEN}✓ Found: $path${NC}"
-        
-        # Show file info
-        size=$(du -h "$path" | cut -f1)
-        modified=$(date -r "$path" "+%Y-%m-%d %H:%M:%S" 2>/dev/null || stat -c "%y" "$path" 2>/dev/null | cut -d. -f1 || echo "unknown")
-        
-        echo "  Size: $size"
-        echo "  Modified: $modified"
-        
-        # Check if mcpServers configured
-        if command -v python3 >/dev/null 2>&1; then
-            server_count=$(python3 -c "
+        found_paths+=("$path")
+    fi
+done
+
+# Count mcpServers for every found file in a single python3 run instead of
+# starting one interpreter per file
+server_counts=()
+if [ ${#found_paths[@]} -gt 0 ] && command -v python3 >/dev/null 2>&1; then
+    while IFS= read -r count; do
+        server_counts+=("$count")
+    done < <(python3 - "${found_paths[@]}" <<'PY' 2>/dev/null
 import json
-try:
-    with open('$path', 'r') as f:
-        config = json.load(f)
-    servers = config.get('mcpServers', {})
-    print(len(servers))
-except:
-    print('?')
-" 2>/dev/null || echo "?")
-            
-            if [ "$server_count" != "?" ]; then
-                echo "  MCP Servers: $server_count"
-            fi
-        fi
-        
-        echo
-        found=true
+import sys
+
+for path in sys.argv[1:]:
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+        print(len(config.get('mcpServers', {})))
+    except Exception:
+        print('?')
+PY
+)
+fi
+
+# Show known locations
+i=0
+for path in ${found_paths[@]+"${found_paths[@]}"}; do
+    echo -e "${GREEN}✓ Found: $path${NC}"
+
+    # Show file info
+    size=$(du -h "$path" | cut -f1)
+    modified=$(date -r "$path" "+%Y-%m-%d %H:%M:%S" 2>/dev/null || stat -c "%y" "$path" 2>/dev/null | cut -d. -f1 || echo "unknown")
+
+    echo "  Size: $size"
+    echo "  Modified: $modified"
+
+    server_count="${server_counts[$i]:-?}"
+    if [ "$server_count" != "?" ]; then
+        echo "  MCP Servers: $server_count"
     fi
+
+    echo
+    found=true
+    i=$((i + 1))
 done
 
 # Search for other possible locations
@@ -111,4 +125,10 @@ done
 
 if [ $backup_count -eq 0 ]; then
     echo "No backup files found."
+fi
+
+backup_store="${MCP_MANAGER_HOME:-$HOME/.cache/mcp-manager}/backups"
+if [ -d "$backup_store/index" ] || [ -f "$backup_store/index.json" ]; then
+    echo -e "${BLUE}↻ mcp-manager backups: $backup_store${NC}"
+    echo "  Run 'python3 scripts/mcp-manager.py backups list' to see them"
 fi
\ No newline at end of file
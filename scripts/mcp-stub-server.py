@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+MCP Stub Server - A tiny stand-in MCP server for offline testing
+
+Speaks JSON-RPC over stdio like a real MCP server, with knobs to
+simulate slow startup, slow responses and hung servers. Use it to try
+out mcp-manager's probes without network access:
+
+  {"command": "python3", "args": ["scripts/mcp-stub-server.py", "--tools", "5"]}
+"""
+
+import json
+import sys
+import time
+import argparse
+
+PROTOCOL_VERSION = "2024-11-05"
+VERSION = "1.0.0"
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in MCP server for testing")
+    parser.add_argument('--version', action='version', version=f'mcp-stub-server {VERSION}')
+    parser.add_argument('--name', default='mcp-stub-server', help='Reported server name')
+    parser.add_argument('--tools', type=int, default=3, help='Number of tools to expose')
+    parser.add_argument('--startup-delay', type=float, default=0,
+                        help='Seconds to sleep before reading stdin')
+    parser.add_argument('--init-delay', type=float, default=0,
+                        help='Seconds to wait before answering initialize')
+    parser.add_argument('--call-delay', type=float, default=0,
+                        help='Seconds to wait before answering any other request')
+    parser.add_argument('--hang', action='store_true',
+                        help='Read requests but never answer them')
+    parser.add_argument('--crash-after', type=int, default=0,
+                        help='Exit with status 1 after this many requests')
+    args = parser.parse_args()
+    
+    time.sleep(args.startup_delay)
+    
+    tools = [{
+        "name": f"stub_tool_{i}",
+        "description": f"Stub tool number {i}",
+        "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}},
+    } for i in range(args.tools)]
+    
+    handled = 0
+    for line in sys.stdin:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if "id" not in message or "method" not in message:
+            continue  # notifications and responses need no answer
+        
+        handled += 1
+        if args.crash_after and handled > args.crash_after:
+            sys.stderr.write("stub server crashing on purpose\n")
+            sys.exit(1)
+        if args.hang:
+            continue
+        
+        method = message["method"]
+        if method == "initialize":
+            time.sleep(args.init_delay)
+            result = {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": args.name, "version": VERSION},
+            }
+        else:
+            time.sleep(args.call_delay)
+            if method == "ping":
+                result = {}
+            elif method == "tools/list":
+                result = {"tools": tools}
+            elif method == "tools/call":
+                params = message.get("params", {})
+                text = json.dumps(params.get("arguments", {}))
+                result = {"content": [{"type": "text", "text": f"{params.get('name')}: {text}"}]}
+            else:
+                reply = {"jsonrpc": "2.0", "id": message["id"],
+                         "error": {"code": -32601, "message": f"Method not found: {method}"}}
+                sys.stdout.write(json.dumps(reply) + "\n")
+                sys.stdout.flush()
+                continue
+        
+        sys.stdout.write(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": result}) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
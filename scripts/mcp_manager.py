@@ -0,0 +1,6788 @@
+#!/usr/bin/env python3
+"""
+MCP Manager - Advanced MCP Server Management for Claude
+
+This tool provides advanced management capabilities for MCP servers,
+including installation, configuration, testing, and troubleshooting.
+
+Run it through scripts/mcp-manager.py, which imports this module so that
+Python can reuse its compiled bytecode between runs.
+"""
+
+import json
+import os
+import re
+import sys
+import argparse
+import atexit
+import contextlib
+import io
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
+import time
+import collections
+
+# Everything else is imported where it is used, so that quick commands
+# like list don't pay for modules only probes, pools or backups need
+if TYPE_CHECKING:
+    import sqlite3
+    import subprocess
+    import threading
+    from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ANSI color codes
+class Colors:
+    RED = '\033[0;31m'
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    BLUE = '\033[0;34m'
+    MAGENTA = '\033[0;35m'
+    CYAN = '\033[0;36m'
+    NC = '\033[0m'  # No Color
+
+# Configuration paths
+CLAUDE_CONFIG_PATHS = [
+    Path.home() / ".claude.json",
+    Path.home() / ".config" / "claude" / "claude.json",
+    Path.home() / ".claude" / "claude.json",
+    Path.home() / "Library" / "Application Support" / "Claude" / "claude.json",
+]
+
+# mcp-manager state (package store, rewrite ledger, caches)
+MANAGER_HOME = Path(os.environ.get("MCP_MANAGER_HOME",
+                                   Path.home() / ".cache" / "mcp-manager"))
+MANAGER_SCRIPT = Path(__file__).resolve().with_name("mcp-manager.py")  # what config entries run
+PACKAGE_STORE = MANAGER_HOME / "packages"
+REWRITES_FILE = MANAGER_HOME / "rewrites.json"
+PARSE_CACHE_FILE = MANAGER_HOME / "parse-cache.json"
+PARSE_CACHE_ENTRIES = 16
+LOCK_TIMEOUT = 30
+BACKUP_DIR = MANAGER_HOME / "backups"
+BACKUP_KEEP_LAST = int(os.environ.get("MCP_MANAGER_BACKUP_KEEP_LAST", 10))
+BACKUP_KEEP_DAILY = int(os.environ.get("MCP_MANAGER_BACKUP_KEEP_DAILY", 7))
+BACKUP_GC_INTERVAL = 3600
+NPM_INSTALL_TIMEOUT = 300
+
+# Registry sources and search index
+REGISTRY_INDEX_FILE = MANAGER_HOME / "registry-index.sqlite"
+CATALOG_FILE = MANAGER_HOME / "catalog.json"
+CATALOG_TTL = float(os.environ.get("MCP_MANAGER_CATALOG_TTL", 7 * 86400))
+CATALOG_MAX_AGE = 90 * 86400
+HEALTH_FILE = MANAGER_HOME / "health.json"
+HEALTH_TTL = float(os.environ.get("MCP_MANAGER_HEALTH_TTL", 300))
+HEALTH_MAX_AGE = 7 * 86400
+REGISTRY_SUFFIXES = (".json", ".ndjson", ".jsonl")
+REGISTRY_FIELD_WEIGHTS = {"name": 5.0, "package": 3.0, "env_vars": 2.0, "description": 1.0}
+DEFAULT_SEARCH_LIMIT = 20
+
+# Resource sampling (Linux /proc)
+RESOURCE_SAMPLE_INTERVAL = 0.1
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# Manager daemon
+DAEMON_SOCKET = MANAGER_HOME / "manager.sock"
+DAEMON_POLL_INTERVAL = 1.0
+
+# Warm server pool
+POOL_SOCKET = MANAGER_HOME / "pool.sock"
+DEFAULT_POOL_MAX_SIZE = 16
+DEFAULT_POOL_IDLE_TIMEOUT = 600
+POOL_START_TIMEOUT = 60
+
+# Traffic tracing
+TRACE_DIR = MANAGER_HOME / "traces"
+DEFAULT_TRACE_CAPACITY = 16384  # records kept per server
+TRACE_CAPTURE_MAX = 64 * 1024 * 1024  # bytes of captured requests per server
+
+# Replay load generator
+DEFAULT_REPLAY_CONCURRENCY = 1
+
+# Lazy start
+LAZY_DIR = MANAGER_HOME / "lazy"
+DEFAULT_LAZY_IDLE_TIMEOUT = 600
+LAZY_LIST_METHODS = (  # (capability, method, result field) answered from the snapshot
+    ("tools", "tools/list", "tools"),
+    ("prompts", "prompts/list", "prompts"),
+    ("resources", "resources/list", "resources"),
+    ("resources", "resources/templates/list", "resourceTemplates"),
+)
+
+# Config sync (JSON Patch)
+SYNC_DIR = MANAGER_HOME / "sync"
+SYNC_STRATEGIES = ("ours", "theirs", "field")
+
+# Config watching
+WATCH_DEBOUNCE = 0.3        # quiet period that ends a burst of writes
+WATCH_POLL_INTERVAL = 0.5   # stat polling when inotify is unavailable
+
+# Validation
+PLACEHOLDER_PATTERN = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)(:-?[^}]*)?\}')
+TEMPLATE_PATTERN = re.compile(r'\{([a-z_]+)\}')
+SHELL_SYNTAX_PATTERN = re.compile(r'(^~(/|$))|\$[A-Za-z_]|\$\((?!\{)')
+SECRET_NAME_PATTERN = re.compile(r'(TOKEN|SECRET|PASSWORD|API_?KEY|PAT)$', re.IGNORECASE)
+SCRIPT_COMMANDS = ("node", "python", "python3", "deno", "bun", "uv", "uvx")
+DEFAULT_NPM_REGISTRY = "https://registry.npmjs.org/"
+
+# Health check defaults
+DEFAULT_TEST_TIMEOUT = 10
+DEFAULT_TEST_CONCURRENCY = 8
+DEFAULT_POST_INSTALL_TIMEOUT = 300
+KILL_GRACE = 2  # seconds between SIGTERM and SIGKILL of a process group
+PROBE_LIMITS_ENV = "MCP_MANAGER_PROBE_LIMITS"
+RLIMITS = {"as": "RLIMIT_AS", "cpu": "RLIMIT_CPU", "nofile": "RLIMIT_NOFILE"}
+
+# Benchmark defaults
+DEFAULT_BENCH_RUNS = 5
+DEFAULT_BENCH_COLD_RUNS = 1
+DEFAULT_REGRESSION_THRESHOLD = 20.0  # percent
+REGRESSION_FLOOR_MS = 5.0  # ignore slowdowns smaller than this
+NPM_COMMANDS = ("npx", "npm")
+
+# MCP protocol
+MCP_PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "mcp-manager", "version": "1.0.0"}
+
+# Popular MCP servers registry
+MCP_REGISTRY = {
+    "filesystem": {
+        "package": "@modelcontextprotocol/server-filesystem",
+        "description": "Local file system access",
+        "args_template": ["-y", "{package}", "{path}"],
+        "env_vars": [],
+        "prompts": {
+            "path": "Enter directory to allow access to (default: $HOME): "
+        }
+    },
+    "github": {
+        "package": "@modelcontextprotocol/server-github",
+        "description": "GitHub API integration",
+        "args_template": ["-y", "{package}"],
+        "env_vars": ["GITHUB_TOKEN"],
+        "setup_help": "Get a token at: https://github.com/settings/tokens"
+    },
+    "jina": {
+        "package": "jina-mcp-tools",
+        "description": "AI-powered search and content extraction",
+        "args_template": ["jina-mcp-tools"],
+        "env_vars": ["JINA_API_KEY"],
+        "setup_help": "Get an API key at: https://jina.ai"
+    },
+    "context7": {
+        "package": "@upstash/context7-mcp",
+        "description": "Real-time documentation retrieval for programming libraries",
+        "args_template": ["-y", "{package}"],
+        "env_vars": [],
+        "setup_help": "No API key required! Just add 'use context7' to your prompts"
+    },
+    "playwright": {
+        "package": "@playwright/mcp",
+        "description": "Browser automation and testing",
+        "args_template": ["{package}"],
+        "env_vars": [],
+        "post_install": ["npx", "playwright", "install"]
+    },
+    "cloudflare-workers": {
+        "package": "@cloudflare/mcp-server-workers",
+        "description": "Cloudflare Workers management",
+        "args_template": ["-y", "{package}"],
+        "env_vars": ["CLOUDFLARE_API_TOKEN", "CLOUDFLARE_ACCOUNT_ID"]
+    },
+    "postgresql": {
+        "package": "@modelcontextprotocol/server-postgresql",
+        "description": "PostgreSQL database access",
+        "args_template": ["-y", "{package}"],
+        "env_vars": ["DATABASE_URL"]
+    }
+}
+
+def _env_placeholder(value: str) -> Optional[str]:
+    """Return the variable name of a ${VAR} / ${VAR:default} placeholder"""
+    if isinstance(value, str) and value.startswith("${") and value.endswith("}"):
+        return value[2:-1].split(':')[0]
+    return None
+
+def _env_default(value: str) -> Optional[str]:
+    """Return the default of a ${VAR:default} / ${VAR:-default} placeholder"""
+    if _env_placeholder(value) is None or ':' not in value:
+        return None
+    default = value[2:-1].split(':', 1)[1]
+    return default[1:] if default.startswith('-') else default
+
+def _server_env(server: Dict[str, Any], base_env: Dict[str, str] = None) -> Dict[str, str]:
+    """Build the process environment for a configured server
+    
+    Placeholders are resolved from ``base_env`` (default: our own
+    environment), which also forms the rest of the environment.
+    """
+    base_env = os.environ if base_env is None else base_env
+    env = dict(base_env)
+    for var, value in server.get("env", {}).items():
+        env_name = _env_placeholder(value)
+        if env_name is None:
+            env[var] = value
+        elif env_name in base_env:
+            env[var] = base_env[env_name]
+        elif _env_default(value) is not None:
+            env[var] = _env_default(value)
+    return env
+
+class PhaseTimer:
+    """Wall time spent in each phase of a run, for --profile
+    
+    Phases nest, and repeated phases at the same place are added up.
+    Only the main thread is timed, so worker threads cannot interleave
+    their phases with it.
+    """
+    
+    def __init__(self):
+        self.totals = {}  # (outer phases..., phase) -> [seconds, count], in first-seen order
+        self.stack = []
+        self.starts = []
+    
+    def begin(self, name: str):
+        self.stack.append(name)
+        self.totals.setdefault(tuple(self.stack), [0.0, 0])
+        self.starts.append(time.perf_counter())
+    
+    def end(self):
+        total = self.totals[tuple(self.stack)]
+        total[0] += time.perf_counter() - self.starts.pop()
+        total[1] += 1
+        self.stack.pop()
+    
+    def add(self, name: str, seconds: float):
+        total = self.totals.setdefault(tuple(self.stack) + (name,), [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+    
+    def report(self, wall: float) -> str:
+        lines = [f"{Colors.CYAN}Profile (wall time):{Colors.NC}"]
+        for key, (seconds, count) in self.totals.items():
+            repeat = f" (x{count})" if count > 1 else ""
+            lines.append(f"  {seconds * 1000:9.1f} ms  {100 * seconds / wall if wall else 0:5.1f}%  "
+                         f"{'  ' * (len(key) - 1)}{key[-1]}{repeat}")
+        lines.append(f"  {wall * 1000:9.1f} ms  total (after interpreter startup)")
+        return "\n".join(lines)
+
+_profiler = None  # PhaseTimer while --profile is on
+
+@contextlib.contextmanager
+def _phase(name: str):
+    """Time a block (or, as a decorator, a function) under --profile"""
+    if _profiler is None:
+        yield
+        return
+    import threading
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    _profiler.begin(name)
+    try:
+        yield
+    finally:
+        _profiler.end()
+
+def _start_profiling(started: Optional[float], parsing_from: float, dump_file: str = None):
+    """Turn on --profile timing (and --profile-dump) for the rest of the run
+    
+    The report is printed to stderr when the process exits, however the
+    command ends.
+    """
+    global _profiler
+    _profiler = PhaseTimer()
+    if started is not None:
+        _profiler.add("import", parsing_from - started)
+    _profiler.add("parse arguments", time.perf_counter() - parsing_from)
+    profile = None
+    if dump_file:
+        import cProfile
+        profile = cProfile.Profile()
+    
+    def finish():
+        if profile:
+            profile.disable()
+            profile.dump_stats(dump_file)
+        while _profiler.stack:
+            _profiler.end()
+        wall = time.perf_counter() - (parsing_from if started is None else started)
+        print(_profiler.report(wall), file=sys.stderr)
+        if profile:
+            print(f"cProfile stats written to {dump_file} "
+                  f"(view with: python3 -m pstats {dump_file})", file=sys.stderr)
+    
+    atexit.register(finish)
+    _profiler.begin("command")
+    if profile:
+        profile.enable()
+
+def _parse_limits(items: List[str]) -> Dict[str, int]:
+    """Parse resource caps such as ``as=4G``, ``cpu=60`` or ``nofile=1024``
+    
+    Items may also be comma-separated, as in MCP_MANAGER_PROBE_LIMITS.
+    """
+    limits = {}
+    for item in ",".join(items).split(","):
+        if not item.strip():
+            continue
+        key, sep, value = item.strip().partition("=")
+        match = re.fullmatch(r'(\d+)([KMG]?)', value.strip().upper())
+        if key not in RLIMITS or not sep or not match:
+            raise ValueError(f"invalid limit {item!r} (use as=SIZE, cpu=SECONDS or nofile=N)")
+        scale = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}[match.group(2)]
+        limits[key] = int(match.group(1)) * scale
+    return limits
+
+_LIVE_GROUPS = set()
+
+def _spawn(cmd: List[str], limits: Dict[str, int] = None, **kwargs) -> "subprocess.Popen":
+    """Start a server or helper command in its own session and process group
+    
+    Everything it forks stays in the group, so _reap_group can stop the
+    whole tree. ``limits`` (see _parse_limits) are applied as rlimits in
+    the child before it runs the command.
+    """
+    import subprocess
+    if os.name == "posix":
+        kwargs["start_new_session"] = True
+        if limits:
+            import resource
+            caps = []
+            for key, value in limits.items():
+                which = getattr(resource, RLIMITS[key])
+                hard = resource.getrlimit(which)[1]
+                if hard != resource.RLIM_INFINITY:
+                    value = min(value, hard)
+                caps.append((which, value))
+            
+            def apply_limits():
+                for which, value in caps:
+                    resource.setrlimit(which, (value, value))
+            kwargs["preexec_fn"] = apply_limits
+    proc = subprocess.Popen(cmd, **kwargs)
+    if os.name == "posix":
+        _LIVE_GROUPS.add(proc.pid)
+    return proc
+
+def _group_members(pgid: int) -> Optional[List[int]]:
+    """Running (non-zombie) pids in a process group; None without /proc"""
+    if not os.path.isdir("/proc/self"):
+        return None
+    members = []
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rfind(b")") + 2:].split()
+        if int(fields[2]) == pgid and fields[0] != b"Z":
+            members.append(int(entry.name))
+    return members
+
+def _group_alive(proc: "subprocess.Popen") -> bool:
+    if proc.poll() is None:
+        return True
+    try:
+        os.killpg(proc.pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    members = _group_members(proc.pid)
+    return True if members is None else bool(members)
+
+def _reap_group(proc: "subprocess.Popen", grace: float = KILL_GRACE) -> Dict[str, Any]:
+    """Stop whatever is left of a process's group: SIGTERM, then SIGKILL
+    
+    Returns how many processes besides the leader were still running
+    (``stray``), the last ``signal`` sent and the pids ``leftover`` even
+    after SIGKILL. The leader is always reaped.
+    """
+    import signal
+    import subprocess
+    cleanup = {"stray": 0, "signal": None, "leftover": []}
+    if os.name != "posix":
+        if proc.poll() is None:
+            cleanup["signal"] = "terminate"
+            proc.terminate()
+            try:
+                proc.wait(grace)
+            except subprocess.TimeoutExpired:
+                cleanup["signal"] = "kill"
+                proc.kill()
+                proc.wait()
+        return cleanup
+    
+    if _group_alive(proc):
+        members = _group_members(proc.pid) or []
+        cleanup["stray"] = len([pid for pid in members if pid != proc.pid])
+        for sig, grace_s in ((signal.SIGTERM, grace), (signal.SIGKILL, 1.0)):
+            if not _group_alive(proc):
+                break
+            cleanup["signal"] = sig.name
+            with contextlib.suppress(ProcessLookupError, PermissionError):
+                os.killpg(proc.pid, sig)
+            deadline = time.monotonic() + grace_s
+            while time.monotonic() < deadline and _group_alive(proc):
+                time.sleep(0.02)
+        if proc.poll() is None:
+            proc.wait(1)
+        if _group_alive(proc):
+            cleanup["leftover"] = _group_members(proc.pid) or []
+    _LIVE_GROUPS.discard(proc.pid)
+    return cleanup
+
+def _kill_live_groups():
+    """Don't leave servers behind when we exit early (e.g. Ctrl-C during a sweep)"""
+    if not _LIVE_GROUPS:
+        return
+    import signal
+    for pgid in list(_LIVE_GROUPS):
+        with contextlib.suppress(OSError):
+            os.killpg(pgid, signal.SIGKILL)
+
+atexit.register(_kill_live_groups)
+
+def _run_isolated(cmd: List[str], timeout: Optional[float] = None,
+                  limits: Dict[str, int] = None, **kwargs):
+    """Like subprocess.run(capture_output=True, text=True) but for a whole process group
+    
+    Returns (CompletedProcess, cleanup). On timeout the group is stopped
+    and the CompletedProcess is None.
+    """
+    import subprocess
+    proc = _spawn(cmd, limits, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                  text=True, **kwargs)
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        cleanup = _reap_group(proc)
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            proc.communicate(timeout=1)
+        return None, cleanup
+    except BaseException:
+        _reap_group(proc, 0)
+        raise
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr), _reap_group(proc)
+
+def _format_cleanup(cleanup: Optional[Dict[str, Any]]) -> str:
+    """Describe what had to be stopped after a probe, or "" if it exited cleanly"""
+    if not cleanup or not (cleanup["stray"] or cleanup["leftover"]):
+        return ""
+    text = f"{cleanup['stray']} stray process{'es' if cleanup['stray'] != 1 else ''} " \
+           f"stopped with {cleanup['signal']}"
+    if cleanup["leftover"]:
+        text += f"; still running: {', '.join(map(str, cleanup['leftover']))}"
+    return text
+
+def _probe_version(name: str, server: Dict[str, Any],
+                   timeout: float = DEFAULT_TEST_TIMEOUT,
+                   base_env: Dict[str, str] = None,
+                   limits: Dict[str, int] = None) -> Dict[str, Any]:
+    """Run the server command with --version and time it"""
+    import subprocess
+    cmd = [server.get("command", "")] + server.get("args", []) + ["--version"]
+    result = {"name": name, "ok": False, "latency": None, "output": "", "error": "",
+              "cleanup": None}
+    start = time.monotonic()
+    try:
+        proc, result["cleanup"] = _run_isolated(cmd, timeout, limits,
+                                                stdin=subprocess.DEVNULL,
+                                                env=_server_env(server, base_env))
+        if proc is None:
+            result["error"] = f"timed out after {timeout:g}s"
+        else:
+            result["ok"] = proc.returncode == 0
+            result["output"] = proc.stdout.strip()
+            result["error"] = proc.stderr.strip()
+    except Exception as e:
+        result["error"] = str(e)
+    result["latency"] = time.monotonic() - start
+    return result
+
+class MCPError(Exception):
+    """Raised when an MCP server fails to answer a request"""
+
+class StdioSession:
+    """Minimal JSON-RPC client for an MCP server speaking stdio"""
+    
+    def __init__(self, cmd: List[str], env: Dict[str, str] = None,
+                 limits: Dict[str, int] = None):
+        import threading
+        from concurrent.futures import Future
+        self.cmd = cmd
+        self.env = env
+        self.limits = limits
+        self.proc = None
+        self.cleanup = None  # filled in by close(), see _reap_group
+        self.stderr_tail = collections.deque(maxlen=20)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._closed = threading.Event()
+        self.on_notification = None  # called with each server notification
+    
+    def start(self):
+        """Spawn the server process and start the reader threads"""
+        import subprocess
+        import threading
+        self.proc = _spawn(self.cmd, self.limits,
+                           stdin=subprocess.PIPE,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE,
+                           env=self.env)
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+    
+    def _read_stdout(self):
+        for line in self.proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            if "method" in message:
+                if "id" in message:
+                    self._answer_server_request(message)
+                elif self.on_notification:
+                    self.on_notification(message)
+                continue
+            with self._lock:
+                future = self._pending.pop(message.get("id"), None)
+            if future is not None:
+                future.set_result(message)
+        self._closed.set()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(MCPError(self._exit_reason()))
+    
+    def _read_stderr(self):
+        for line in self.proc.stderr:
+            self.stderr_tail.append(line.decode(errors="replace").rstrip())
+    
+    def _answer_server_request(self, message: Dict[str, Any]):
+        if message["method"] == "ping":
+            reply = {"jsonrpc": "2.0", "id": message["id"], "result": {}}
+        else:
+            reply = {"jsonrpc": "2.0", "id": message["id"],
+                     "error": {"code": -32601, "message": "Method not found"}}
+        try:
+            self._write(reply)
+        except OSError:
+            pass
+    
+    def _exit_reason(self) -> str:
+        code = self.proc.poll()
+        reason = "server closed stdout" if code is None else f"server exited with code {code}"
+        if self.stderr_tail:
+            reason += f": {self.stderr_tail[-1]}"
+        return reason
+    
+    def _write(self, message: Dict[str, Any]):
+        data = json.dumps(message, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            self.proc.stdin.write(data)
+            self.proc.stdin.flush()
+    
+    def send_request(self, method: str, params: Dict[str, Any] = None) -> "Future":
+        """Send a request and return a future for its response message"""
+        from concurrent.futures import Future
+        future = Future()
+        with self._lock:
+            if self._closed.is_set():  # nothing would ever answer it
+                raise MCPError(self._exit_reason())
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+        future.request_id = request_id
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            self._write(message)
+        except OSError:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise MCPError(self._exit_reason())
+        return future
+    
+    def request(self, method: str, params: Dict[str, Any] = None,
+                timeout: float = DEFAULT_TEST_TIMEOUT) -> Any:
+        """Send a request and wait for its result"""
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        try:
+            response = self.send_request(method, params).result(timeout)
+        except FutureTimeoutError:
+            raise MCPError(f"{method} timed out after {timeout:.3g}s")
+        if "error" in response:
+            error = response["error"]
+            raise MCPError(f"{method} failed: {error.get('message', error)}")
+        return response.get("result")
+    
+    def notify(self, method: str, params: Dict[str, Any] = None):
+        """Send a notification"""
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            self._write(message)
+        except OSError:
+            raise MCPError(self._exit_reason())
+    
+    def initialize(self, timeout: float = DEFAULT_TEST_TIMEOUT) -> Dict[str, Any]:
+        """Run the initialize / notifications/initialized handshake"""
+        result = self.request("initialize", {
+            "protocolVersion": MCP_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        }, timeout)
+        self.notify("notifications/initialized")
+        return result or {}
+    
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and not self._closed.is_set() and self.proc.poll() is None
+    
+    def close(self, grace: float = 2):
+        """Close stdin and make sure the server and everything it started exit
+        
+        Well-behaved servers exit on EOF; after ``grace`` seconds whatever
+        is left of the process group is terminated, then killed. What had
+        to be stopped is recorded in ``cleanup``.
+        """
+        import subprocess
+        if self.proc is None or self.cleanup is not None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            self.proc.wait(grace)
+        self.cleanup = _reap_group(self.proc)
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def _parse_duration(text: str) -> float:
+    """Parse a duration such as 90, 90s, 5m or 1h into seconds"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*', text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r} (use e.g. 30s, 5m, 1h)")
+    return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+def _slope(points: List[tuple]) -> Optional[float]:
+    """Least-squares slope of (x, y) points"""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+class ResourceSampler:
+    """Samples the memory, CPU, threads and fds of a process tree from /proc
+    
+    The tree is the process plus all its descendants, so an ``npx``
+    wrapper is measured together with the node server it starts. CPU time
+    includes descendants that exited between samples.
+    """
+    
+    available = os.path.isdir("/proc/self/fd")
+    
+    def __init__(self, pid: int, interval: float = RESOURCE_SAMPLE_INTERVAL):
+        import threading
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._cpu: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _tree(self) -> Dict[int, List[bytes]]:
+        stats, children = {}, collections.defaultdict(list)
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            fields = data[data.rindex(b")") + 2:].split()
+            stats[int(entry)] = fields
+            children[int(fields[1])].append(int(entry))
+        tree, queue = {}, [self.pid]
+        while queue:
+            pid = queue.pop()
+            if pid in stats:
+                tree[pid] = stats[pid]
+                queue.extend(children.get(pid, []))
+        return tree
+    
+    def sample(self):
+        """Take one sample of the whole tree"""
+        tree = self._tree()
+        if not tree:
+            return
+        rss = threads = fds = 0
+        for pid, fields in tree.items():
+            # Fields after the command name start at 3 (state): utime is 14,
+            # stime 15, num_threads 20 and rss (pages) 24
+            self._cpu[pid] = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+            threads += int(fields[17])
+            rss += int(fields[21]) * PAGE_SIZE
+            try:
+                fds += len(os.listdir(f"/proc/{pid}/fd"))
+            except OSError:
+                pass
+        self.samples.append({"t": time.monotonic(), "rss": rss, "cpu": sum(self._cpu.values()),
+                             "threads": threads, "fds": fds, "children": len(tree) - 1})
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+    
+    def start(self):
+        import threading
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+    
+    def summary(self, steady_from: float = None) -> Dict[str, Any]:
+        """Peak values over all samples and the median RSS once ready"""
+        if not self.samples:
+            return None
+        steady = [s["rss"] for s in self.samples if steady_from and s["t"] >= steady_from]
+        return {
+            "samples": len(self.samples),
+            "peak_rss_mb": max(s["rss"] for s in self.samples) / 2**20,
+            "steady_rss_mb": _percentile(steady or [self.samples[-1]["rss"]], 50) / 2**20,
+            "cpu_time": max(s["cpu"] for s in self.samples),
+            "peak_threads": max(s["threads"] for s in self.samples),
+            "peak_fds": max(s["fds"] for s in self.samples),
+            "peak_children": max(s["children"] for s in self.samples),
+        }
+    
+    def growth(self, since: float) -> Dict[str, Optional[float]]:
+        """Per-minute growth of RSS (MB), fds and threads since a point in time"""
+        window = [s for s in self.samples if s["t"] >= since]
+        slopes = {}
+        for key, scale, label in (("rss", 2**20, "rss_mb_per_min"),
+                                  ("fds", 1, "fds_per_min"),
+                                  ("threads", 1, "threads_per_min")):
+            slope = _slope([(s["t"], s[key] / scale) for s in window])
+            slopes[label] = slope * 60 if slope is not None else None
+        return slopes
+
+def _probe_handshake(name: str, server: Dict[str, Any],
+                     timeout: float = DEFAULT_TEST_TIMEOUT,
+                     base_env: Dict[str, str] = None,
+                     resources: bool = False, soak: float = 0,
+                     limits: Dict[str, int] = None) -> Dict[str, Any]:
+    """Run the MCP handshake against a server and time each phase
+    
+    Phases are measured from the start of the probe: ``spawn`` is the
+    time to create the process, ``initialize`` the time until the
+    initialize response arrives and ``tools_list`` the round trip of the
+    first tools/list request.
+    
+    With ``resources`` the server's process tree is sampled throughout.
+    ``soak`` keeps calling tools/list for that many seconds afterwards and
+    reports how memory, fds and threads grow. ``limits`` caps the server's
+    resources (see _spawn); ``cleanup`` reports what was left running.
+    """
+    cmd = [server.get("command", "")] + server.get("args", [])
+    result = {"name": name, "ok": False, "latency": None, "output": "", "error": "",
+              "spawn": None, "initialize": None, "tools_list": None,
+              "server_info": None, "tools": None, "cleanup": None}
+    deadline = time.monotonic() + timeout
+    start = time.monotonic()
+    session = StdioSession(cmd, env=_server_env(server, base_env), limits=limits)
+    sampler = None
+    ready = None
+    try:
+        session.start()
+        result["spawn"] = time.monotonic() - start
+        if (resources or soak) and ResourceSampler.available:
+            sampler = ResourceSampler(session.proc.pid)
+            sampler.start()
+        
+        init = session.initialize(timeout=max(deadline - time.monotonic(), 0))
+        result["initialize"] = time.monotonic() - start
+        info = init.get("serverInfo") or {}
+        result["server_info"] = info
+        result["protocol_version"] = init.get("protocolVersion")
+        result["capabilities"] = init.get("capabilities", {})
+        result["output"] = f"{info.get('name', 'unknown')} {info.get('version', '')}".strip()
+        
+        if "tools" in init.get("capabilities", {}):
+            sent = time.monotonic()
+            tools = session.request("tools/list", {},
+                                    timeout=max(deadline - time.monotonic(), 0))
+            result["tools_list"] = time.monotonic() - sent
+            result["tools"] = [tool.get("name") for tool in (tools or {}).get("tools", [])]
+            result["tool_descriptions"] = {tool.get("name"): tool.get("description", "")
+                                           for tool in (tools or {}).get("tools", [])}
+        result["ok"] = True
+        ready = time.monotonic()
+        
+        if soak:
+            method = "tools/list" if result["tools"] is not None else "ping"
+            latencies = []
+            result["soak"] = {"method": method, "duration": soak, "calls": 0}
+            while time.monotonic() - ready < soak:
+                sent = time.monotonic()
+                session.request(method, {}, timeout=timeout)
+                latencies.append(time.monotonic() - sent)
+                result["soak"]["calls"] += 1
+            result["soak"]["latency"] = _summarize(latencies)
+            del result["soak"]["latency"]["samples"]
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = str(e)
+    finally:
+        if sampler:
+            sampler.stop()
+            result["resources"] = sampler.summary(steady_from=ready)
+            if soak and ready:
+                result["soak"]["growth"] = sampler.growth(since=ready)
+        result["latency"] = time.monotonic() - start
+        session.close(grace=0.5 if result["ok"] else 0)
+        result["cleanup"] = session.cleanup
+    return result
+
+PROBES = {
+    "handshake": _probe_handshake,
+    "version": _probe_version,
+}
+
+def _format_phases(result: Dict[str, Any]) -> str:
+    """Describe the phase timings of a handshake probe"""
+    parts = []
+    for key, label in (("spawn", "spawn"), ("initialize", "init"), ("tools_list", "tools")):
+        if result.get(key) is not None:
+            parts.append(f"{label} {result[key] * 1000:.0f}ms")
+    return ", ".join(parts)
+
+def _format_resources(usage: Dict[str, Any]) -> str:
+    """Describe a resource summary on one line"""
+    return (f"rss {usage['peak_rss_mb']:.0f}MB peak/{usage['steady_rss_mb']:.0f}MB steady, "
+            f"cpu {usage['cpu_time']:.2f}s, {usage['peak_threads']} threads, "
+            f"{usage['peak_fds']} fds, {usage['peak_children']} children")
+
+def _format_growth(soak: Dict[str, Any]) -> str:
+    """Describe soak growth slopes on one line"""
+    growth = soak.get("growth") or {}
+    parts = [f"{soak['calls']} {soak['method']} calls in {soak['duration']:g}s"]
+    for key, label, fmt in (("rss_mb_per_min", "rss", "{:+.2f}MB/min"),
+                            ("fds_per_min", "fds", "{:+.2f}/min"),
+                            ("threads_per_min", "threads", "{:+.2f}/min")):
+        if growth.get(key) is not None:
+            parts.append(f"{label} {fmt.format(growth[key])}")
+    return ", ".join(parts)
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile with linear interpolation between closest ranks"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def _summarize(samples: List[float]) -> Dict[str, Any]:
+    """Summarize latency samples (seconds) as p50/p95/max in milliseconds"""
+    ms = [sample * 1000 for sample in samples]
+    return {
+        "p50": _percentile(ms, 50),
+        "p95": _percentile(ms, 95),
+        "max": max(ms) if ms else None,
+        "samples": [round(value, 3) for value in ms],
+    }
+
+def _bench_server(name: str, server: Dict[str, Any], runs: int, cold_runs: int,
+                  timeout: float = DEFAULT_TEST_TIMEOUT,
+                  resources: bool = False) -> Dict[str, Any]:
+    """Benchmark cold and warm starts of a server
+    
+    Cold runs of npx/npm servers get an empty npm cache so they pay the
+    full package resolution and download; other commands get no warm-up.
+    Warm runs follow one discarded warm-up launch.
+    """
+    is_npm = os.path.basename(server.get("command", "")) in NPM_COMMANDS
+    report = {"command": server.get("command"), "args": server.get("args", [])}
+    
+    def measure(mode: str, count: int, cold: bool):
+        import shutil
+        import tempfile
+        ready, first_request, errors, usage = [], [], [], []
+        for _ in range(count):
+            probe_server = server
+            cache_dir = None
+            if cold and is_npm:
+                cache_dir = tempfile.mkdtemp(prefix="mcp-bench-npm-")
+                probe_server = dict(server, env=dict(server.get("env", {}),
+                                                     npm_config_cache=cache_dir))
+            try:
+                result = _probe_handshake(name, probe_server, timeout, resources=resources)
+            finally:
+                if cache_dir:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+            if result.get("resources"):
+                usage.append(result["resources"])
+            if result["ok"]:
+                ready.append(result["initialize"])
+                if result["tools_list"] is not None:
+                    first_request.append(result["tools_list"])
+            else:
+                errors.append(result["error"])
+        report[mode] = {
+            "runs": count,
+            "failures": len(errors),
+            "errors": sorted(set(errors)),
+            "ready": _summarize(ready),
+            "first_request": _summarize(first_request),
+        }
+        if usage:
+            report[mode]["resources"] = {
+                "peak_rss_mb": max(u["peak_rss_mb"] for u in usage),
+                "cpu_time_p50": _percentile([u["cpu_time"] for u in usage], 50),
+                "peak_threads": max(u["peak_threads"] for u in usage),
+                "peak_fds": max(u["peak_fds"] for u in usage),
+                "peak_children": max(u["peak_children"] for u in usage),
+            }
+    
+    if cold_runs:
+        measure("cold", cold_runs, cold=True)
+    if runs:
+        _probe_handshake(name, server, timeout)  # warm-up
+        measure("warm", runs, cold=False)
+    return report
+
+def _write_bench_results(results: Dict[str, Any], output_file: str):
+    """Write benchmark results as JSON, or CSV for a .csv file name"""
+    if output_file.endswith(".csv"):
+        import csv
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "server", "mode", "metric",
+                             "p50_ms", "p95_ms", "max_ms", "runs", "failures", "args"])
+            for name, report in results["servers"].items():
+                for mode in ("cold", "warm"):
+                    if mode not in report:
+                        continue
+                    for metric in ("ready", "first_request"):
+                        stats = report[mode][metric]
+                        writer.writerow([results["timestamp"], name, mode, metric,
+                                         _round(stats["p50"]), _round(stats["p95"]),
+                                         _round(stats["max"]), report[mode]["runs"],
+                                         report[mode]["failures"], " ".join(report["args"])])
+    else:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=2)
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+def _compare_bench(results: Dict[str, Any], baseline: Dict[str, Any],
+                   threshold: float) -> List[Dict[str, Any]]:
+    """Compare p50/p95 latencies against a baseline run
+    
+    Returns one row per metric present in both runs; rows whose latency
+    grew by more than ``threshold`` percent (and at least
+    REGRESSION_FLOOR_MS) are marked as regressions.
+    """
+    rows = []
+    for name, report in results["servers"].items():
+        base_report = baseline.get("servers", {}).get(name)
+        if not base_report:
+            continue
+        for mode in ("cold", "warm"):
+            if mode not in report or mode not in base_report:
+                continue
+            for metric in ("ready", "first_request"):
+                for stat in ("p50", "p95"):
+                    new = report[mode][metric][stat]
+                    old = base_report[mode].get(metric, {}).get(stat)
+                    if new is None or old is None:
+                        continue
+                    change = (new - old) / old * 100 if old else 0.0
+                    rows.append({
+                        "server": name, "mode": mode, "metric": metric, "stat": stat,
+                        "baseline": old, "current": new, "change": change,
+                        "regression": change > threshold and new - old >= REGRESSION_FLOOR_MS,
+                    })
+    return rows
+
+def _write_json_atomic(path: Path, data: Any, indent: Optional[int] = 2):
+    """Write JSON to a temp file next to ``path`` and rename it into place
+    
+    ``indent=None`` writes compact JSON with the C encoder, which is much
+    faster for large internal files.
+    """
+    _write_text_atomic(path, json.dumps(data, indent=indent))
+
+def _write_text_atomic(path: Path, text: str):
+    import tempfile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+@contextlib.contextmanager
+def _file_lock(path: Path, timeout: float = LOCK_TIMEOUT):
+    """Hold an exclusive advisory lock on ``<path>.lock``
+    
+    Only cooperating processes (other mcp-manager runs) honour the lock;
+    changes made by anything else are caught by the re-read on save.
+    """
+    lock_path = path.with_name(path.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    with open(lock_path, 'a') as f:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"could not lock {path} within {timeout:g}s")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _atomic_write(path: Path, text: str):
+    """Replace a file's contents via temp file + fsync + rename
+    
+    Readers see either the old or the new file, never a partial write.
+    The original file's permissions are preserved.
+    """
+    import tempfile
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o600
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def _merge_servers(base: Dict[str, Any], ours: Dict[str, Any],
+                   theirs: Dict[str, Any]):
+    """Three-way merge of mcpServers sections
+    
+    Entries changed only on one side take that side's version; entries
+    changed differently on both sides keep ours and are reported as
+    conflicts. Returns (merged, conflict names).
+    """
+    merged = {}
+    conflicts = []
+    missing = object()
+    for name in list(theirs) + [name for name in ours if name not in theirs]:
+        b, o, t = base.get(name, missing), ours.get(name, missing), theirs.get(name, missing)
+        if o == b:
+            value = t
+        elif t == b or o == t:
+            value = o
+        else:
+            value = o
+            conflicts.append(name)
+        if value is not missing:
+            merged[name] = value
+    return merged, conflicts
+
+class RewriteLedger:
+    """Original entries of servers whose command/args mcp-manager rewrote
+    
+    Each rewrite (pinning, tracing, ...) is recorded as a layer holding
+    the entry before and after the rewrite, so it can be undone later.
+    Layers stack and must be removed in reverse order.
+    """
+    
+    def __init__(self, path: Path = REWRITES_FILE):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.data = {}
+    
+    def save(self):
+        _write_json_atomic(self.path, self.data)
+    
+    def layers(self, config_path: Path, name: str) -> List[Dict[str, Any]]:
+        return self.data.get(str(config_path), {}).get(name, [])
+    
+    def layer(self, config_path: Path, name: str, kind: str) -> Optional[Dict[str, Any]]:
+        for layer in self.layers(config_path, name):
+            if layer["kind"] == kind:
+                return layer
+        return None
+    
+    def push(self, config_path: Path, name: str, kind: str,
+             original: Dict[str, Any], rewritten: Dict[str, Any], **info):
+        import datetime
+        layer = {"kind": kind, "original": original, "rewritten": rewritten,
+                 "timestamp": datetime.datetime.now().isoformat(timespec="seconds")}
+        layer.update(info)
+        self.data.setdefault(str(config_path), {}).setdefault(name, []).append(layer)
+    
+    def pop(self, config_path: Path, name: str, kind: str) -> Dict[str, Any]:
+        """Remove the topmost layer, which must be of the given kind"""
+        layers = self.layers(config_path, name)
+        if not layers or layers[-1]["kind"] != kind:
+            if self.layer(config_path, name, kind):
+                raise ValueError(f"'{name}' has a '{layers[-1]['kind']}' rewrite on top; "
+                                 f"undo that first")
+            raise KeyError(name)
+        layer = layers.pop()
+        servers = self.data[str(config_path)]
+        if not layers:
+            del servers[name]
+        if not servers:
+            del self.data[str(config_path)]
+        return layer
+
+def _parse_npx_args(server: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Find the package spec in an npx server entry
+    
+    Returns the spec, the binary to run (for ``npx -p pkg bin``) and the
+    arguments passed through to the server, or None for non-npx entries.
+    """
+    if os.path.basename(server.get("command", "")) != "npx":
+        return None
+    args = list(server.get("args", []))
+    package = None
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("-p", "--package") and i + 1 < len(args):
+            package = args[i + 1]
+            i += 2
+        elif arg.startswith("--package="):
+            package = arg.split("=", 1)[1]
+            i += 1
+        elif arg.startswith("-"):
+            i += 1
+        else:
+            break
+    if i >= len(args):
+        return None
+    if package:
+        return {"spec": package, "bin": args[i], "rest": args[i + 1:]}
+    return {"spec": args[i], "bin": None, "rest": args[i + 1:]}
+
+def _split_spec(spec: str):
+    """Split 'name@version' (including scoped names) into (name, version)"""
+    at = spec.find("@", 1)
+    if at == -1:
+        return spec, None
+    return spec[:at], spec[at + 1:]
+
+def _store_prefix(name: str, version: str, store: Path = PACKAGE_STORE) -> Path:
+    return store / name.replace("/", "+") / version
+
+def _install_package(spec: str, store: Path = PACKAGE_STORE) -> Dict[str, str]:
+    """Install a package spec into the managed store
+    
+    Exact versions already in the store are reused without touching npm.
+    Returns the package name, resolved version and install prefix.
+    """
+    import shutil
+    import subprocess
+    import tempfile
+    name, version = _split_spec(spec)
+    if version and _store_prefix(name, version, store).exists():
+        return {"name": name, "version": version,
+                "prefix": str(_store_prefix(name, version, store))}
+    
+    store.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=store, prefix=".staging-"))
+    try:
+        proc, _ = _run_isolated(["npm", "install", "--prefix", str(staging),
+                                 "--prefer-offline", "--no-audit", "--no-fund",
+                                 "--omit=dev", spec],
+                                NPM_INSTALL_TIMEOUT, stdin=subprocess.DEVNULL)
+        if proc is None:
+            raise subprocess.TimeoutExpired("npm install", NPM_INSTALL_TIMEOUT)
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"npm install {spec} failed")
+        
+        with open(staging / "package.json", 'r') as f:
+            name = next(iter(json.load(f).get("dependencies", {})), name)
+        with open(staging / "node_modules" / name / "package.json", 'r') as f:
+            version = json.load(f)["version"]
+        
+        prefix = _store_prefix(name, version, store)
+        if prefix.exists():
+            shutil.rmtree(staging)
+        else:
+            prefix.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(staging, prefix)
+        return {"name": name, "version": version, "prefix": str(prefix)}
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+def _package_entry(prefix: str, name: str, bin_name: str = None) -> Path:
+    """Resolve the file a package's bin entry points to"""
+    package_dir = Path(prefix) / "node_modules" / name
+    with open(package_dir / "package.json", 'r') as f:
+        manifest = json.load(f)
+    bins = manifest.get("bin") or {}
+    if isinstance(bins, str):
+        bins = {name.split("/")[-1]: bins}
+    if not bins:
+        raise RuntimeError(f"{name} does not declare a bin entry")
+    if bin_name:
+        target = bins.get(bin_name)
+    elif len(bins) == 1:
+        target = next(iter(bins.values()))
+    else:
+        target = bins.get(name.split("/")[-1])
+    if not target:
+        raise RuntimeError(f"cannot pick a bin entry of {name} from: {', '.join(sorted(bins))}")
+    return (package_dir / target).resolve()
+
+def _prefetch(name: str, server: Dict[str, Any], version: str = None) -> Dict[str, Any]:
+    """Install a server's package into the store and work out its pinned entry"""
+    import subprocess
+    npx = _parse_npx_args(server)
+    result = {"name": name, "ok": False, "error": ""}
+    if npx is None:
+        result["error"] = "not an npx server"
+        return result
+    spec = npx["spec"]
+    if version:
+        spec = f"{_split_spec(spec)[0]}@{version}"
+    try:
+        installed = _install_package(spec)
+        entry = _package_entry(installed["prefix"], installed["name"], npx["bin"])
+    except subprocess.TimeoutExpired:
+        result["error"] = f"npm install timed out after {NPM_INSTALL_TIMEOUT}s"
+        return result
+    except (OSError, RuntimeError, KeyError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+    result.update(ok=True, package=installed["name"], version=installed["version"],
+                  prefix=installed["prefix"], entry=str(entry),
+                  pinned={"command": "node", "args": [str(entry)] + npx["rest"]})
+    return result
+
+def _npm_cache_dir() -> Path:
+    return Path(os.environ.get("npm_config_cache") or Path.home() / ".npm")
+
+def _resolved_version(server: Dict[str, Any]) -> Optional[str]:
+    """Version an npx entry will run, found offline
+    
+    Exact versions in the spec win; otherwise the newest copy npx has
+    already installed in its cache is used. Returns the spec itself when
+    nothing is cached, and None for entries that are not npx packages.
+    """
+    parsed = _parse_npx_args(server)
+    if parsed is None:
+        return None
+    name, version = _split_spec(parsed["spec"])
+    if version and re.fullmatch(r'\d+\.\d+\.\d+[-+.\w]*', version):
+        return version
+    found = []
+    npx_dir = _npm_cache_dir() / "_npx"
+    try:
+        installs = list(npx_dir.iterdir())
+    except OSError:
+        installs = []
+    for install in installs:
+        package_json = install / "node_modules" / name / "package.json"
+        try:
+            with open(package_json, 'r') as f:
+                found.append((package_json.stat().st_mtime, json.load(f)["version"]))
+        except (OSError, ValueError, KeyError):
+            continue
+    return max(found)[1] if found else parsed["spec"]
+
+class ToolCatalog:
+    """On-disk cache of what each server reports in its handshake
+    
+    Entries are keyed by the command, args, resolved package version and
+    environment variable names of a server, so editing an entry or
+    upgrading its package gives it a new key. Entries older than the TTL
+    are still returned but marked stale.
+    """
+    
+    def __init__(self, path: Path = CATALOG_FILE, ttl: float = CATALOG_TTL):
+        self.path = path
+        self.ttl = ttl
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+    
+    @staticmethod
+    def key(server: Dict[str, Any]) -> str:
+        import hashlib
+        identity = {"command": server.get("command"), "args": server.get("args", []),
+                    "version": _resolved_version(server),
+                    "env": sorted(server.get("env", {}))}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:32]
+    
+    def get(self, server: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The cached entry for a server, with ``age`` and ``stale`` filled in"""
+        entry = self.entries.get(self.key(server))
+        if entry is None:
+            return None
+        age = time.time() - entry["probed_at"]
+        return dict(entry, age=age, stale=age > self.ttl)
+    
+    def put(self, server: Dict[str, Any], result: Dict[str, Any]):
+        """Record a successful handshake probe"""
+        self.entries[self.key(server)] = {
+            "name": result["name"],
+            "probed_at": time.time(),
+            "server_info": result.get("server_info"),
+            "protocol_version": result.get("protocol_version"),
+            "capabilities": result.get("capabilities") or {},
+            "tools": result.get("tool_descriptions") or {},
+        }
+    
+    def save(self):
+        """Merge our entries into the file and drop very old ones"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path):
+            on_disk = ToolCatalog(self.path, self.ttl).entries
+            for key, entry in self.entries.items():
+                if key not in on_disk or on_disk[key]["probed_at"] < entry["probed_at"]:
+                    on_disk[key] = entry
+            cutoff = time.time() - CATALOG_MAX_AGE
+            self.entries = {key: entry for key, entry in on_disk.items()
+                            if entry["probed_at"] >= cutoff}
+            _write_json_atomic(self.path, {"version": 1, "entries": self.entries})
+
+class HealthCache:
+    """On-disk record of the last probe of each server
+    
+    Entries are keyed by the server name and a hash of its whole entry,
+    so any edit invalidates them. ``test --max-age`` and ``metrics`` answer from
+    entries younger than their TTL instead of starting the server again.
+    """
+    
+    FIELDS = ("ok", "latency", "output", "error", "spawn", "initialize", "tools_list", "tools")
+    
+    def __init__(self, path: Path = HEALTH_FILE):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+    
+    @staticmethod
+    def key(name: str, server: Dict[str, Any]) -> str:
+        return _entry_hash({"name": name, "server": server})[:32]
+    
+    @classmethod
+    def entry(cls, result: Dict[str, Any], probe: str) -> Dict[str, Any]:
+        entry = {field: result.get(field) for field in cls.FIELDS}
+        entry.update(name=result["name"], probe=probe, probed_at=time.time())
+        return entry
+    
+    def get(self, name: str, server: Dict[str, Any],
+            probe: str = None) -> Optional[Dict[str, Any]]:
+        """The last result for a server (of the given probe kind), with ``age`` filled in"""
+        entry = self.entries.get(self.key(name, server))
+        if entry is None or (probe and entry["probe"] != probe):
+            return None
+        return dict(entry, age=max(time.time() - entry["probed_at"], 0.0))
+    
+    def put(self, server: Dict[str, Any], result: Dict[str, Any], probe: str):
+        self.entries[self.key(result["name"], server)] = self.entry(result, probe)
+    
+    def save(self):
+        """Merge our entries into the file and drop ones nobody has probed for a week"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path):
+            on_disk = HealthCache(self.path).entries
+            for key, entry in self.entries.items():
+                if key not in on_disk or on_disk[key]["probed_at"] < entry["probed_at"]:
+                    on_disk[key] = entry
+            cutoff = time.time() - HEALTH_MAX_AGE
+            self.entries = {key: entry for key, entry in on_disk.items()
+                            if entry["probed_at"] >= cutoff}
+            _write_json_atomic(self.path, {"version": 1, "entries": self.entries}, indent=None)
+
+def _format_age(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+class ValidationContext:
+    """Offline lookups shared by all validation rules, each done once
+    
+    Command resolution and npm package lookups are memoized, so a config
+    with many servers using ``npx`` pays for one PATH search and one scan
+    of the npx cache.
+    """
+    
+    def __init__(self, env: Dict[str, str] = None):
+        import threading
+        self.env = os.environ if env is None else env
+        self.npm_cache = Path(self.env.get("npm_config_cache") or Path.home() / ".npm")
+        self.registry = self.env.get("npm_config_registry") or DEFAULT_NPM_REGISTRY
+        if not self.registry.endswith("/"):
+            self.registry += "/"
+        self._memo: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+    
+    def _cached(self, key: tuple, compute):
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = compute()
+        with self._lock:
+            return self._memo.setdefault(key, value)
+    
+    def which(self, command: str) -> Optional[str]:
+        """Resolve a command like the server launcher would (no shell)"""
+        import shutil
+        if os.sep in command or (os.altsep and os.altsep in command):
+            path = os.path.expanduser(command)
+            return path if os.path.isfile(path) and os.access(path, os.X_OK) else None
+        return self._cached(("which", command),
+                            lambda: shutil.which(command, path=self.env.get("PATH")))
+    
+    def _npx_installs(self) -> List[Path]:
+        def scan():
+            try:
+                return [entry / "node_modules" for entry in (self.npm_cache / "_npx").iterdir()]
+            except OSError:
+                return []
+        return self._cached(("npx",), scan)
+    
+    def _global_modules(self) -> Optional[Path]:
+        def locate():
+            prefix = self.env.get("npm_config_prefix")
+            if not prefix:
+                npm = self.which("npm")
+                if not npm:
+                    return None
+                prefix = Path(os.path.realpath(npm)).parent.parent
+            for modules in (Path(prefix) / "lib" / "node_modules", Path(prefix) / "node_modules"):
+                if modules.is_dir():
+                    return modules
+            return None
+        return self._cached(("global",), locate)
+    
+    def _in_cacache(self, url: str) -> bool:
+        import hashlib
+        key = f"make-fetch-happen:request-cache:{url}"
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return (self.npm_cache / "_cacache" / "index-v5" / digest[:2] / digest[2:4] / digest[4:]).is_file()
+    
+    def package_source(self, spec: str) -> Optional[str]:
+        """Where an npm package spec is available without network, or None"""
+        def find():
+            name, version = _split_spec(spec)
+            exact = version if version and re.fullmatch(r'\d+\.\d+\.\d+[-+.\w]*', version) else None
+            if exact and _store_prefix(name, exact).exists():
+                return "package store"
+            for modules in self._npx_installs():
+                if (modules / name / "package.json").is_file():
+                    return "npx cache"
+            if exact:
+                tarball = f"{self.registry}{name}/-/{name.split('/')[-1]}-{exact}.tgz"
+                if self._in_cacache(tarball):
+                    return "npm cache"
+            elif self._in_cacache(self.registry + name.replace("/", "%2f")):
+                return "npm cache"
+            modules = self._global_modules()
+            if modules and (modules / name / "package.json").is_file():
+                return "global node_modules"
+            return None
+        return self._cached(("package", spec), find)
+
+def _issue(severity: str, message: str) -> Dict[str, str]:
+    return {"severity": severity, "message": message}
+
+def _check_structure(name: str, server: Any, ctx: ValidationContext) -> List[Dict[str, str]]:
+    """Entry shape: command, args and env of the right types"""
+    if not isinstance(server, dict):
+        return [_issue("error", "entry is not an object")]
+    issues = []
+    if "url" in server and "command" not in server:
+        if not re.match(r'https?://', str(server["url"])):
+            issues.append(_issue("error", f"url must be http(s): {server['url']}"))
+        return issues
+    if not isinstance(server.get("command"), str) or not server.get("command"):
+        issues.append(_issue("error", "missing 'command' field"))
+    args = server.get("args", [])
+    if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+        issues.append(_issue("error", "'args' must be a list of strings"))
+    env = server.get("env", {})
+    if not isinstance(env, dict) or not all(isinstance(value, str) for value in env.values()):
+        issues.append(_issue("error", "'env' must map names to strings"))
+    return issues
+
+def _runnable(server: Any) -> bool:
+    """Whether an entry is well-formed enough for the other rules"""
+    return (isinstance(server, dict) and isinstance(server.get("command"), str)
+            and bool(server["command"]) and isinstance(server.get("args", []), list)
+            and all(isinstance(arg, str) for arg in server.get("args", []))
+            and isinstance(server.get("env", {}), dict))
+
+def _check_command(name: str, server: Dict[str, Any], ctx: ValidationContext) -> List[Dict[str, str]]:
+    """The command resolves on PATH (or is an executable file)"""
+    if ctx.which(server["command"]):
+        return []
+    return [_issue("error", f"command not found: {server['command']}")]
+
+def _check_script(name: str, server: Dict[str, Any], ctx: ValidationContext) -> List[Dict[str, str]]:
+    """Interpreters get a script that exists"""
+    if os.path.basename(server["command"]) not in SCRIPT_COMMANDS:
+        return []
+    for arg in server.get("args", []):
+        if arg.startswith("-"):
+            continue
+        looks_like_path = os.sep in arg or re.search(r'\.(m?js|cjs|ts|py)$', arg)
+        if looks_like_path and not PLACEHOLDER_PATTERN.search(arg) \
+                and not os.path.exists(os.path.expanduser(arg)):
+            return [_issue("error", f"script not found: {arg}")]
+        return []
+    return []
+
+def _check_npm_package(name: str, server: Dict[str, Any], ctx: ValidationContext) -> List[Dict[str, str]]:
+    """npx entries name a package that is already available offline"""
+    if os.path.basename(server["command"]) != "npx":
+        return []
+    parsed = _parse_npx_args(server)
+    if parsed is None:
+        return [_issue("error", "npx entry does not name a package")]
+    issues = []
+    args = server.get("args", [])
+    if not {"-y", "--yes"} & set(args[:args.index(parsed["spec"])] if parsed["spec"] in args else args):
+        issues.append(_issue("warning", "npx without -y may stop to ask before installing"))
+    source = ctx.package_source(parsed["spec"])
+    if source is None:
+        issues.append(_issue("warning", f"{parsed['spec']} is not in the local npm cache; "
+                                        f"the first start needs network"))
+    return issues
+
+def _check_placeholders(value: str, ctx: ValidationContext, where: str) -> List[Dict[str, str]]:
+    issues = []
+    for match in PLACEHOLDER_PATTERN.finditer(value):
+        if match.group(1) not in ctx.env and match.group(2) is None:
+            issues.append(_issue("warning", f"{where}: {match.group(1)} not in environment"))
+    return issues
+
+def _check_args(name: str, server: Dict[str, Any], ctx: ValidationContext) -> List[Dict[str, str]]:
+    """Args have no unfilled templates, unset placeholders or shell syntax"""
+    issues = []
+    for arg in server.get("args", []):
+        for match in TEMPLATE_PATTERN.finditer(arg):
+            issues.append(_issue("error", f"unfilled template {{{match.group(1)}}} in args"))
+        issues.extend(_check_placeholders(arg, ctx, f"arg {arg}"))
+        if SHELL_SYNTAX_PATTERN.search(PLACEHOLDER_PATTERN.sub("", arg)):
+            issues.append(_issue("warning", f"arg {arg} uses shell syntax, "
+                                            f"but servers are started without a shell"))
+    return issues
+
+def _check_env(name: str, server: Dict[str, Any], ctx: ValidationContext) -> List[Dict[str, str]]:
+    """Env placeholders resolve and secrets are not stored literally"""
+    issues = []
+    for var, value in server.get("env", {}).items():
+        if _env_placeholder(value) is not None:
+            issues.extend(_check_placeholders(value, ctx, var))
+        elif value and SECRET_NAME_PATTERN.search(var):
+            issues.append(_issue("warning", f"{var} holds a literal secret; "
+                                            f"use ${{{var}}} and set it in the environment"))
+    return issues
+
+VALIDATION_RULES = {
+    "structure": _check_structure,
+    "command": _check_command,
+    "script": _check_script,
+    "npm-package": _check_npm_package,
+    "args": _check_args,
+    "env": _check_env,
+}
+
+def _validate_servers(servers: Dict[str, Any], ctx: ValidationContext,
+                      rules: List[str] = None,
+                      concurrency: int = DEFAULT_TEST_CONCURRENCY) -> Dict[str, List[Dict[str, str]]]:
+    """Run validation rules over all servers in parallel"""
+    from concurrent.futures import ThreadPoolExecutor
+    rules = [rule for rule in VALIDATION_RULES if rules is None or rule in rules]
+    
+    def check(name: str) -> List[Dict[str, str]]:
+        server = servers[name]
+        issues = []
+        for rule in rules:
+            if rule != "structure" and (not _runnable(server) or "command" not in server):
+                continue
+            for issue in VALIDATION_RULES[rule](name, server, ctx):
+                issues.append(dict(issue, rule=rule))
+        return issues
+    
+    names = list(servers)
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(names)))) as pool:
+        return dict(zip(names, pool.map(check, names)))
+
+def _locate_key(text: str, key: str) -> Optional[Dict[str, Any]]:
+    """Find and decode the value of a top-level key without parsing the rest
+    
+    Relies on the file being pretty-printed with uniform indentation, as
+    both Claude and mcp-manager write it: top-level keys are the only ones
+    at the indentation of the first key. Returns the decoded value, its
+    character span and the indentation, or None when the key cannot be
+    located unambiguously (the caller then falls back to a full parse).
+    """
+    first = re.match(r'\s*\{[ \t]*\r?\n([ \t]+)"', text)
+    if not first:
+        return None
+    indent = first.group(1)
+    pattern = re.compile(r'\n' + re.escape(indent) + r'"' + re.escape(key) + r'"\s*:\s*')
+    matches = list(pattern.finditer(text))
+    if len(matches) != 1:
+        return None
+    start = matches[0].end()
+    try:
+        value, end = json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError:
+        return None
+    return {"value": value, "start": start, "end": end, "indent": indent}
+
+def _dump_indented(value: Any, indent: str) -> str:
+    """Serialize a value for splicing in at the given key indentation"""
+    dumped = json.dumps(value, indent=len(indent.expandtabs()) or 2)
+    return dumped.replace("\n", "\n" + indent)
+
+def _stat_key(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+def _read_parse_cache(path: Path) -> Optional[Dict[str, Any]]:
+    """Return the cached mcpServers of a config file if it is unchanged"""
+    try:
+        with open(PARSE_CACHE_FILE, 'r') as f:
+            entry = json.load(f).get(str(path))
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return None
+    if entry and entry.get("stat") == _stat_key(path):
+        return entry["servers"]
+    return None
+
+def _write_parse_cache(path: Path, servers: Dict[str, Any], stat: List[int]):
+    """Remember the mcpServers of a config file, keyed by its mtime/size/inode"""
+    try:
+        with open(PARSE_CACHE_FILE, 'r') as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            cache = {}
+    except (OSError, json.JSONDecodeError):
+        cache = {}
+    cache.pop(str(path), None)
+    cache[str(path)] = {"stat": stat, "servers": servers}
+    while len(cache) > PARSE_CACHE_ENTRIES:
+        del cache[next(iter(cache))]
+    try:
+        _write_json_atomic(PARSE_CACHE_FILE, cache)
+    except OSError:
+        pass  # the cache is only an optimization
+
+class _Inotify:
+    """Directory change events from Linux inotify, through ctypes"""
+    
+    EVENT = struct.Struct("iIII")
+    # IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+    
+    def __init__(self, directory: Path):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), self.MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"cannot watch {directory}")
+    
+    def read(self, timeout: Optional[float]) -> List[str]:
+        """Names changed in the directory, waiting up to timeout (None: forever)"""
+        import select
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        names, offset = [], 0
+        while offset + self.EVENT.size <= len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+class ConfigWatcher:
+    """Waits for a file to change: inotify on Linux, stat polling elsewhere
+    
+    The directory is watched rather than the file, so replacements by
+    rename (as editors and mcp-manager itself write) are seen too.
+    """
+    
+    def __init__(self, path: Path, debounce: float = WATCH_DEBOUNCE,
+                 poll_interval: float = WATCH_POLL_INTERVAL, poll: bool = False):
+        self.path = path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.inotify = None
+        if not poll and sys.platform.startswith("linux"):
+            try:
+                self.inotify = _Inotify(path.parent)
+            except (OSError, AttributeError):
+                pass  # fall back to polling
+        self.stat = _stat_key(path)
+    
+    @property
+    def mode(self) -> str:
+        return "inotify" if self.inotify else "polling"
+    
+    def _event(self, timeout: Optional[float]) -> bool:
+        if self.inotify:
+            return self.path.name in self.inotify.read(timeout)
+        time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        stat = _stat_key(self.path)
+        if stat != self.stat:
+            self.stat = stat
+            return True
+        return False
+    
+    def wait(self):
+        """Block until the file changed and then stayed quiet for the debounce time"""
+        while not self._event(None):
+            pass
+        while self._event(self.debounce):
+            pass
+        self.stat = _stat_key(self.path)
+
+def _entry_hash(server: Any) -> str:
+    import hashlib
+    return hashlib.sha256(json.dumps(server, sort_keys=True).encode()).hexdigest()
+
+class BackupStore:
+    """Content-addressed, deduplicated snapshots of config files
+    
+    A snapshot is split into the frame (the file with the mcpServers value
+    cut out) and one object per server entry. Objects are stored once,
+    zlib-compressed and named by their SHA-256, so unchanged frames and
+    entries are shared between snapshots and a change to one server only
+    adds that entry. The formatting of the mcpServers section is kept as a
+    separate object only when it differs from what mcp-manager writes.
+    
+    The index is sharded into one file per config, so saving one of many
+    configs only reads and writes that config's snapshot list. Objects no
+    longer referenced are collected at most every BACKUP_GC_INTERVAL
+    seconds, or on an explicit prune.
+    """
+    
+    SERVERS_MARK = "\0"  # cannot appear in JSON text
+    
+    def __init__(self, root: Path = BACKUP_DIR):
+        self.root = root
+        self.index_dir = root / "index"
+    
+    def _shard_path(self, config: str) -> Path:
+        import hashlib
+        return self.index_dir / (hashlib.sha256(config.encode()).hexdigest()[:16] + ".json")
+    
+    def _load(self, config: str) -> List[Dict[str, Any]]:
+        """Snapshots of one config, oldest first"""
+        try:
+            with open(self._shard_path(config), 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return []
+    
+    def _save(self, config: str, entries: List[Dict[str, Any]]):
+        path = self._shard_path(config)
+        if entries:
+            _write_json_atomic(path, entries, indent=None)
+        else:
+            with contextlib.suppress(OSError):
+                path.unlink()
+    
+    def _shards(self) -> Dict[str, List[Dict[str, Any]]]:
+        shards = {}
+        for path in sorted(self.index_dir.glob("*.json")):
+            try:
+                with open(path, 'r') as f:
+                    entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if entries:
+                shards[entries[0]["config"]] = entries
+        return shards
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest[2:]
+    
+    def _put(self, text: str) -> str:
+        import hashlib
+        import tempfile
+        import zlib
+        data = text.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        try:
+            # A reused object may be unreferenced until our index entry is
+            # saved; make it recent so collect_garbage leaves it alone
+            os.utime(path)
+            return digest
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(zlib.compress(data))
+        os.replace(tmp, path)
+        return digest
+    
+    def _get(self, digest: str) -> str:
+        import zlib
+        with open(self._object_path(digest), 'rb') as f:
+            return zlib.decompress(f.read()).decode()
+    
+    def snapshot(self, config_path: Path, text: str) -> str:
+        """Store the given contents of a config file and return the snapshot id"""
+        import datetime
+        import hashlib
+        entry = {"config": str(config_path), "size": len(text.encode())}
+        found = _locate_key(text, "mcpServers")
+        if found is not None and isinstance(found["value"], dict):
+            servers = found["value"]
+            entry["frame"] = self._put(text[:found["start"]] + self.SERVERS_MARK
+                                       + text[found["end"]:])
+            entry["indent"] = found["indent"]
+            entry["servers"] = [[name, self._put(json.dumps(server))]
+                                for name, server in servers.items()]
+            raw = text[found["start"]:found["end"]]
+            if raw != _dump_indented(servers, found["indent"]):
+                entry["raw"] = self._put(raw)
+        else:
+            entry["frame"] = self._put(text)
+        
+        content = json.dumps([entry.get(key) for key in ("frame", "servers", "raw")])
+        entry["id"] = hashlib.sha256(content.encode()).hexdigest()[:12]
+        entry["timestamp"] = datetime.datetime.now().isoformat(timespec="seconds")
+        
+        with _file_lock(self._shard_path(str(config_path))):
+            entries = self._load(str(config_path))
+            if entries and entries[-1]["id"] == entry["id"]:
+                return entry["id"]  # identical to the most recent snapshot
+            entries.append(entry)
+            kept = self._retain(entries)
+            self._save(str(config_path), kept)
+        if len(kept) < len(entries):
+            self.collect_garbage()
+        return entry["id"]
+    
+    def snapshots(self, config_path: Path = None) -> List[Dict[str, Any]]:
+        """Snapshots of one config file (or all), newest first"""
+        if config_path is not None:
+            return list(reversed(self._load(str(config_path))))
+        entries = [entry for shard in self._shards().values() for entry in shard]
+        return sorted(entries, key=lambda entry: entry["timestamp"], reverse=True)
+    
+    def find(self, snapshot_id: str, config_path: Path = None) -> Dict[str, Any]:
+        """Look up a snapshot by id or unique id prefix"""
+        matches = {entry["id"]: entry for entry in self.snapshots(config_path)
+                   if entry["id"].startswith(snapshot_id)}
+        if not matches:
+            raise KeyError(f"no backup matches '{snapshot_id}'")
+        if len(matches) > 1:
+            raise KeyError(f"'{snapshot_id}' matches several backups")
+        return next(iter(matches.values()))
+    
+    def restore_text(self, entry: Dict[str, Any]) -> str:
+        """Rebuild the exact file contents of a snapshot"""
+        frame = self._get(entry["frame"])
+        if "servers" not in entry:
+            return frame
+        if "raw" in entry:
+            section = self._get(entry["raw"])
+        else:
+            servers = {name: json.loads(self._get(digest)) for name, digest in entry["servers"]}
+            section = _dump_indented(servers, entry["indent"])
+        before, after = frame.split(self.SERVERS_MARK, 1)
+        return before + section + after
+    
+    @staticmethod
+    def _retain(entries: List[Dict[str, Any]], keep_last: int = BACKUP_KEEP_LAST,
+                keep_daily: int = BACKUP_KEEP_DAILY) -> List[Dict[str, Any]]:
+        """Apply the retention policy to one config's snapshots (oldest first)
+        
+        Keeps the newest ``keep_last`` snapshots plus the newest snapshot of
+        each of the last ``keep_daily`` days that have one.
+        """
+        newest_first = list(reversed(entries))
+        keep = {id(entry) for entry in newest_first[:keep_last]}
+        days = []
+        for entry in newest_first:
+            day = entry["timestamp"][:10]
+            if day not in days:
+                days.append(day)
+                if len(days) > keep_daily:
+                    break
+                keep.add(id(entry))
+        return [entry for entry in entries if id(entry) in keep]
+    
+    def prune(self, keep_last: int = BACKUP_KEEP_LAST,
+              keep_daily: int = BACKUP_KEEP_DAILY) -> tuple:
+        """Apply the retention policy to every config and drop unused objects
+        
+        Returns the number of snapshots removed and kept.
+        """
+        removed = kept = 0
+        for config in self._shards():
+            with _file_lock(self._shard_path(config)):
+                entries = self._load(config)
+                retained = self._retain(entries, keep_last, keep_daily)
+                if len(retained) < len(entries):
+                    self._save(config, retained)
+            removed += len(entries) - len(retained)
+            kept += len(retained)
+        self.collect_garbage(force=True)
+        return removed, kept
+    
+    def collect_garbage(self, force: bool = False):
+        """Delete objects no snapshot refers to, at most once per interval"""
+        stamp = self.root / "gc-stamp"
+        try:
+            if not force and time.time() - stamp.stat().st_mtime < BACKUP_GC_INTERVAL:
+                return
+        except OSError:
+            pass
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.touch()
+        
+        used = set()
+        for entries in self._shards().values():
+            for entry in entries:
+                used.add(entry["frame"])
+                used.update(digest for _, digest in entry.get("servers", []))
+                if "raw" in entry:
+                    used.add(entry["raw"])
+        # Objects written in the last minute may belong to a snapshot
+        # that is still being indexed by another process
+        recent = time.time() - 60
+        for path in (self.root / "objects").glob("*/*"):
+            if path.parent.name + path.name not in used:
+                with contextlib.suppress(OSError):
+                    if path.stat().st_mtime < recent:
+                        path.unlink()
+
+def _normalize_registry_entry(name: str, info: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in the optional fields of a registry entry"""
+    entry = dict(info)
+    entry["name"] = name
+    entry.setdefault("description", "")
+    entry.setdefault("args_template", ["-y", "{package}"])
+    entry.setdefault("env_vars", [])
+    return entry
+
+def _read_registry_file(path: Path) -> List[Dict[str, Any]]:
+    """Read registry entries from a JSON or NDJSON catalog file
+    
+    JSON files hold either a mapping of names to entries (like
+    MCP_REGISTRY), a list of entries with a ``name`` key, or such a list
+    under ``servers``. NDJSON files hold one entry with a ``name`` per line.
+    """
+    entries = []
+    with open(path, 'r') as f:
+        if path.suffix in (".ndjson", ".jsonl"):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            document = json.load(f)
+            if isinstance(document, dict) and isinstance(document.get("servers"), list):
+                document = document["servers"]
+            if isinstance(document, dict):
+                items = [dict(info, name=name) for name, info in document.items()]
+            else:
+                items = document
+    for item in items:
+        if isinstance(item, dict) and item.get("name") and item.get("package"):
+            entries.append(_normalize_registry_entry(item["name"], item))
+    return entries
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+class Registry:
+    """Catalog of installable MCP servers with a full-text search index
+    
+    Combines the built-in MCP_REGISTRY with catalog files and directories
+    from MCP_REGISTRY_PATH and --registry; later sources override entries
+    of the same name. Entries are kept in an inverted index in a SQLite
+    file under MANAGER_HOME. Each source is re-indexed only when its mtime
+    or size changes, and a search only reads the postings of the query
+    terms.
+    """
+    
+    def __init__(self, paths: List[str] = None, index_path: Path = REGISTRY_INDEX_FILE):
+        env_paths = [p for p in os.environ.get("MCP_REGISTRY_PATH", "").split(os.pathsep) if p]
+        self.paths = [Path(p).expanduser() for p in env_paths + list(paths or [])]
+        self.index_path = index_path
+        self._db = None
+        self._active = None
+    
+    def _sources(self) -> List[tuple]:
+        """(key, version, loader) for every source, lowest priority first"""
+        import hashlib
+        builtin = json.dumps(MCP_REGISTRY, sort_keys=True)
+        sources = [("<builtin>", hashlib.sha256(builtin.encode()).hexdigest(),
+                    lambda: [_normalize_registry_entry(name, info)
+                             for name, info in MCP_REGISTRY.items()])]
+        for path in self.paths:
+            if path.is_dir():
+                files = sorted(p for p in path.rglob("*") if p.suffix in REGISTRY_SUFFIXES)
+            elif path.exists():
+                files = [path]
+            else:
+                print(f"{Colors.YELLOW}⚠ Registry source not found: {path}{Colors.NC}",
+                      file=sys.stderr)
+                continue
+            for file in files:
+                st = file.stat()
+                sources.append((str(file.resolve()), f"{st.st_mtime_ns}:{st.st_size}",
+                                lambda file=file: _read_registry_file(file)))
+        return sources
+    
+    @_phase("registry index")
+    def _connect(self) -> "sqlite3.Connection":
+        if self._db is not None:
+            return self._db
+        import sqlite3
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.index_path), timeout=LOCK_TIMEOUT)
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                id INTEGER PRIMARY KEY, key TEXT UNIQUE, version TEXT);
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY, source_id INTEGER, name TEXT, data TEXT);
+            CREATE INDEX IF NOT EXISTS entries_name ON entries (name);
+            CREATE INDEX IF NOT EXISTS entries_source ON entries (source_id);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT, entry_id INTEGER, weight REAL,
+                PRIMARY KEY (term, entry_id)) WITHOUT ROWID;
+        """)
+        
+        active = []
+        for key, version, loader in self._sources():
+            row = db.execute("SELECT id, version FROM sources WHERE key = ?", (key,)).fetchone()
+            if row and row[1] == version:
+                active.append(row[0])
+                continue
+            try:
+                entries = loader()
+            except (OSError, ValueError) as e:
+                print(f"{Colors.YELLOW}⚠ Cannot read registry {key}: {e}{Colors.NC}",
+                      file=sys.stderr)
+                continue
+            with db:
+                # Look again under the write lock: another process may have
+                # indexed this source since the check above
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute("SELECT id, version FROM sources WHERE key = ?", (key,)).fetchone()
+                if row and row[1] == version:
+                    source_id = row[0]
+                elif row:
+                    source_id = row[0]
+                    db.execute("DELETE FROM postings WHERE entry_id IN "
+                               "(SELECT id FROM entries WHERE source_id = ?)", (source_id,))
+                    db.execute("DELETE FROM entries WHERE source_id = ?", (source_id,))
+                    db.execute("UPDATE sources SET version = ? WHERE id = ?", (version, source_id))
+                    self._index_entries(db, source_id, entries)
+                else:
+                    source_id = db.execute("INSERT INTO sources (key, version) VALUES (?, ?)",
+                                           (key, version)).lastrowid
+                    self._index_entries(db, source_id, entries)
+            active.append(source_id)
+        
+        self._db = db
+        self._active = active
+        return db
+    
+    @staticmethod
+    def _index_entries(db: "sqlite3.Connection", source_id: int, entries: List[Dict[str, Any]]):
+        postings = []
+        for entry in entries:
+            entry_id = db.execute("INSERT INTO entries (source_id, name, data) VALUES (?, ?, ?)",
+                                  (source_id, entry["name"], json.dumps(entry))).lastrowid
+            weights = collections.Counter()
+            for field, weight in REGISTRY_FIELD_WEIGHTS.items():
+                value = entry.get(field, "")
+                if isinstance(value, list):
+                    value = " ".join(map(str, value))
+                for term in set(_tokenize(str(value))):
+                    weights[term] += weight
+            postings.extend((term, entry_id, weight) for term, weight in weights.items())
+        db.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+    
+    def _rank(self) -> str:
+        """SQL expression ordering sources by priority"""
+        return "CASE source_id " + " ".join(
+            f"WHEN {source_id} THEN {rank}" for rank, source_id in enumerate(self._active)
+        ) + " END"
+    
+    def _placeholders(self) -> str:
+        return ",".join("?" * len(self._active))
+    
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Look up the effective entry for a server name"""
+        db = self._connect()
+        row = db.execute(f"SELECT data FROM entries WHERE name = ? "
+                         f"AND source_id IN ({self._placeholders()}) "
+                         f"ORDER BY {self._rank()} DESC LIMIT 1",
+                         [name] + self._active).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+    
+    def entries(self) -> List[Dict[str, Any]]:
+        """All effective entries, in source order"""
+        db = self._connect()
+        effective = {}
+        for name, data in db.execute(f"SELECT name, data FROM entries "
+                                     f"WHERE source_id IN ({self._placeholders()}) "
+                                     f"ORDER BY {self._rank()}, id", self._active):
+            effective[name] = data
+        return [json.loads(data) for data in effective.values()]
+    
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[tuple]:
+        """Rank entries matching every query term (or term prefix)
+        
+        Scores sum, per query term, the field weight of the best matching
+        index term times its inverse document frequency; prefix-only
+        matches count half. Returns (score, entry) pairs, best first.
+        """
+        import math
+        terms = _tokenize(query)
+        if not terms:
+            return []
+        db = self._connect()
+        placeholders = self._placeholders()
+        total = db.execute(f"SELECT COUNT(*) FROM entries WHERE source_id IN ({placeholders})",
+                           self._active).fetchone()[0] or 1
+        
+        scores = None
+        for query_term in terms:
+            rows = db.execute(f"SELECT p.term, p.entry_id, p.weight FROM postings p "
+                              f"JOIN entries e ON e.id = p.entry_id "
+                              f"WHERE p.term >= ? AND p.term < ? "
+                              f"AND e.source_id IN ({placeholders})",
+                              [query_term, query_term + "\uffff"] + self._active).fetchall()
+            df = collections.Counter(term for term, _, _ in rows)
+            best = {}
+            for term, entry_id, weight in rows:
+                score = weight * math.log(1 + total / df[term])
+                if term != query_term:
+                    score /= 2
+                if score > best.get(entry_id, 0):
+                    best[entry_id] = score
+            if scores is None:
+                scores = best
+            else:
+                scores = {entry_id: score + best[entry_id]
+                          for entry_id, score in scores.items() if entry_id in best}
+            if not scores:
+                return []
+        
+        for (entry_id,) in db.execute("SELECT id FROM entries WHERE name = ?",
+                                      (query.strip(),)):
+            if entry_id in scores:
+                scores[entry_id] *= 2  # exact name match
+        
+        results = []
+        for entry_id, score in sorted(scores.items(), key=lambda item: -item[1]):
+            name, data = db.execute("SELECT name, data FROM entries WHERE id = ?",
+                                    (entry_id,)).fetchone()
+            entry = json.loads(data)
+            if self.get(name) != entry:
+                continue  # overridden by a higher-priority source
+            results.append((score, entry))
+            if len(results) >= limit:
+                break
+        return results
+
+def _expand_registry(info: Dict[str, Any], params: Dict[str, str] = None) -> Dict[str, Any]:
+    """Build a server entry from a registry entry and values for its prompts"""
+    params = dict(params or {})
+    params.setdefault("package", info["package"])
+    if "path" in info.get("prompts", {}):
+        params.setdefault("path", "$HOME")
+    args = []
+    for arg in info["args_template"]:
+        for key, value in params.items():
+            arg = arg.replace(f"{{{key}}}", value)
+        args.append(arg)
+    entry = {"command": "npx", "args": args}
+    if info["env_vars"]:
+        entry["env"] = {var: f"${{{var}}}" for var in info["env_vars"]}
+    return entry
+
+def _read_document(path: str) -> Dict[str, Any]:
+    """Read a JSON or YAML (needs PyYAML) mapping"""
+    with open(path, 'r') as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required for YAML files (pip install pyyaml)")
+            document = yaml.safe_load(f)
+        else:
+            document = json.load(f)
+    if not isinstance(document, dict):
+        raise ValueError(f"{path} must contain a mapping")
+    return document
+
+def _load_manifest(path: str, registry: "Registry" = None) -> Dict[str, Any]:
+    """Read the desired mcpServers from a JSON or YAML manifest
+    
+    The manifest is either a config-style document with an ``mcpServers``
+    key or a plain mapping of server names to entries. Entries without a
+    ``command`` are expanded from the registry (by name, or by their
+    ``registry`` key), filling prompts from ``params``; an ``env`` given
+    alongside is merged over the registry's placeholders.
+    """
+    document = _read_document(path)
+    servers = document.get("mcpServers", document)
+    if not isinstance(servers, dict):
+        raise ValueError("mcpServers must be a mapping")
+    
+    registry = registry or Registry()
+    desired = {}
+    for name, entry in servers.items():
+        entry = dict(entry or {})
+        if "command" not in entry:
+            source = entry.pop("registry", name)
+            info = registry.get(source)
+            if info is None:
+                raise ValueError(f"'{name}' has no command and '{source}' is not in the registry")
+            expanded = _expand_registry(info, entry.pop("params", None))
+            if "env" in entry:
+                expanded.setdefault("env", {}).update(entry.pop("env"))
+            expanded.update(entry)
+            entry = expanded
+        desired[name] = entry
+    return desired
+
+def _diff_servers(current: Dict[str, Any], desired: Dict[str, Any],
+                  prune: bool = False) -> Dict[str, List[str]]:
+    """Plan the changes that turn the current mcpServers into the desired ones"""
+    plan = {"add": [], "change": [], "remove": [], "same": []}
+    for name, entry in desired.items():
+        if name not in current:
+            plan["add"].append(name)
+        elif current[name] != entry:
+            plan["change"].append(name)
+        else:
+            plan["same"].append(name)
+    if prune:
+        plan["remove"] = [name for name in current if name not in desired]
+    return plan
+
+def _describe_change(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    fields = sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+    return ", ".join(fields)
+
+@_phase("probe servers")
+def _run_probes(servers: Dict[str, Any], names: List[str],
+                concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                timeout: float = DEFAULT_TEST_TIMEOUT,
+                probe: str = "handshake", base_env: Dict[str, str] = None,
+                on_result=None, **options):
+    """Probe servers on a thread pool; returns (results in completion order, wall time)
+    
+    Extra ``options`` (``resources``, ``soak``) go to the handshake probe.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    workers = max(1, min(concurrency, len(names)))
+    results = []
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(PROBES[probe], name, servers[name], timeout, base_env, **options)
+                   for name in names]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+    
+    if probe == "handshake":
+        _record_tools(servers, results)
+    if not options.get("soak"):
+        _record_health(servers, results, probe)
+    return results, time.monotonic() - start
+
+def _record_tools(servers: Dict[str, Any], results: List[Dict[str, Any]]):
+    """Save the tools of successful handshakes to the catalog"""
+    if any(result["ok"] for result in results):
+        catalog = ToolCatalog()
+        for result in results:
+            if result["ok"]:
+                catalog.put(servers[result["name"]], result)
+        with contextlib.suppress(OSError, TimeoutError):
+            catalog.save()
+
+def _record_health(servers: Dict[str, Any], results: List[Dict[str, Any]], probe: str):
+    """Save probe outcomes to the health cache"""
+    if results:
+        health = HealthCache()
+        for result in results:
+            health.put(servers[result["name"]], result, probe)
+        with contextlib.suppress(OSError, TimeoutError):
+            health.save()
+
+def _cached_results(servers: Dict[str, Any], names: List[str], probe: str,
+                    max_age: float) -> Dict[str, Dict[str, Any]]:
+    """Health cache results no older than max_age, as probe results marked ``cached``"""
+    health = HealthCache()
+    cached = {}
+    for name in names:
+        entry = health.get(name, servers[name], probe)
+        if entry and entry["age"] <= max_age:
+            cached[name] = dict({field: entry[field] for field in HealthCache.FIELDS},
+                                name=name, cached=True, age=entry["age"])
+    return cached
+
+def _prometheus_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _prometheus_text(rows: List[Dict[str, Any]], labels: Dict[str, str]) -> str:
+    """Render server health rows in the Prometheus text exposition format"""
+    gauges = (
+        ("mcp_server_up", "up", "Whether the last probe of the server succeeded."),
+        ("mcp_server_startup_seconds", "startup",
+         "Seconds from spawn until the server answered initialize."),
+        ("mcp_server_last_probe_age_seconds", "age", "Seconds since the server was last probed."),
+        ("mcp_server_last_probe_timestamp_seconds", "probed_at",
+         "Unix time of the last probe of the server."),
+    )
+    lines = []
+    for metric, field, help_text in gauges:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for row in rows:
+            if row[field] is None:
+                continue
+            label = ",".join(f'{key}="{_prometheus_label(value)}"'
+                             for key, value in dict(labels, server=row["server"]).items())
+            lines.append(f"{metric}{{{label}}} {float(row[field])}")
+    return "\n".join(lines) + "\n"
+
+class ProgressDisplay:
+    """One status line per item, redrawn in place on a terminal
+    
+    When output is not a terminal each update is printed as its own line
+    instead, so logs stay readable.
+    """
+    
+    def __init__(self, names: List[str], stream=None):
+        import threading
+        self.stream = stream or sys.stdout
+        self.live = self.stream.isatty()
+        self.width = max([len(name) for name in names] + [4])
+        self.lines = {name: (Colors.NC, "waiting", None) for name in names}
+        self.lock = threading.Lock()
+        self.drawn = 0
+        self.stopped = threading.Event()
+        if self.live:
+            threading.Thread(target=self._tick, daemon=True).start()
+    
+    def _line(self, name: str) -> str:
+        color, status, started = self.lines[name]
+        elapsed = f" {time.monotonic() - started:.1f}s" if started and self.live else ""
+        return f"  {color}{name:<{self.width}}{Colors.NC}  {status}{elapsed}"
+    
+    def _draw(self):
+        if self.drawn:
+            self.stream.write(f"\033[{self.drawn}F")
+        for name in self.lines:
+            self.stream.write("\033[K" + self._line(name) + "\n")
+        self.drawn = len(self.lines)
+        self.stream.flush()
+    
+    def _tick(self):
+        while not self.stopped.wait(0.2):
+            with self.lock:
+                self._draw()
+    
+    def update(self, name: str, status: str, color: str = Colors.NC, running: bool = False):
+        with self.lock:
+            self.lines[name] = (color, status, time.monotonic() if running else None)
+            if self.live:
+                self._draw()
+            else:
+                print(self._line(name), file=self.stream, flush=True)
+    
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            if self.live:
+                self._draw()
+
+def _parse_answers(assignments: List[str] = None, answers_file: str = None) -> Dict[str, Dict[str, str]]:
+    """Prompt answers per server from --answers and --set NAME.KEY=VALUE
+    
+    A ``--set KEY=VALUE`` without a server name answers that prompt for
+    every server, under the "*" key.
+    """
+    answers = collections.defaultdict(dict)
+    if answers_file:
+        for name, values in _read_document(answers_file).items():
+            if not isinstance(values, dict):
+                raise ValueError(f"answers for '{name}' must be a mapping")
+            answers[name].update({key: str(value) for key, value in values.items()})
+    for assignment in assignments or []:
+        target, sep, value = assignment.partition("=")
+        if not sep or not target:
+            raise ValueError(f"expected NAME.KEY=VALUE, got '{assignment}'")
+        name, _, key = target.rpartition(".")
+        answers[name or "*"][key] = value
+    return answers
+
+class DaemonClient:
+    """Calls a running ``serve`` daemon over its Unix-domain socket"""
+    
+    def __init__(self, config_path: Optional[Path], socket_path: Path = DAEMON_SOCKET):
+        self.config_path = config_path
+        self.socket_path = socket_path
+    
+    def call(self, method: str, params: Dict[str, Any] = None) -> Any:
+        """Run a method in the daemon; raises OSError if it is unreachable"""
+        import socket
+        params = dict(params or {}, config=str(self.config_path))
+        request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(str(self.socket_path))
+            sock.settimeout(None)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile('rb') as f:
+                line = f.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise MCPError(response["error"]["message"])
+        return response["result"]
+
+class ManagerDaemon:
+    """Keeps an MCPManager resident behind a Unix-domain socket
+    
+    Speaks newline-delimited JSON-RPC 2.0 (one request per line, any
+    number per connection). The parsed configuration is kept between
+    calls and dropped whenever the config file's mtime/size/inode change.
+    """
+    
+    def __init__(self, manager: "MCPManager", socket_path: Path = DAEMON_SOCKET,
+                 poll_interval: float = DAEMON_POLL_INTERVAL):
+        import datetime
+        import threading
+        self.manager = manager
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.lock = threading.RLock()
+        self.server = None
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+    
+    def _watch(self):
+        last = _stat_key(self.manager.config_path) if self.manager.config_path else None
+        while True:
+            time.sleep(self.poll_interval)
+            path = self.manager.config_path or self.manager._find_config()
+            key = _stat_key(path) if path else None
+            if key != last:
+                last = key
+                with self.lock:
+                    self.manager.config_path = self.manager._find_config()
+                    self._forget()
+    
+    def _forget(self):
+        """Drop the cached config so the next call reads the file again"""
+        self.manager._config = self.manager._servers = self.manager._base = None
+    
+    def _save(self):
+        """Save the manager's config; if that fails, drop the unsaved change"""
+        try:
+            self.manager._save_config()
+        except (OSError, TimeoutError):
+            self._forget()
+            raise
+    
+    def rpc_ping(self, params):
+        return {"pid": os.getpid(), "started": self.started,
+                "config": str(self.manager.config_path)}
+    
+    def rpc_list(self, params):
+        with self.lock:
+            return self.manager.server_inventory()
+    
+    def rpc_validate(self, params):
+        with self.lock:
+            return self.manager.validation_report(
+                env=params.get("env"), skip=params.get("skip"),
+                concurrency=params.get("concurrency", DEFAULT_TEST_CONCURRENCY))
+    
+    def rpc_test(self, params):
+        with self.lock:
+            servers = json.loads(json.dumps(self.manager.servers))
+        names = params.get("names") or list(servers)
+        missing = [name for name in names if name not in servers]
+        names = [name for name in names if name in servers]
+        results, wall = _run_probes(servers, names,
+                                    concurrency=params.get("concurrency", DEFAULT_TEST_CONCURRENCY),
+                                    timeout=params.get("timeout", DEFAULT_TEST_TIMEOUT),
+                                    probe=params.get("probe", "handshake"),
+                                    base_env=params.get("env"),
+                                    **params.get("options", {}))
+        return {"results": results, "wall": wall, "missing": missing}
+    
+    def rpc_add(self, params):
+        name = params["name"]
+        entry = params.get("entry")
+        if entry is None:
+            info = self.manager.registry.get(params.get("registry", name))
+            if info is None:
+                raise ValueError(f"'{name}' is not in the registry; pass an entry")
+            entry = _expand_registry(info, params.get("params"))
+        with self.lock:
+            if name in self.manager.servers and not params.get("force"):
+                raise ValueError(f"Server '{name}' already exists")
+            self.manager.servers[name] = entry
+            self._save()
+        return {"added": name, "entry": entry}
+    
+    def rpc_remove(self, params):
+        name = params["name"]
+        with self.lock:
+            if name not in self.manager.servers:
+                raise ValueError(f"Server '{name}' not found")
+            del self.manager.servers[name]
+            self._save()
+        return {"removed": name}
+    
+    def rpc_shutdown(self, params):
+        import threading
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return {"stopping": True}
+    
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        handler = getattr(self, f"rpc_{request.get('method')}", None)
+        params = request.get("params") or {}
+        if handler is None:
+            reply["error"] = {"code": -32601, "message": f"Method not found: {request.get('method')}"}
+        elif params.get("config") not in (None, str(self.manager.config_path)):
+            reply["error"] = {"code": -32001, "message": "daemon serves a different config file"}
+        else:
+            try:
+                reply["result"] = handler(params)
+            except (KeyError, ValueError, TypeError) as e:
+                reply["error"] = {"code": -32602, "message": str(e)}
+            except (OSError, TimeoutError) as e:
+                reply["error"] = {"code": -32000, "message": str(e)}
+        return reply
+    
+    def serve(self):
+        """Serve until interrupted or asked to shut down"""
+        import signal
+        import socketserver
+        import threading
+        daemon = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        reply = {"jsonrpc": "2.0", "id": None,
+                                 "error": {"code": -32700, "message": "Parse error"}}
+                    else:
+                        reply = daemon.handle(request)
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+                    self.wfile.flush()
+        
+        if self.socket_path.exists():
+            try:
+                DaemonClient(None, self.socket_path).call("ping")
+                raise RuntimeError(f"a daemon is already listening on {self.socket_path}")
+            except OSError:
+                self.socket_path.unlink()  # stale socket
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        old_umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_threads = True
+        threading.Thread(target=self._watch, daemon=True).start()
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(
+            target=self.server.shutdown, daemon=True).start())
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            with contextlib.suppress(OSError):
+                self.socket_path.unlink()
+
+def _pool_env(original: Dict[str, Any], client_env: Dict[str, str]) -> Dict[str, str]:
+    """Environment for a pooled server, taking the entry's variables from the client"""
+    base = dict(os.environ)
+    for var, value in original.get("env", {}).items():
+        for key in (var, _env_placeholder(value)):
+            if key and key in client_env:
+                base[key] = client_env[key]
+    return _server_env(original, base)
+
+class PooledServer:
+    """One warm server process shared by any number of attached clients"""
+    
+    def __init__(self, key: str, name: str, cmd: List[str], env: Dict[str, str]):
+        import threading
+        self.key = key
+        self.name = name
+        self.session = StdioSession(cmd, env=env)
+        self.session.on_notification = self._broadcast
+        self.init_result = None
+        self.error = None
+        self.ready = threading.Event()
+        self.clients = set()
+        self.last_used = time.monotonic()
+        self.started = None
+    
+    def start(self):
+        try:
+            self.session.start()
+            self.init_result = self.session.initialize(POOL_START_TIMEOUT)
+            self.started = time.monotonic()
+        except (OSError, MCPError) as e:
+            self.error = str(e)
+            self.session.close(grace=0)
+        finally:
+            self.ready.set()
+    
+    def _broadcast(self, message: Dict[str, Any]):
+        for client in list(self.clients):
+            client.send(message)
+
+class PoolClient:
+    """An attached client connection and the requests it has in flight"""
+    
+    def __init__(self, wfile):
+        import threading
+        self.wfile = wfile
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Any, int] = {}  # client request id -> server request id
+    
+    def send(self, message: Dict[str, Any]):
+        data = json.dumps(message, separators=(",", ":")).encode() + b"\n"
+        with self.lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except (OSError, ValueError):
+                pass
+
+class ServerPool:
+    """Keeps warm MCP server processes and shares them between clients
+    
+    ``attach`` clients connect over a Unix-domain socket and name the
+    pooled config entry they stand in for. Clients of the same entry (with
+    the same environment) share one process: their JSON-RPC request ids
+    are remapped onto the server's id space and responses routed back.
+    ``initialize`` is answered from the handshake the pool did when it
+    started the process. Processes without clients are stopped after
+    ``idle_timeout`` seconds or when room is needed for a new one.
+    """
+    
+    def __init__(self, config_path: Path, socket_path: Path = POOL_SOCKET,
+                 max_size: int = DEFAULT_POOL_MAX_SIZE,
+                 idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT):
+        import threading
+        self.config_path = config_path
+        self.socket_path = socket_path
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.instances: Dict[str, PooledServer] = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.server = None
+    
+    def _original(self, config: str, name: str) -> Dict[str, Any]:
+        layer = RewriteLedger().layer(Path(config), name, "pool")
+        if layer is None:
+            raise ValueError(f"'{name}' is not pooled in {config}")
+        return layer["original"]
+    
+    def acquire(self, config: str, name: str, client_env: Dict[str, str]) -> PooledServer:
+        """Find or start the warm process for a pooled entry"""
+        import hashlib
+        import threading
+        original = self._original(config, name)
+        env = _pool_env(original, client_env)
+        cmd = [original.get("command", "")] + original.get("args", [])
+        identity = {"config": config, "cmd": cmd,
+                    "env": {var: env.get(var) for var in original.get("env", {})}}
+        key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+        
+        with self.lock:
+            instance = self.instances.get(key)
+            if instance and instance.ready.is_set() and not instance.session.alive:
+                del self.instances[key]
+                instance = None
+            if instance is None:
+                if len(self.instances) >= self.max_size:
+                    idle = [i for i in self.instances.values() if not i.clients and i.ready.is_set()]
+                    if not idle:
+                        raise ValueError(f"pool is full ({self.max_size} servers in use)")
+                    self._evict(min(idle, key=lambda i: i.last_used))
+                instance = self.instances[key] = PooledServer(key, name, cmd, env)
+                threading.Thread(target=instance.start, daemon=True).start()
+            self.instances.move_to_end(key)
+        
+        instance.ready.wait()
+        if instance.error:
+            with self.lock:
+                if self.instances.get(key) is instance:
+                    del self.instances[key]
+            raise ValueError(f"'{name}' failed to start: {instance.error}")
+        return instance
+    
+    def _evict(self, instance: PooledServer):
+        import threading
+        del self.instances[instance.key]
+        threading.Thread(target=instance.session.close, daemon=True).start()
+    
+    def _reap(self):
+        while True:
+            time.sleep(min(5, self.idle_timeout))
+            now = time.monotonic()
+            with self.lock:
+                for instance in list(self.instances.values()):
+                    if not instance.ready.is_set() or instance.clients:
+                        continue
+                    if now - instance.last_used > self.idle_timeout or not instance.session.alive:
+                        self._evict(instance)
+    
+    def warm(self):
+        """Start every entry pooled in the config ahead of the first client"""
+        ledger = RewriteLedger()
+        for name, layers in ledger.data.get(str(self.config_path), {}).items():
+            if any(layer["kind"] == "pool" for layer in layers):
+                try:
+                    self.acquire(str(self.config_path), name, dict(os.environ))
+                    print(f"  {Colors.GREEN}✓{Colors.NC} {name}", flush=True)
+                except ValueError as e:
+                    print(f"  {Colors.RED}✗{Colors.NC} {e}", flush=True)
+    
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self.lock:
+            return [{"name": i.name, "pid": i.session.proc.pid if i.session.proc else None,
+                     "clients": len(i.clients), "alive": i.session.alive,
+                     "idle": round(now - i.last_used, 1) if not i.clients else 0}
+                    for i in self.instances.values()]
+    
+    def relay(self, instance: PooledServer, client: PoolClient, rfile):
+        """Forward one client's messages to the shared server until it disconnects"""
+        from concurrent.futures import Future, wait
+        session = instance.session
+        pending = set()
+        for line in rfile:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(message, dict) or "method" not in message:
+                continue  # responses to server requests are answered by the session
+            method = message["method"]
+            if "id" not in message:
+                if method == "notifications/initialized":
+                    continue
+                if method == "notifications/cancelled":
+                    server_id = client.in_flight.get((message.get("params") or {}).get("requestId"))
+                    if server_id is None:
+                        continue
+                    message = dict(message, params=dict(message["params"], requestId=server_id))
+                with contextlib.suppress(MCPError):
+                    session.notify(method, message.get("params"))
+                continue
+            
+            client_id = message["id"]
+            if method == "initialize":
+                client.send({"jsonrpc": "2.0", "id": client_id, "result": instance.init_result})
+                continue
+            try:
+                future = session.send_request(method, message.get("params"))
+            except MCPError as e:
+                client.send({"jsonrpc": "2.0", "id": client_id,
+                             "error": {"code": -32000, "message": str(e)}})
+                continue
+            client.in_flight[client_id] = future.request_id
+            sent = Future()
+            pending.add(sent)
+            
+            def respond(future, client_id=client_id, sent=sent):
+                client.in_flight.pop(client_id, None)
+                try:
+                    response = dict(future.result(), id=client_id)
+                except MCPError as e:
+                    response = {"jsonrpc": "2.0", "id": client_id,
+                                "error": {"code": -32000, "message": str(e)}}
+                client.send(response)
+                sent.set_result(None)
+            future.add_done_callback(respond)
+        
+        # The client may close its side right after its last request
+        wait(pending, timeout=POOL_START_TIMEOUT)
+    
+    def serve(self, warm: bool = False):
+        """Serve until interrupted or asked to shut down"""
+        import signal
+        import socketserver
+        import threading
+        pool = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    hello = json.loads(self.rfile.readline() or b"{}")
+                except ValueError:
+                    return
+                client = PoolClient(self.wfile)
+                op = hello.get("op")
+                if op == "status":
+                    client.send({"ok": True, "instances": pool.status()})
+                    return
+                if op == "shutdown":
+                    client.send({"ok": True})
+                    threading.Thread(target=pool.server.shutdown, daemon=True).start()
+                    return
+                try:
+                    instance = pool.acquire(hello["config"], hello["server"], hello.get("env", {}))
+                except (KeyError, ValueError) as e:
+                    client.send({"ok": False, "error": str(e)})
+                    return
+                with pool.lock:
+                    instance.clients.add(client)
+                client.send({"ok": True, "pid": instance.session.proc.pid})
+                try:
+                    pool.relay(instance, client, self.rfile)
+                finally:
+                    with pool.lock:
+                        instance.clients.discard(client)
+                        instance.last_used = time.monotonic()
+        
+        if self.socket_path.exists():
+            try:
+                _pool_call({"op": "status"}, self.socket_path)
+                raise RuntimeError(f"a pool is already listening on {self.socket_path}")
+            except OSError:
+                self.socket_path.unlink()  # stale socket
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        old_umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_threads = True
+        threading.Thread(target=self._reap, daemon=True).start()
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(
+            target=self.server.shutdown, daemon=True).start())
+        if warm:
+            threading.Thread(target=self.warm, daemon=True).start()
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            with contextlib.suppress(OSError):
+                self.socket_path.unlink()
+            with self.lock:
+                instances = list(self.instances.values())
+                self.instances.clear()
+            for instance in instances:
+                instance.session.close(grace=0.5)
+
+def _pool_call(hello: Dict[str, Any], socket_path: Path = POOL_SOCKET) -> Dict[str, Any]:
+    """Send a control request to the pool; raises OSError if it is unreachable"""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(hello).encode() + b"\n")
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("pool closed the connection")
+    return json.loads(line)
+
+def _attach(name: str, config_path: str, socket_path: Path = POOL_SOCKET) -> int:
+    """Stand in for a pooled server on stdio, relaying to the pool
+    
+    When the pool is not running (or cannot take the client) the original
+    server command is exec'd instead, so a pooled entry always works.
+    """
+    import socket
+    import threading
+    sock = None
+    if hasattr(socket, "AF_UNIX"):
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(str(socket_path))
+            hello = {"op": "attach", "server": name, "config": config_path,
+                     "env": dict(os.environ)}
+            sock.sendall(json.dumps(hello).encode() + b"\n")
+            reader = sock.makefile('rb')
+            reply = json.loads(reader.readline() or b"{}")
+            if not reply.get("ok"):
+                print(f"mcp-manager attach: {reply.get('error', 'pool refused')}; "
+                      f"starting directly", file=sys.stderr)
+                sock.close()
+                sock = None
+        except (OSError, ValueError):
+            if sock:
+                sock.close()
+            sock = None
+    
+    if sock is None:
+        layer = RewriteLedger().layer(Path(config_path), name, "pool")
+        if layer is None:
+            print(f"mcp-manager attach: '{name}' is not pooled in {config_path}", file=sys.stderr)
+            return 1
+        original = layer["original"]
+        cmd = [original.get("command", "")] + original.get("args", [])
+        os.execvpe(cmd[0], cmd, _server_env(original))
+    
+    def pump_stdin():
+        stdin = sys.stdin.buffer
+        for line in iter(stdin.readline, b""):
+            sock.sendall(line)
+        with contextlib.suppress(OSError):
+            sock.shutdown(socket.SHUT_WR)
+    
+    threading.Thread(target=pump_stdin, daemon=True).start()
+    stdout = sys.stdout.buffer
+    for line in reader:
+        stdout.write(line)
+        stdout.flush()
+    return 0
+
+class TraceRing:
+    """Fixed-size ring of JSON-RPC call records in a memory-mapped file
+    
+    The file is a header (magic, record size, capacity, records written)
+    followed by ``capacity`` fixed-size records, so it never grows: once
+    full, the oldest records are overwritten. Writers pack each record
+    straight into the mapping under a short flock, which lets several
+    relays (one per Claude session) share a ring.
+    """
+    
+    MAGIC = b"MCPTRACE"
+    HEADER = struct.Struct("<8sIII4xQ")
+    HEADER_SIZE = 64
+    # start (epoch s), latency (s, -1 if none), request bytes, response bytes,
+    # flags, method, tool name
+    RECORD = struct.Struct("<dfIIB3x48s64s")
+    ERROR, NOTIFICATION, UNANSWERED = 1, 2, 4
+    
+    def __init__(self, path: Path, capacity: int = DEFAULT_TRACE_CAPACITY, reset: bool = False):
+        import mmap
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if reset:
+            # A new file, so relays still mapping the old one are unaffected
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.file = os.fdopen(fd, 'r+b')
+        self._lock(fcntl.LOCK_EX if fcntl else None)
+        try:
+            header = self.file.read(self.HEADER.size)
+            valid = (len(header) == self.HEADER.size and header[:8] == self.MAGIC
+                     and self.HEADER.unpack(header)[2] == self.RECORD.size)
+            if reset or not valid:
+                self.file.seek(0)
+                self.file.truncate(self.HEADER_SIZE + capacity * self.RECORD.size)
+                self.file.write(self.HEADER.pack(self.MAGIC, 1, self.RECORD.size, capacity, 0))
+                self.file.flush()
+            self.map = mmap.mmap(self.file.fileno(), 0)
+            self.capacity = self.HEADER.unpack_from(self.map)[3]
+        finally:
+            self._lock(fcntl.LOCK_UN if fcntl else None)
+    
+    def _lock(self, operation):
+        if operation is not None:
+            fcntl.flock(self.file, operation)
+    
+    def append(self, start: float, latency: float, request_size: int, response_size: int,
+               flags: int, method: str, tool: str = ""):
+        self._lock(fcntl.LOCK_EX if fcntl else None)
+        try:
+            written = self.HEADER.unpack_from(self.map)[4]
+            offset = self.HEADER_SIZE + (written % self.capacity) * self.RECORD.size
+            self.RECORD.pack_into(self.map, offset, start, latency, request_size,
+                                  response_size, flags, method.encode()[:48], tool.encode()[:64])
+            struct.pack_into("<Q", self.map, self.HEADER.size - 8, written + 1)
+        finally:
+            self._lock(fcntl.LOCK_UN if fcntl else None)
+    
+    def records(self) -> List[Dict[str, Any]]:
+        """All records still in the ring, oldest first"""
+        self._lock(fcntl.LOCK_SH if fcntl else None)
+        try:
+            written = self.HEADER.unpack_from(self.map)[4]
+            first = max(0, written - self.capacity)
+            raw = [self.RECORD.unpack_from(self.map, self.HEADER_SIZE
+                                           + (index % self.capacity) * self.RECORD.size)
+                   for index in range(first, written)]
+        finally:
+            self._lock(fcntl.LOCK_UN if fcntl else None)
+        return [{"start": start, "latency": latency if latency >= 0 else None,
+                 "request_bytes": request_size, "response_bytes": response_size,
+                 "error": bool(flags & self.ERROR), "notification": bool(flags & self.NOTIFICATION),
+                 "unanswered": bool(flags & self.UNANSWERED),
+                 "method": method.rstrip(b"\0").decode(errors="replace"),
+                 "tool": tool.rstrip(b"\0").decode(errors="replace")}
+                for start, latency, request_size, response_size, flags, method, tool in raw]
+    
+    @property
+    def written(self) -> int:
+        return self.HEADER.unpack_from(self.map)[4]
+    
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+def _trace_path(config_path: Path, name: str) -> Path:
+    import hashlib
+    digest = hashlib.sha256(str(config_path).encode()).hexdigest()[:8]
+    return TRACE_DIR / f"{digest}-{re.sub(r'[^A-Za-z0-9._-]', '_', name)}.ring"
+
+def _response_info(line: bytes) -> tuple:
+    """(id, is_error) of a server message, without decoding large results
+    
+    A response's top-level "id" comes before "result"/"error" in what
+    practically every server writes, and any "id" inside the result comes
+    after, so the prefix is enough; otherwise the line is decoded.
+    """
+    head = line[:512]
+    match = re.search(rb'"id"\s*:\s*(-?\d+|"(?:[^"\\]|\\.)*")', head)
+    result_at, error_at = head.find(b'"result"'), head.find(b'"error"')
+    if match and all(at == -1 or match.start() < at for at in (result_at, error_at)):
+        if result_at != -1 or error_at != -1:
+            is_error = error_at != -1 and (result_at == -1 or error_at < result_at)
+            return json.loads(match.group(1)), is_error
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None, False
+    if not isinstance(message, dict) or "method" in message:
+        return None, False
+    return message.get("id"), "error" in message
+
+def _trace_relay(name: str, config_path: str) -> int:
+    """Run a traced server's original command, recording every call
+    
+    Bytes are passed through unchanged, line by line, and forwarded before
+    they are inspected. Client requests are decoded (they are small) to
+    note the method and tool; server responses are matched by id from
+    the start of the line. Each completed call becomes one ring record.
+    """
+    import signal
+    import subprocess
+    import threading
+    layer = RewriteLedger().layer(Path(config_path), name, "trace")
+    if layer is None:
+        print(f"mcp-manager trace: '{name}' is not traced in {config_path}", file=sys.stderr)
+        return 1
+    original = layer["original"]
+    cmd = [original.get("command", "")] + original.get("args", [])
+    try:
+        ring = TraceRing(Path(layer.get("ring") or _trace_path(Path(config_path), name)),
+                         layer.get("capacity", DEFAULT_TRACE_CAPACITY))
+    except (OSError, ValueError) as e:
+        print(f"mcp-manager trace: cannot open trace file ({e}); running untraced", file=sys.stderr)
+        os.execvpe(cmd[0], cmd, _server_env(original))
+    
+    capture = None
+    if layer.get("capture"):
+        with contextlib.suppress(OSError):
+            capture = open(layer["capture"], 'ab')
+    
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            env=_server_env(original))
+    pending = {}  # request id -> (start, monotonic start, method, tool, size)
+    lock = threading.Lock()
+    signal.signal(signal.SIGTERM, lambda *_: proc.terminate())
+    
+    def pump_stdin():
+        stdin = sys.stdin.buffer
+        try:
+            for line in iter(stdin.readline, b""):
+                proc.stdin.write(line)
+                proc.stdin.flush()
+                started, mono = time.time(), time.monotonic()
+                try:
+                    messages = json.loads(line)
+                except ValueError:
+                    continue
+                if capture and capture.tell() < TRACE_CAPTURE_MAX:
+                    capture.write(line if line.endswith(b"\n") else line + b"\n")
+                    capture.flush()
+                for message in messages if isinstance(messages, list) else [messages]:
+                    if not isinstance(message, dict) or "method" not in message:
+                        continue  # a response to a server request
+                    method = str(message["method"])
+                    params = message.get("params") if isinstance(message.get("params"), dict) else {}
+                    tool = str(params.get("name", "")) if method == "tools/call" else ""
+                    if "id" in message:
+                        with lock:
+                            pending[json.dumps(message["id"])] = (started, mono, method, tool, len(line))
+                    else:
+                        ring.append(started, -1, len(line), 0, TraceRing.NOTIFICATION, method)
+        except (OSError, ValueError):
+            pass
+        with contextlib.suppress(OSError):
+            proc.stdin.close()
+    
+    threading.Thread(target=pump_stdin, daemon=True).start()
+    stdout = sys.stdout.buffer
+    for line in iter(proc.stdout.readline, b""):
+        stdout.write(line)
+        stdout.flush()
+        finished = time.monotonic()
+        request_id, is_error = _response_info(line)
+        if request_id is None:
+            continue
+        with lock:
+            call = pending.pop(json.dumps(request_id), None)
+        if call:
+            started, mono, method, tool, size = call
+            ring.append(started, finished - mono, size, len(line),
+                        TraceRing.ERROR if is_error else 0, method, tool)
+    
+    with lock:
+        for started, _, method, tool, size in pending.values():
+            ring.append(started, -1, size, 0, TraceRing.UNANSWERED, method, tool)
+    ring.close()
+    if capture:
+        capture.close()
+    return proc.wait()
+
+def _trace_stats(records: List[Dict[str, Any]], key: str) -> Dict[str, Any]:
+    """Per-method (or per-tool) counts, sizes and latency percentiles in ms"""
+    groups = collections.defaultdict(list)
+    for record in records:
+        if record[key]:
+            groups[record[key]].append(record)
+    stats = {}
+    for group, items in groups.items():
+        latencies = sorted(item["latency"] * 1000 for item in items if item["latency"] is not None)
+        stats[group] = {
+            "count": len(items),
+            "errors": sum(item["error"] for item in items),
+            "unanswered": sum(item["unanswered"] for item in items),
+            "request_bytes": sum(item["request_bytes"] for item in items),
+            "response_bytes": sum(item["response_bytes"] for item in items),
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        }
+    return dict(sorted(stats.items(), key=lambda item: -item[1]["count"]))
+
+def _load_replay_script(path: str) -> List[Dict[str, Any]]:
+    """Read the requests of a replay script (JSON array or NDJSON)
+    
+    Ids in the script are ignored and the handshake is done by replay
+    itself, so captured traffic can be used as is; responses to server
+    requests in a capture are skipped.
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    try:
+        messages = json.loads(text)
+        if not isinstance(messages, list):
+            messages = [messages]
+    except ValueError:
+        messages = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"line {number}: {e}")
+                messages.extend(message if isinstance(message, list) else [message])
+    
+    script = []
+    for message in messages:
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            continue
+        if message["method"] in ("initialize", "notifications/initialized"):
+            continue
+        script.append({"method": message["method"], "params": message.get("params"),
+                       "notify": message["method"].startswith("notifications/")})
+    if not any(not step["notify"] for step in script):
+        raise ValueError("the script has no requests")
+    return script
+
+def _replay(label: str, server: Dict[str, Any], script: List[Dict[str, Any]],
+            rate: float = None, concurrency: int = DEFAULT_REPLAY_CONCURRENCY,
+            iterations: int = 1, duration: float = None, warmup: int = 0,
+            timeout: float = DEFAULT_TEST_TIMEOUT) -> Dict[str, Any]:
+    """Drive a script against one server and measure it
+    
+    With ``rate`` requests are sent on a fixed schedule whatever the
+    server does (open loop), and latency is measured from the scheduled
+    send time, so a server that falls behind shows it. Otherwise up to
+    ``concurrency`` requests are kept in flight (closed loop). The script
+    is repeated ``iterations`` times, or until ``duration`` has passed.
+    """
+    import threading
+    from concurrent.futures import wait
+    cmd = [server.get("command", "")] + server.get("args", [])
+    result = {"label": label, "command": " ".join(cmd), "startup": None, "sent": 0,
+              "completed": 0, "errors": 0, "timeouts": 0, "wall": None, "failure": None}
+    samples = []  # (method, latency, error)
+    lock = threading.Lock()
+    slots = threading.Semaphore(max(1, concurrency))
+    outstanding = []
+    recorded, abandoned = set(), set()  # futures answered / counted as timeouts
+    last = [None]  # time of the last response
+    
+    def record(future, method, sent_at):
+        finished = time.monotonic()
+        error = future.exception() is not None or "error" in future.result()
+        with lock:
+            if future in abandoned:
+                return
+            recorded.add(future)
+            samples.append((method, finished - sent_at, error))
+            last[0] = max(last[0] or finished, finished)
+        if rate is None:
+            slots.release()
+    
+    session = StdioSession(cmd, env=_server_env(server))
+    begin = sent_done = None
+    try:
+        start = time.monotonic()
+        session.start()
+        session.initialize(timeout)
+        result["startup"] = time.monotonic() - start
+        
+        requests = [step for step in script if not step["notify"]]
+        for index in range(warmup):
+            step = requests[index % len(requests)]
+            with contextlib.suppress(MCPError):
+                session.request(step["method"], step["params"], timeout)
+        
+        total = None if duration else len(script) * max(1, iterations)
+        begin = time.monotonic()
+        index = 0
+        while total is None or index < total:
+            if duration and time.monotonic() - begin >= duration:
+                break
+            step = script[index % len(script)]
+            index += 1
+            if step["notify"]:
+                session.notify(step["method"], step["params"])
+                continue
+            if rate:
+                sent_at = begin + result["sent"] / rate
+                delay = sent_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            elif not slots.acquire(timeout=timeout):
+                result["failure"] = f"no response for {timeout:g}s"
+                break
+            else:
+                sent_at = time.monotonic()
+            future = session.send_request(step["method"], step["params"])
+            result["sent"] += 1
+            future.add_done_callback(lambda f, m=step["method"], t=sent_at: record(f, m, t))
+            outstanding.append(future)
+        sent_done = time.monotonic()
+        
+        _, late = wait(outstanding, timeout=timeout)
+        with lock:
+            # Closing the session fails these; they are timeouts, not responses
+            abandoned.update(future for future in late if future not in recorded)
+        result["timeouts"] = len(abandoned)
+    except MCPError as e:
+        result["failure"] = str(e)
+    except OSError as e:
+        result["failure"] = f"cannot start: {e}"
+    finally:
+        if begin is not None:
+            # Up to the last send or response; waiting out timeouts is not counted
+            end = sent_done or time.monotonic()
+            with lock:
+                end = max(end, last[0] or end)
+            result["wall"] = end - begin
+        session.close()
+    
+    with lock:
+        samples = list(samples)
+    latencies = [latency * 1000 for _, latency, error in samples if not error]
+    result["completed"] = len(latencies)
+    result["errors"] = sum(error for _, _, error in samples) + result["timeouts"]
+    result["error_rate"] = result["errors"] / result["sent"] * 100 if result["sent"] else None
+    result["throughput"] = result["completed"] / result["wall"] if result["wall"] else None
+    for stat, pct in (("p50", 50), ("p95", 95), ("p99", 99)):
+        result[stat] = _percentile(latencies, pct)
+    result["max"] = max(latencies) if latencies else None
+    methods = collections.defaultdict(list)
+    for method, latency, error in samples:
+        methods[method].append((latency * 1000, error))
+    result["methods"] = {
+        method: {"count": len(items), "errors": sum(error for _, error in items),
+                 "p50": _percentile([ms for ms, error in items if not error], 50),
+                 "p95": _percentile([ms for ms, error in items if not error], 95)}
+        for method, items in methods.items()
+    }
+    return result
+
+def _lazy_path(config_path: Path, name: str) -> Path:
+    import hashlib
+    digest = hashlib.sha256(str(config_path).encode()).hexdigest()[:8]
+    return LAZY_DIR / f"{digest}-{re.sub(r'[^A-Za-z0-9._-]', '_', name)}.json"
+
+def _lazy_snapshot(server: Dict[str, Any], timeout: float = DEFAULT_TEST_TIMEOUT) -> Dict[str, Any]:
+    """Start a server once and record what the lazy shim answers for it
+    
+    That is the initialize result and the full result of every list
+    method the server's capabilities advertise (following nextCursor).
+    List methods the server fails to answer are left out, so the shim
+    passes them on to the real server instead.
+    """
+    cmd = [server.get("command", "")] + server.get("args", [])
+    with StdioSession(cmd, env=_server_env(server)) as session:
+        init = session.initialize(timeout)
+        lists = {}
+        for capability, method, field in LAZY_LIST_METHODS:
+            if capability not in (init.get("capabilities") or {}):
+                continue
+            items, params = [], {}
+            try:
+                for _ in range(100):
+                    result = session.request(method, params, timeout) or {}
+                    items += result.get(field, [])
+                    if not result.get("nextCursor"):
+                        break
+                    params = {"cursor": result["nextCursor"]}
+            except MCPError:
+                continue
+            lists[method] = {field: items}
+    return {"version": 1, "key": ToolCatalog.key(server), "taken": time.time(),
+            "initialize": init, "lists": lists}
+
+class LazyShim:
+    """Stands in for a server on stdio and starts it only when needed
+    
+    initialize, ping and the snapshotted list methods are answered from
+    the snapshot. The first other request starts the real server, which
+    is initialized with the client's parameters and then proxied line
+    by line. After ``idle_timeout`` seconds with nothing in flight the
+    server is stopped again; the next request starts a new one.
+    """
+    
+    INIT_ID = "mcp-manager-lazy:init"
+    TOOLS_ID = "mcp-manager-lazy:tools"
+    
+    def __init__(self, name: str, original: Dict[str, Any], snapshot: Dict[str, Any],
+                 snapshot_path: Path, idle_timeout: float = DEFAULT_LAZY_IDLE_TIMEOUT):
+        import threading
+        self.name = name
+        self.cmd = [original.get("command", "")] + original.get("args", [])
+        self.env = _server_env(original)
+        self.snapshot = snapshot
+        self.snapshot_path = snapshot_path
+        self.idle_timeout = idle_timeout
+        self.client_init = {}
+        self.proc = None
+        self.pending = set()  # ids of client requests the server has not answered
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()  # proc, pending, last_active and writes to the server
+        self.out_lock = threading.Lock()
+    
+    def _to_client(self, data: bytes):
+        with self.out_lock:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+    
+    def _reply(self, request_id: Any, result: Any = None, error: str = None):
+        message = {"jsonrpc": "2.0", "id": request_id}
+        if error is None:
+            message["result"] = result
+        else:
+            message["error"] = {"code": -32603, "message": error}
+        self._to_client(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    
+    def _to_server(self, proc: "subprocess.Popen", message: Dict[str, Any]):
+        proc.stdin.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        proc.stdin.flush()
+    
+    def _start(self) -> Optional[str]:
+        """Start and initialize the real server; returns an error message on failure"""
+        import subprocess
+        import threading
+        started, reply = threading.Event(), {}
+        try:
+            proc = _spawn(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=self.env)
+        except OSError as e:
+            return f"cannot start {self.name}: {e}"
+        threading.Thread(target=self._relay, args=(proc, started, reply), daemon=True).start()
+        params = dict(self.client_init or {"capabilities": {}, "clientInfo": CLIENT_INFO},
+                      protocolVersion=self.snapshot["initialize"].get("protocolVersion",
+                                                                      MCP_PROTOCOL_VERSION))
+        try:
+            self._to_server(proc, {"jsonrpc": "2.0", "id": self.INIT_ID,
+                                   "method": "initialize", "params": params})
+            if not started.wait(POOL_START_TIMEOUT) or reply.get("error"):
+                raise OSError(reply.get("error") or f"no initialize response in {POOL_START_TIMEOUT}s")
+            self._to_server(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            if "tools/list" in self.snapshot["lists"]:
+                self._to_server(proc, {"jsonrpc": "2.0", "id": self.TOOLS_ID,
+                                       "method": "tools/list", "params": {}})
+        except OSError as e:
+            _reap_group(proc, 0)
+            return f"{self.name} failed to start: {e}"
+        self.proc = proc
+        return None
+    
+    def _relay(self, proc: "subprocess.Popen", started: "threading.Event", reply: Dict[str, Any]):
+        """Pass server output to the client, keeping our own responses back"""
+        for line in iter(proc.stdout.readline, b""):
+            request_id, is_error = _response_info(line)
+            if request_id == self.INIT_ID:
+                if is_error:
+                    reply["error"] = "initialize failed: " + line.decode(errors="replace").strip()
+                started.set()
+                continue
+            if request_id == self.TOOLS_ID:
+                self._check_tools(line)
+                continue
+            with self.lock:
+                self.last_active = time.monotonic()
+                if request_id is not None:
+                    self.pending.discard(json.dumps(request_id))
+            self._to_client(line)
+        
+        reply.setdefault("error", "server exited")
+        started.set()
+        with self.lock:
+            lost = []
+            if self.proc is proc:  # died on its own rather than being stopped
+                self.proc = None
+                lost, self.pending = self.pending, set()
+        if lost:
+            _reap_group(proc, 0)
+            for request_id in lost:
+                self._reply(json.loads(request_id), error=f"{self.name} exited")
+    
+    def _check_tools(self, line: bytes):
+        """Refresh the snapshot when the live tool list differs from it"""
+        try:
+            result = json.loads(line).get("result") or {}
+        except (ValueError, AttributeError):
+            return
+        tools = result.get("tools")
+        if tools is None or result.get("nextCursor") or tools == self.snapshot["lists"]["tools/list"]["tools"]:
+            return
+        self.snapshot["lists"]["tools/list"] = {"tools": tools}
+        self.snapshot["taken"] = time.time()
+        with contextlib.suppress(OSError):
+            _write_json_atomic(self.snapshot_path, self.snapshot, indent=None)
+        self._to_client(b'{"jsonrpc":"2.0","method":"notifications/tools/list_changed"}\n')
+    
+    def _stop(self, proc: "subprocess.Popen"):
+        import subprocess
+        with contextlib.suppress(OSError):
+            proc.stdin.close()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            proc.wait(2)
+        _reap_group(proc)
+    
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(max(self.idle_timeout / 4, 0.1), 5))
+            with self.lock:
+                if (self.proc is None or self.pending
+                        or time.monotonic() - self.last_active < self.idle_timeout):
+                    continue
+                proc, self.proc = self.proc, None
+            self._stop(proc)
+    
+    def _answer(self, message: Dict[str, Any]) -> bool:
+        """Answer a request from the snapshot if we can"""
+        method = message["method"]
+        if method == "initialize":
+            self.client_init = message.get("params") or {}
+            self._reply(message["id"], self.snapshot["initialize"])
+        elif method == "ping":
+            self._reply(message["id"], {})
+        elif method in self.snapshot["lists"]:
+            self._reply(message["id"], self.snapshot["lists"][method])
+        else:
+            return False
+        return True
+    
+    def handle(self, line: bytes):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        request = isinstance(message, dict) and "method" in message and "id" in message
+        with self.lock:
+            self.last_active = time.monotonic()
+            if self.proc is not None:
+                if request:
+                    self.pending.add(json.dumps(message["id"]))
+                with contextlib.suppress(OSError):
+                    self.proc.stdin.write(line)
+                    self.proc.stdin.flush()
+                return
+        if not isinstance(message, list) and (not request or self._answer(message)):
+            return  # notifications and responses mean nothing to a stopped server
+        
+        error = self._start()
+        if error:
+            print(f"mcp-manager lazy: {error}", file=sys.stderr)
+            if request:
+                self._reply(message["id"], error=error)
+            return
+        self.handle(line)
+    
+    def run(self) -> int:
+        import threading
+        if self.idle_timeout:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            for line in iter(sys.stdin.buffer.readline, b""):
+                self.handle(line)
+        finally:
+            with self.lock:
+                proc, self.proc = self.proc, None
+            if proc:
+                self._stop(proc)
+        return 0
+
+def _lazy_shim(name: str, config_path: str) -> int:
+    """Entry point of a lazy server entry"""
+    import signal
+    layer = RewriteLedger().layer(Path(config_path), name, "lazy")
+    if layer is None:
+        print(f"mcp-manager lazy: '{name}' is not lazy in {config_path}", file=sys.stderr)
+        return 1
+    original = layer["original"]
+    snapshot = None
+    with contextlib.suppress(OSError, ValueError):
+        with open(layer["snapshot"], 'r') as f:
+            snapshot = json.load(f)
+    if not snapshot or snapshot.get("key") != ToolCatalog.key(original):
+        # Missing or taken of a different version: just be the server
+        print(f"mcp-manager lazy: no current snapshot of '{name}' (run 'lazy on {name}' "
+              f"to refresh it); starting it directly", file=sys.stderr)
+        cmd = [original.get("command", "")] + original.get("args", [])
+        os.execvpe(cmd[0], cmd, _server_env(original))
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    return LazyShim(name, original, snapshot, Path(layer["snapshot"]),
+                    layer.get("idle_timeout", DEFAULT_LAZY_IDLE_TIMEOUT)).run()
+
+def _sanitize_servers(servers: Dict[str, Any], secrets_only: bool = False) -> Dict[str, Any]:
+    """Replace literal environment values with ${VAR} placeholders, in place
+    
+    With ``secrets_only``, only variables whose names look like secrets
+    (tokens, passwords, API keys) are replaced.
+    """
+    for server in servers.values():
+        if isinstance(server, dict) and isinstance(server.get("env"), dict):
+            for var, value in server["env"].items():
+                if secrets_only and not SECRET_NAME_PATTERN.search(var):
+                    continue
+                if _env_placeholder(value) is None:
+                    server["env"][var] = "${" + var + "}"
+    return servers
+
+def _expand_config_paths(paths: List[str] = None, patterns: List[str] = None) -> List[Path]:
+    """Config files named by --config and matched by --config-glob, in order"""
+    found = {}
+    for path in paths or []:
+        found.setdefault(str(Path(path).expanduser()), None)
+    for pattern in patterns or []:
+        import glob
+        for match in sorted(glob.iglob(os.path.expanduser(pattern), recursive=True)):
+            if os.path.isfile(match):
+                found.setdefault(match, None)
+    return [Path(path) for path in found]
+
+def _server_variant(server: Dict[str, Any]) -> str:
+    """What a server entry runs: the npx package spec, else the command line"""
+    if not isinstance(server, dict):
+        return "<invalid>"
+    parsed = _parse_npx_args(server)
+    if parsed:
+        return parsed["spec"]
+    return " ".join([str(server.get("command", ""))] + [str(arg) for arg in server.get("args", [])])
+
+def _quietly(func):
+    """Run func with stdout captured; returns (value, None) or (None, error message)"""
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            return func(), None
+    except SystemExit as e:
+        text = re.sub(r'\x1b\[[0-9;]*m', '', output.getvalue()).strip()
+        return None, (text.splitlines()[-1] if text else str(e)) or "cannot read config"
+    except (OSError, ValueError, TimeoutError) as e:
+        return None, str(e) or "cannot read config"
+
+def _fleet_list(path: Path) -> Dict[str, Any]:
+    """Summarize the servers of one config file (process pool worker)"""
+    manager = MCPManager(config_path=path, parse_cache=False)
+    servers, error = _quietly(lambda: manager.servers)
+    summary = {"path": str(path), "error": error, "servers": {}}
+    for name, server in (servers or {}).items():
+        env = server.get("env", {}) if isinstance(server, dict) else {}
+        if not isinstance(env, dict):
+            env = {}
+        summary["servers"][name] = {
+            "variant": _server_variant(server),
+            "env": sorted(env),
+            "empty_env": sorted(var for var, value in env.items() if value == ""),
+        }
+    return summary
+
+def _fleet_validate(path: Path, skip: List[str] = None) -> Dict[str, Any]:
+    """Validate one config file (process pool worker)"""
+    manager = MCPManager(config_path=path, parse_cache=False)
+    report, error = _quietly(lambda: manager.validation_report(skip=skip, concurrency=1))
+    if error:
+        return {"config": str(path), "valid": False, "errors": 1, "warnings": 0,
+                "issues": [{"server": None, "rule": "structure", "severity": "error",
+                            "message": error}]}
+    del report["servers"]
+    return report
+
+def _fleet_export(path: Path) -> Dict[str, Any]:
+    """Sanitized mcpServers of one config file (process pool worker)"""
+    manager = MCPManager(config_path=path, parse_cache=False)
+    servers, error = _quietly(lambda: _sanitize_servers(manager.servers))
+    if error:
+        return {"path": str(path), "error": error}
+    return {"path": str(path), "servers": servers}
+
+def _fleet_apply(path: Path, desired: Dict[str, Any], prune: bool,
+                 dry_run: bool) -> Dict[str, Any]:
+    """Make one config file match already-expanded manifest entries (process pool worker)"""
+    manager = MCPManager(config_path=path, parse_cache=False)
+    result = {"path": str(path), "add": 0, "change": 0, "remove": 0}
+    
+    def apply():
+        servers = manager.servers
+        plan = _diff_servers(servers, desired, prune)
+        result.update({key: len(plan[key]) for key in ("add", "change", "remove")})
+        if not dry_run and plan["add"] + plan["change"] + plan["remove"]:
+            for name in plan["add"] + plan["change"]:
+                servers[name] = desired[name]
+            for name in plan["remove"]:
+                del servers[name]
+            manager._save_config()
+    
+    _, result["error"] = _quietly(apply)
+    return result
+
+class Fleet:
+    """Runs list/validate/export/apply over many config files at once
+    
+    Each file is handled by a worker in a process pool, in chunks, and
+    only a compact per-file summary comes back to be aggregated.
+    """
+    
+    def __init__(self, paths: List[Path], registry: "Registry", jobs: int = None):
+        self.paths = paths
+        self.registry = registry
+        self.jobs = jobs or os.cpu_count() or 1
+    
+    def _map(self, worker, *args) -> List[Dict[str, Any]]:
+        if self.jobs == 1 or len(self.paths) == 1:
+            return [worker(path, *args) for path in self.paths]
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(self.paths) // (self.jobs * 4))
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(self.paths))) as pool:
+            return list(pool.map(worker, self.paths, *[[arg] * len(self.paths) for arg in args],
+                                 chunksize=chunksize))
+    
+    def inventory(self) -> Dict[str, Any]:
+        """Which servers are configured where, version skew and missing env vars"""
+        start = time.monotonic()
+        summaries = self._map(_fleet_list)
+        servers: Dict[str, Dict[str, Any]] = {}
+        required: Dict[str, List[str]] = {}
+        for summary in summaries:
+            for name, server in summary["servers"].items():
+                entry = servers.setdefault(name, {"files": 0, "variants": collections.Counter(),
+                                                  "missing_env": collections.Counter()})
+                entry["files"] += 1
+                entry["variants"][server["variant"]] += 1
+                if name not in required:
+                    info = self.registry.get(name)
+                    required[name] = info["env_vars"] if info else []
+                for var in set(required[name]) - set(server["env"]) | set(server["empty_env"]):
+                    entry["missing_env"][var] += 1
+        
+        report = {"files": len(summaries),
+                  "failed": {s["path"]: s["error"] for s in summaries if s["error"]},
+                  "servers": {}, "skew": [], "missing_env": []}
+        for name, entry in sorted(servers.items()):
+            report["servers"][name] = {"files": entry["files"],
+                                       "variants": dict(entry["variants"].most_common())}
+            if len(entry["variants"]) > 1:
+                report["skew"].append(name)
+            for var, count in entry["missing_env"].most_common():
+                report["missing_env"].append({"server": name, "var": var, "files": count})
+        report["elapsed"] = time.monotonic() - start
+        return report
+    
+    def validate(self, skip: List[str] = None) -> Dict[str, Any]:
+        start = time.monotonic()
+        reports = self._map(_fleet_validate, skip)
+        problems = collections.Counter()
+        for report in reports:
+            for issue in report["issues"]:
+                problems[(issue["severity"], issue["server"], issue["message"])] += 1
+        return {
+            "files": len(reports),
+            "invalid": [r["config"] for r in reports if r["errors"]],
+            "errors": sum(r["errors"] for r in reports),
+            "warnings": sum(r["warnings"] for r in reports),
+            "problems": [{"severity": severity, "server": server, "message": message,
+                          "files": count}
+                         for (severity, server, message), count in problems.most_common()],
+            "reports": reports,
+            "elapsed": time.monotonic() - start,
+        }
+    
+    def export(self) -> Dict[str, Any]:
+        import datetime
+        results = self._map(_fleet_export)
+        return {
+            "version": 1,
+            "exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "configs": {r["path"]: r["servers"] for r in results if "servers" in r},
+            "failed": {r["path"]: r["error"] for r in results if "error" in r},
+        }
+    
+    def apply(self, desired: Dict[str, Any], prune: bool, dry_run: bool) -> List[Dict[str, Any]]:
+        return self._map(_fleet_apply, desired, prune, dry_run)
+
+def _pointer(*parts) -> str:
+    """RFC 6901 JSON Pointer for a sequence of keys/indices"""
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in parts)
+
+def _pointer_parts(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise ValueError(f"invalid JSON pointer '{pointer}'")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+def _json_diff(old: Any, new: Any, path: tuple = (), tests: bool = True) -> List[Dict[str, Any]]:
+    """Minimal RFC 6902 patch that turns old into new
+    
+    Objects are compared member by member and arrays element by element
+    when only their tail differs, so a changed argument or env value
+    becomes one small operation. With ``tests``, every replace and remove
+    is preceded by a ``test`` of the value it expects to find, which lets
+    the receiving side detect conflicting local edits.
+    """
+    if old == new:
+        return []
+    ops = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                if tests:
+                    ops.append({"op": "test", "path": _pointer(*path, key), "value": old[key]})
+                ops.append({"op": "remove", "path": _pointer(*path, key)})
+        for key, value in new.items():
+            if key in old:
+                ops.extend(_json_diff(old[key], value, path + (key,), tests))
+            else:
+                ops.append({"op": "add", "path": _pointer(*path, key), "value": value})
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        if old[:common] == new[:common] or len(old) == len(new):
+            for index in range(common):
+                ops.extend(_json_diff(old[index], new[index], path + (index,), tests))
+            for index in range(len(old) - 1, common - 1, -1):
+                if tests:
+                    ops.append({"op": "test", "path": _pointer(*path, index), "value": old[index]})
+                ops.append({"op": "remove", "path": _pointer(*path, index)})
+            for index in range(common, len(new)):
+                ops.append({"op": "add", "path": _pointer(*path, index), "value": new[index]})
+            return ops
+    if tests:
+        ops.append({"op": "test", "path": _pointer(*path), "value": old})
+    ops.append({"op": "replace", "path": _pointer(*path), "value": new})
+    return ops
+
+_MISSING = object()
+
+def _resolve(document: Any, parts: List[str]) -> Any:
+    for part in parts:
+        if isinstance(document, dict) and part in document:
+            document = document[part]
+        elif isinstance(document, list) and part.isdigit() and int(part) < len(document):
+            document = document[int(part)]
+        else:
+            return _MISSING
+    return document
+
+def _patch_step(document: Any, op: Dict[str, Any]):
+    """Apply one add/remove/replace/move/copy operation in place"""
+    parts = _pointer_parts(op["path"])
+    if op["op"] in ("move", "copy"):
+        value = _resolve(document, _pointer_parts(op["from"]))
+        if value is _MISSING:
+            raise ValueError(f"{op['from']} does not exist")
+        if op["op"] == "move":
+            _patch_step(document, {"op": "remove", "path": op["from"]})
+        value = json.loads(json.dumps(value))
+        op = {"op": "add", "path": op["path"], "value": value}
+    parent = _resolve(document, parts[:-1])
+    key = parts[-1] if parts else None
+    if key is None or parent is _MISSING:
+        raise ValueError(f"cannot apply {op['op']} at '{op['path']}'")
+    value = json.loads(json.dumps(op.get("value")))
+    if isinstance(parent, list):
+        index = len(parent) if key == "-" else int(key) if key.isdigit() else -1
+        if not 0 <= index <= len(parent) - (op["op"] != "add"):
+            raise ValueError(f"index out of range at '{op['path']}'")
+        if op["op"] == "add":
+            parent.insert(index, value)
+        elif op["op"] == "remove":
+            del parent[index]
+        else:
+            parent[index] = value
+    elif isinstance(parent, dict):
+        if op["op"] != "add" and key not in parent:
+            raise ValueError(f"'{op['path']}' does not exist")
+        if op["op"] == "remove":
+            del parent[key]
+        else:
+            parent[key] = value
+    else:
+        raise ValueError(f"cannot apply {op['op']} at '{op['path']}'")
+
+def _check_patch(patch: Any) -> List[Dict[str, Any]]:
+    """Validate the shape of an RFC 6902 patch document"""
+    if not isinstance(patch, list):
+        raise ValueError("a JSON Patch must be an array of operations")
+    for op in patch:
+        if not isinstance(op, dict) or not isinstance(op.get("path"), str):
+            raise ValueError(f"invalid operation: {json.dumps(op)}")
+        if op.get("op") not in ("add", "remove", "replace", "move", "copy", "test"):
+            raise ValueError(f"unsupported operation: {json.dumps(op)}")
+        if op["op"] in ("add", "replace", "test") and "value" not in op:
+            raise ValueError(f"operation without a value: {json.dumps(op)}")
+        if op["op"] in ("move", "copy") and not isinstance(op.get("from"), str):
+            raise ValueError(f"operation without 'from': {json.dumps(op)}")
+        _pointer_parts(op["path"])
+    return patch
+
+def _patch_server(op: Dict[str, Any]) -> Optional[str]:
+    """The mcpServers entry an operation touches"""
+    parts = _pointer_parts(op["path"])
+    return parts[1] if len(parts) > 1 and parts[0] == "mcpServers" else None
+
+def _apply_servers_patch(servers: Dict[str, Any], view: Dict[str, Any],
+                         patch: List[Dict[str, Any]], strategy: Optional[str] = None,
+                         protected: set = frozenset(), held: set = frozenset()) -> Dict[str, list]:
+    """Apply a patch of /mcpServers to servers, detecting conflicts
+    
+    ``view`` is what the patch was computed against (servers with secrets
+    redacted and rewrites undone); tests are checked there and every
+    operation is applied to both. A failed ``test``, a missing target or
+    an ``add`` that would overwrite a different value is a conflict.
+    Conflicting operations are applied only with the "theirs" strategy;
+    entries in ``protected`` or ``held`` are never touched.
+    """
+    real = {"mcpServers": servers}
+    seen = {"mcpServers": view}
+    result = {"applied": [], "conflicts": [], "skipped": []}
+    tests = []
+    for op in patch:
+        if op["op"] == "test":
+            tests.append(op)
+            continue
+        name = _patch_server(op)
+        if name in protected:
+            result["skipped"].append((op, "has rewrites (pin/pool); undo them first"))
+            tests = []
+            continue
+        if name in held:
+            result["skipped"].append((op, "kept local entry"))
+            tests = []
+            continue
+        
+        reason = None
+        for test in tests:
+            current = _resolve(seen, _pointer_parts(test["path"]))
+            if current is _MISSING:
+                reason = f"{test['path']} no longer exists here"
+            elif current != test["value"]:
+                reason = f"{test['path']} was also changed here"
+        tests = []
+        current = _resolve(seen, _pointer_parts(op["path"]))
+        if op["op"] == "add" and current is not _MISSING and \
+                isinstance(_resolve(seen, _pointer_parts(op["path"])[:-1]), dict):
+            if current == op["value"]:
+                continue  # already applied
+            reason = reason or f"{op['path']} already exists here with a different value"
+        elif op["op"] in ("remove", "replace") and current is _MISSING:
+            reason = reason or f"{op['path']} does not exist here"
+        
+        if reason and strategy != "theirs":
+            result["conflicts"].append((op, reason))
+            continue
+        try:
+            _patch_step(seen, op)
+            _patch_step(real, op)
+        except ValueError as e:
+            result["skipped"].append((op, str(e)))
+            continue
+        result["applied"].append(op)
+    
+    for test in tests:  # trailing tests guard nothing but are still checked
+        if _resolve(seen, _pointer_parts(test["path"])) != test["value"] and strategy != "theirs":
+            result["conflicts"].append((test, f"{test['path']} was also changed here"))
+    return result
+
+def _servers_hash(servers: Dict[str, Any]) -> str:
+    import hashlib
+    return hashlib.sha256(json.dumps(servers, sort_keys=True, separators=(',', ':'))
+                          .encode()).hexdigest()[:12]
+
+class SyncStore:
+    """Synced mcpServers states by hash, and the last-synced state per peer
+    
+    ``sync`` records the (redacted) servers it sent or received, so a
+    later run can diff against that state instead of shipping everything.
+    """
+    
+    def __init__(self, root: Path = SYNC_DIR):
+        self.root = root
+        self.bases_path = root / "bases.json"
+    
+    def put(self, servers: Dict[str, Any]) -> str:
+        digest = _servers_hash(servers)
+        path = self.root / "states" / f"{digest}.json"
+        if not path.exists():
+            _write_json_atomic(path, servers, indent=None)
+        return digest
+    
+    def get(self, digest: str) -> Dict[str, Any]:
+        """A recorded state by hash or unique hash prefix"""
+        import glob
+        matches = sorted((self.root / "states").glob(f"{glob.escape(digest)}*.json"))
+        if not matches:
+            raise KeyError(f"no synced state matches '{digest}'")
+        if len(matches) > 1:
+            raise KeyError(f"'{digest}' matches several synced states")
+        with open(matches[0], 'r') as f:
+            return json.load(f)
+    
+    def _bases(self) -> Dict[str, str]:
+        try:
+            with open(self.bases_path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
+    def base(self, config_path: Path, peer: str) -> Optional[str]:
+        return self._bases().get(f"{config_path}\n{peer}")
+    
+    def set_base(self, config_path: Path, peer: str, digest: str):
+        with _file_lock(self.bases_path):
+            bases = self._bases()
+            bases[f"{config_path}\n{peer}"] = digest
+            _write_json_atomic(self.bases_path, bases)
+
+class MCPManager:
+    def __init__(self, registry_paths: List[str] = None, config_path: Path = None,
+                 parse_cache: bool = True):
+        self.explicit_config = Path(config_path).expanduser().absolute() if config_path else None
+        self.parse_cache = parse_cache
+        with _phase("discover config"):
+            self.config_path = self._find_config()
+        self.registry = Registry(registry_paths)
+        self._config = None   # full document, only parsed when needed
+        self._servers = None  # mcpServers section
+        self._base = None     # (stat, copy of mcpServers) as loaded, for merging
+        self._config_text = None  # the whole document as loaded, for merging
+        self.daemon = None    # DaemonClient when a 'serve' daemon is running
+        self.section_missing = False  # config had no usable mcpServers section
+        
+    def _find_config(self) -> Optional[Path]:
+        """Find Claude configuration file"""
+        if self.explicit_config:
+            return self.explicit_config
+        for path in CLAUDE_CONFIG_PATHS:
+            if path.exists():
+                return path
+        return None
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        """The whole configuration document"""
+        if self._config is None:
+            stat = _stat_key(self.config_path) if self.config_path else None
+            self._config = self._load_config()
+            if self._servers is not None:
+                self._config["mcpServers"] = self._servers
+            elif self._base is None:
+                self._remember_base(stat, self._config.get("mcpServers", {}))
+        return self._config
+    
+    @config.setter
+    def config(self, value: Dict[str, Any]):
+        self._config = value
+        self._config_text = None
+        self._servers = None
+    
+    def _remember_base(self, stat: Optional[List[int]], servers: Dict[str, Any]):
+        self._base = (stat, json.loads(json.dumps(servers)))
+    
+    @property
+    def servers(self) -> Dict[str, Any]:
+        """The mcpServers section, read without parsing the rest of the file"""
+        if self._config is not None:
+            return self._config.setdefault("mcpServers", {})
+        if self._servers is None:
+            self._servers = self._load_servers()
+        return self._servers
+    
+    @_phase("load config")
+    def _load_config(self) -> Dict[str, Any]:
+        """Load Claude configuration"""
+        if not self.config_path or not self.config_path.exists():
+            return {"mcpServers": {}}
+        
+        try:
+            with open(self.config_path, 'r') as f:
+                text = f.read()
+            config = json.loads(text)
+            self._config_text = text
+            return config
+        except json.JSONDecodeError as e:
+            print(f"{Colors.RED}Error reading configuration: {e}{Colors.NC}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"{Colors.RED}Error: {e}{Colors.NC}")
+            return {"mcpServers": {}}
+    
+    @_phase("load servers")
+    def _load_servers(self) -> Dict[str, Any]:
+        """Load only the mcpServers section
+        
+        Served from the parse cache when the file is unchanged; otherwise
+        the section is located and decoded on its own, falling back to a
+        full parse for files that are not pretty-printed.
+        """
+        if not self.config_path:
+            return {}
+        if not self.config_path.exists():
+            self._remember_base(None, {})
+            return {}
+        
+        stat = _stat_key(self.config_path)
+        servers = _read_parse_cache(self.config_path) if self.parse_cache else None
+        if servers is not None:
+            self._remember_base(stat, servers)
+            return servers
+        
+        try:
+            with open(self.config_path, 'r') as f:
+                text = f.read()
+        except Exception as e:
+            print(f"{Colors.RED}Error: {e}{Colors.NC}")
+            return {}
+        
+        found = _locate_key(text, "mcpServers")
+        if found is not None and isinstance(found["value"], dict):
+            servers = found["value"]
+        else:
+            self.section_missing = not isinstance(self.config.get("mcpServers"), dict)
+            servers = self.config.setdefault("mcpServers", {})
+        self._remember_base(stat, servers)
+        if self.parse_cache:
+            _write_parse_cache(self.config_path, servers, stat)
+        return servers
+    
+    def _save_config(self):
+        """Save configuration with backup
+        
+        When only the mcpServers section was loaded, it is spliced back into
+        the file so everything else stays byte-for-byte identical. Writes
+        are atomic and serialized with an advisory lock; if the file was
+        changed by someone else since it was loaded, our server changes
+        are merged into the newer contents instead of overwriting them.
+        Raises TimeoutError if the lock cannot be taken.
+        """
+        if not self.config_path:
+            # Create new config
+            self.config_path = Path.home() / ".claude.json"
+        
+        with _phase("save config"), _file_lock(self.config_path):
+            self._write_locked()
+        print(f"{Colors.GREEN}✓ Saved configuration to: {self.config_path}{Colors.NC}")
+    
+    def _write_locked(self):
+        current = None
+        if self.config_path.exists():
+            stat = _stat_key(self.config_path)
+            with open(self.config_path, 'r') as f:
+                current = f.read()
+            # Create backup
+            with _phase("backup"):
+                backup_id = BackupStore().snapshot(self.config_path, current)
+            print(f"{Colors.GREEN}✓ Created backup: {backup_id}{Colors.NC}")
+        
+        changed = current is not None and self._base is not None and stat != self._base[0]
+        text = None
+        if self._config is None and current is not None:
+            found = _locate_key(current, "mcpServers")
+            if changed:
+                if found is not None and isinstance(found["value"], dict):
+                    theirs = found["value"]
+                else:
+                    theirs = json.loads(current).get("mcpServers", {})
+                self._merge_from(theirs)
+            if found is not None:
+                text = (current[:found["start"]]
+                        + _dump_indented(self.servers, found["indent"])
+                        + current[found["end"]:])
+            else:
+                document = json.loads(current)
+                document["mcpServers"] = self.servers
+                text = json.dumps(document, indent=2)
+        elif changed:
+            self._merge_document(json.loads(current))
+        if text is None:
+            text = json.dumps(self.config, indent=2)
+        
+        # Save configuration
+        _atomic_write(self.config_path, text)
+        if self._config is not None:
+            self._config_text = text
+        stat = _stat_key(self.config_path)
+        self._remember_base(stat, self.servers)
+        _write_parse_cache(self.config_path, self.servers, stat)
+    
+    def _merge_from(self, theirs: Dict[str, Any]):
+        """Merge server changes made here into a newer mcpServers section"""
+        merged, conflicts = _merge_servers(self._base[1], self.servers, theirs)
+        print(f"{Colors.YELLOW}⚠ {self.config_path} changed since it was loaded; "
+              f"merging changes{Colors.NC}")
+        for name in conflicts:
+            print(f"{Colors.YELLOW}⚠ '{name}' was also changed elsewhere; keeping this version{Colors.NC}")
+        servers = self.servers
+        servers.clear()
+        servers.update(merged)
+    
+    def _merge_document(self, theirs: Dict[str, Any]):
+        """Merge the whole document loaded here into a newer one
+        
+        Other top-level keys are merged the same way as servers, against
+        the document as it was loaded; after 'import --replace' there is
+        no such base and this document's keys win.
+        """
+        servers = theirs.get("mcpServers")
+        self._merge_from(servers if isinstance(servers, dict) else {})
+        ours = {key: value for key, value in self.config.items() if key != "mcpServers"}
+        theirs = {key: value for key, value in theirs.items() if key != "mcpServers"}
+        if self._config_text is not None:
+            base = json.loads(self._config_text)
+            base.pop("mcpServers", None)
+            document, _ = _merge_servers(base, ours, theirs)
+        else:
+            document = ours
+        document["mcpServers"] = self.servers
+        self._config = document
+    
+    def list_backups(self, all_configs: bool = False):
+        """List stored backups of the configuration"""
+        store = BackupStore()
+        snapshots = store.snapshots(None if all_configs else self.config_path)
+        if not snapshots:
+            print(f"{Colors.YELLOW}No backups found{Colors.NC}")
+            return
+        
+        print(f"\n{Colors.BLUE}Backups in {store.root}:{Colors.NC}\n")
+        for entry in snapshots:
+            servers = len(entry.get("servers", []))
+            size = entry["size"] / 1024
+            line = f"  {Colors.CYAN}{entry['id']}{Colors.NC}  {entry['timestamp']}  " \
+                   f"{servers:3d} servers  {size:8.1f} KB"
+            if all_configs:
+                line += f"  {entry['config']}"
+            print(line)
+    
+    def restore_backup(self, snapshot_id: str, output_file: str = None):
+        """Restore a stored backup, or write it to another file"""
+        store = BackupStore()
+        try:
+            entry = store.find(snapshot_id, None if output_file else self.config_path)
+        except KeyError as e:
+            print(f"{Colors.RED}{e.args[0]}{Colors.NC}")
+            return False
+        text = store.restore_text(entry)
+        
+        if output_file:
+            with open(output_file, 'w') as f:
+                f.write(text)
+            print(f"{Colors.GREEN}✓ Wrote backup {entry['id']} to: {output_file}{Colors.NC}")
+            return True
+        
+        with _file_lock(self.config_path):
+            with open(self.config_path, 'r') as f:
+                current = f.read()
+            if current == text:
+                print(f"{Colors.YELLOW}Configuration already matches backup {entry['id']}{Colors.NC}")
+                return True
+            backup_id = store.snapshot(self.config_path, current)
+            print(f"{Colors.GREEN}✓ Created backup: {backup_id}{Colors.NC}")
+            _atomic_write(self.config_path, text)
+        self._config = self._servers = self._base = None
+        print(f"{Colors.GREEN}✓ Restored backup {entry['id']} ({entry['timestamp']}) "
+              f"to: {self.config_path}{Colors.NC}")
+        return True
+    
+    def prune_backups(self, keep_last: int, keep_daily: int):
+        """Apply the backup retention policy"""
+        removed, kept = BackupStore().prune(keep_last, keep_daily)
+        print(f"{Colors.GREEN}✓ Removed {removed} backups, kept {kept}{Colors.NC}")
+        return True
+    
+    def _remote(self, method: str, params: Dict[str, Any] = None) -> Any:
+        """Run a method in the daemon, or return None to compute it locally"""
+        if self.daemon is None:
+            return None
+        try:
+            with _phase(f"daemon {method}"):
+                return self.daemon.call(method, params)
+        except (OSError, ValueError, MCPError):
+            self.daemon = None
+            return None
+    
+    def server_inventory(self) -> Dict[str, Any]:
+        """Installed servers with literal environment values hidden"""
+        servers = {}
+        for name, details in self.servers.items():
+            entry = {"command": details.get("command"), "args": details.get("args", [])}
+            if "env" in details:
+                entry["env"] = {var: value if _env_placeholder(value) else "[hidden]"
+                                for var, value in details["env"].items()}
+            servers[name] = entry
+        return {"config": str(self.config_path), "servers": servers}
+    
+    def list_servers(self, verbose: bool = False, as_json: bool = False):
+        """List installed MCP servers"""
+        inventory = self._remote("list") or self.server_inventory()
+        if as_json:
+            print(json.dumps(inventory, indent=2))
+            return
+        servers = inventory["servers"]
+        
+        if not servers:
+            print(f"{Colors.YELLOW}No MCP servers installed{Colors.NC}")
+            return
+        
+        catalog = ToolCatalog() if verbose else None
+        print(f"\n{Colors.BLUE}Installed MCP Servers:{Colors.NC}")
+        for name, details in servers.items():
+            print(f"\n  {Colors.CYAN}{name}{Colors.NC}")
+            print(f"    Command: {details.get('command') or 'unknown'}")
+            
+            if details.get('args'):
+                args_str = ' '.join(details['args'])
+                print(f"    Args: {args_str}")
+            
+            if verbose and 'env' in details:
+                print("    Environment:")
+                for var, value in details['env'].items():
+                    env_name = _env_placeholder(value)
+                    if env_name:
+                        is_set = env_name in os.environ
+                        status = f"{Colors.GREEN}✓{Colors.NC}" if is_set else f"{Colors.RED}✗{Colors.NC}"
+                        print(f"      {status} {var}: {value}")
+                    else:
+                        print(f"      {var}: [hidden]")
+            
+            if verbose:
+                entry = catalog.get(details)
+                if entry is None:
+                    print(f"    Tools: {Colors.YELLOW}not probed yet (run 'tools {name}'){Colors.NC}")
+                else:
+                    stale = f", {Colors.YELLOW}stale{Colors.NC}" if entry["stale"] else ""
+                    tools = ", ".join(entry["tools"]) or "none"
+                    print(f"    Tools ({len(entry['tools'])}, {_format_age(entry['age'])} old{stale}): {tools}")
+    
+    def show_tools(self, names: List[str] = None, refresh: bool = False,
+                   concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                   timeout: float = DEFAULT_TEST_TIMEOUT, as_json: bool = False):
+        """Show server tools from the catalog, probing missing or stale entries"""
+        servers = self.servers
+        names = names or list(servers)
+        for name in names:
+            if name not in servers:
+                print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+                return False
+        if not names:
+            print(f"{Colors.YELLOW}No MCP servers installed{Colors.NC}")
+            return False
+        
+        catalog = ToolCatalog()
+        cached = {name: catalog.get(servers[name]) for name in names}
+        todo = [name for name in names
+                if refresh or cached[name] is None or cached[name]["stale"]]
+        errors = {}
+        if todo:
+            if not as_json:
+                print(f"{Colors.BLUE}Probing {len(todo)} servers...{Colors.NC}")
+            results, _ = _run_probes(servers, todo, concurrency, timeout)
+            catalog = ToolCatalog()
+            for result in results:
+                if result["ok"]:
+                    cached[result["name"]] = catalog.get(servers[result["name"]])
+                else:
+                    errors[result["name"]] = result["error"]
+        
+        if as_json:
+            print(json.dumps({name: dict(cached[name] or {}, error=errors.get(name))
+                              for name in names}, indent=2))
+            return not errors
+        
+        for name in names:
+            entry = cached[name]
+            print(f"\n{Colors.CYAN}{name}{Colors.NC}", end="")
+            if entry is None:
+                print(f"  {Colors.RED}✗ {errors.get(name, 'not probed')}{Colors.NC}")
+                continue
+            info = entry.get("server_info") or {}
+            print(f"  {info.get('name', '')} {info.get('version', '')}  "
+                  f"({'probed just now' if name in todo and name not in errors else _format_age(entry['age']) + ' old'})")
+            if name in errors:
+                print(f"  {Colors.YELLOW}⚠ Re-probe failed, showing cached tools: {errors[name]}{Colors.NC}")
+            capabilities = sorted(entry.get("capabilities") or {})
+            if capabilities:
+                print(f"  Capabilities: {', '.join(capabilities)}")
+            for tool, description in entry["tools"].items():
+                summary = description.strip().splitlines()[0] if description.strip() else ""
+                print(f"  • {tool}{'  - ' + summary if summary else ''}")
+        return not errors
+    
+    def _plan_entry(self, name: str, answers: Dict[str, Dict[str, str]],
+                    interactive: bool) -> Dict[str, Any]:
+        """Build the entry for a registry server, answering its prompts"""
+        info = self.registry.get(name)
+        if info is None:
+            raise ValueError(f"'{name}' is not in the registry; use --package or --command")
+        params = {}
+        for key, prompt in info.get("prompts", {}).items():
+            value = answers.get(name, {}).get(key, answers.get("*", {}).get(key))
+            if value is None and interactive:
+                value = input(f"{name}: {prompt}")
+            if value:
+                params[key] = value
+            elif key != "path":  # path defaults to $HOME
+                raise ValueError(f"'{name}' needs a value for '{key}' "
+                                 f"(--set {name}.{key}=VALUE)")
+        for key in answers.get(name, {}):
+            if key not in info.get("prompts", {}):
+                print(f"{Colors.YELLOW}⚠ '{name}' has no prompt '{key}'{Colors.NC}")
+        
+        for var in info["env_vars"]:
+            if var not in os.environ:
+                print(f"{Colors.YELLOW}⚠ {name}: {var} not set in environment{Colors.NC}")
+                if "setup_help" in info:
+                    print(f"  {info['setup_help']}")
+        return _expand_registry(info, params)
+    
+    def _install_one(self, name: str, entry: Dict[str, Any], post_install: Optional[List[str]],
+                     probe: str, timeout: float, progress: ProgressDisplay,
+                     limits: Dict[str, int] = None,
+                     post_install_timeout: float = DEFAULT_POST_INSTALL_TIMEOUT) -> Dict[str, Any]:
+        """Verify one server and run its post-install step (thread pool worker)"""
+        import subprocess
+        progress.update(name, "verifying", Colors.BLUE, running=True)
+        result = PROBES[probe](name, entry, timeout, limits=limits)
+        if not result["ok"]:
+            progress.update(name, f"✗ {result['error'].splitlines()[-1] if result['error'] else 'failed'}",
+                            Colors.RED)
+            return result
+        if post_install:
+            progress.update(name, f"post-install: {' '.join(post_install)}", Colors.BLUE, running=True)
+            try:
+                proc, _ = _run_isolated(post_install, post_install_timeout,
+                                        stdin=subprocess.DEVNULL)
+                if proc is None:
+                    result["post_install"] = False
+                    result["post_install_output"] = f"timed out after {post_install_timeout:g}s"
+                else:
+                    result["post_install"] = proc.returncode == 0
+                    result["post_install_output"] = (proc.stdout + proc.stderr).strip()
+            except OSError as e:
+                result["post_install"] = False
+                result["post_install_output"] = str(e)
+        note = "" if result.get("post_install", True) else "  (post-install failed)"
+        progress.update(name, f"✓ {result['latency']:.2f}s{note}",
+                        Colors.YELLOW if note else Colors.GREEN)
+        return result
+    
+    def add_servers(self, names: List[str], package: str = None,
+                    command: str = None, args: List[str] = None,
+                    env: Dict[str, str] = None, force: bool = False,
+                    answers: Dict[str, Dict[str, str]] = None, yes: bool = False,
+                    probe: str = "handshake",
+                    concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                    timeout: float = DEFAULT_TEST_TIMEOUT,
+                    limits: Dict[str, int] = None,
+                    post_install_timeout: float = DEFAULT_POST_INSTALL_TIMEOUT):
+        """Add MCP servers, verifying them in parallel and saving once
+        
+        Registry prompts are answered from ``answers`` (see _parse_answers);
+        missing answers are asked for on a terminal unless ``yes`` is set.
+        Verification and post-install steps run concurrently, so adding
+        many servers takes about as long as the slowest one.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        answers = answers or {}
+        interactive = sys.stdin.isatty() and not yes
+        entries, hooks, failed_plan = {}, {}, []
+        for name in dict.fromkeys(names):
+            if name in self.servers and not force:
+                print(f"{Colors.YELLOW}Server '{name}' already exists. Use --force to overwrite.{Colors.NC}")
+                failed_plan.append(name)
+                continue
+            if package or command or args is not None:
+                entry = {"command": command or "npx",
+                         "args": args if args is not None else ["-y", package] if package else []}
+            else:
+                try:
+                    entry = self._plan_entry(name, answers, interactive)
+                except ValueError as e:
+                    print(f"{Colors.RED}✗ {e}{Colors.NC}")
+                    failed_plan.append(name)
+                    continue
+                hooks[name] = self.registry.get(name).get("post_install")
+            if env:
+                entry.setdefault("env", {}).update(env)
+            entries[name] = entry
+        if not entries:
+            return False
+        
+        print(f"\n{Colors.BLUE}Verifying {len(entries)} servers...{Colors.NC}\n")
+        progress = ProgressDisplay(list(entries))
+        results = {}
+        start = time.monotonic()
+        with _phase("verify servers"), \
+                ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(entries)))) as pool:
+            futures = [pool.submit(self._install_one, name, entry, hooks.get(name),
+                                   probe, timeout, progress, limits, post_install_timeout)
+                       for name, entry in entries.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result["name"]] = result
+        progress.close()
+        if probe == "handshake":
+            _record_tools(entries, list(results.values()))
+        
+        failed = [name for name in entries if not results[name]["ok"]]
+        for name in entries:
+            if _format_cleanup(results[name].get("cleanup")):
+                print(f"{Colors.YELLOW}⚠ {name}: {_format_cleanup(results[name]['cleanup'])}{Colors.NC}")
+            if results[name].get("post_install") is False:
+                print(f"{Colors.YELLOW}⚠ Post-install for '{name}' failed:{Colors.NC}")
+                for line in results[name]["post_install_output"].splitlines()[-5:]:
+                    print(f"    {line}")
+        if failed:
+            print(f"\n{Colors.YELLOW}⚠ Could not verify: {', '.join(failed)}{Colors.NC}")
+            if yes or (interactive and input("Add them anyway? (y/n): ").lower() == 'y'):
+                failed = []
+            else:
+                for name in failed:
+                    del entries[name]
+        
+        if entries:
+            # Add to configuration, in a single save
+            self.servers.update(entries)
+            print()
+            self._save_config()
+            print(f"\n{Colors.GREEN}✓ Added {len(entries)} servers in "
+                  f"{time.monotonic() - start:.1f}s: {', '.join(entries)}{Colors.NC}")
+            print(f"\n{Colors.BLUE}Next steps:{Colors.NC}")
+            print("1. Set any required environment variables")
+            print("2. Restart Claude for changes to take effect")
+        return not failed and not failed_plan
+    
+    def remove_server(self, name: str):
+        """Remove an MCP server"""
+        servers = self.servers
+        
+        if name not in servers:
+            print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+            return False
+        
+        # Confirm removal
+        print(f"\n{Colors.YELLOW}Are you sure you want to remove '{name}'?{Colors.NC}")
+        response = input("Type 'yes' to confirm: ")
+        
+        if response.lower() != 'yes':
+            print("Cancelled")
+            return False
+        
+        # Remove from config
+        del self.servers[name]
+        self._save_config()
+        
+        print(f"{Colors.GREEN}✓ Successfully removed '{name}'{Colors.NC}")
+        return True
+    
+    def update_server(self, name: str, **kwargs):
+        """Update server configuration"""
+        servers = self.servers
+        
+        if name not in servers:
+            print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+            return False
+        
+        server = servers[name]
+        
+        # Update fields
+        if "command" in kwargs:
+            server["command"] = kwargs["command"]
+        
+        if "args" in kwargs:
+            server["args"] = kwargs["args"]
+        
+        if "env" in kwargs:
+            if "env" not in server:
+                server["env"] = {}
+            server["env"].update(kwargs["env"])
+        
+        self._save_config()
+        print(f"{Colors.GREEN}✓ Successfully updated '{name}'{Colors.NC}")
+        return True
+    
+    def _probe(self, names: List[str], concurrency: int, timeout: float,
+               probe: str, on_result=None, max_age: float = None, **options):
+        """Probe servers, in the daemon if one is running; returns (results, wall, missing)
+        
+        With ``max_age`` servers probed that recently are answered from the
+        health cache instead of being started.
+        """
+        if max_age is not None and not (options.get("resources") or options.get("soak")):
+            servers = self.servers
+            names = names or list(servers)
+            cached = _cached_results(servers, [name for name in names if name in servers],
+                                     probe, max_age)
+            for result in cached.values():
+                if on_result:
+                    on_result(result)
+            todo = [name for name in names if name not in cached]
+            if not todo:
+                return list(cached.values()), 0.0, []
+            results, wall, missing = self._probe(todo, concurrency, timeout, probe, on_result,
+                                                 **options)
+            return list(cached.values()) + results, wall, missing
+        
+        remote = self._remote("test", {"names": names, "concurrency": concurrency,
+                                       "timeout": timeout, "probe": probe,
+                                       "env": dict(os.environ), "options": options})
+        if remote is not None:
+            for result in remote["results"]:
+                if on_result:
+                    on_result(result)
+            return remote["results"], remote["wall"], remote["missing"]
+        
+        servers = self.servers
+        names = names or list(servers)
+        missing = [name for name in names if name not in servers]
+        names = [name for name in names if name in servers]
+        results, wall = _run_probes(servers, names, concurrency, timeout, probe,
+                                    on_result=on_result, **options)
+        return results, wall, missing
+    
+    def test_server(self, name: str, timeout: float = DEFAULT_TEST_TIMEOUT,
+                    probe: str = "handshake", as_json: bool = False, **options):
+        """Test an MCP server connection"""
+        if as_json:
+            results, wall, missing = self._probe([name], 1, timeout, probe, **options)
+            print(json.dumps({"results": results, "wall": wall, "missing": missing}, indent=2))
+            return bool(results) and results[0]["ok"]
+        
+        servers = (self._remote("list") or self.server_inventory())["servers"]
+        
+        if name not in servers:
+            print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+            return False
+        
+        server = servers[name]
+        print(f"\n{Colors.BLUE}Testing '{name}' server...{Colors.NC}")
+        
+        # Check environment variables
+        if "env" in server:
+            print(f"\n{Colors.CYAN}Environment variables:{Colors.NC}")
+            all_set = True
+            for var, value in server["env"].items():
+                env_name = _env_placeholder(value)
+                if env_name:
+                    is_set = env_name in os.environ
+                    status = f"{Colors.GREEN}✓{Colors.NC}" if is_set else f"{Colors.RED}✗{Colors.NC}"
+                    print(f"  {status} {var}: {env_name}")
+                    if not is_set:
+                        all_set = False
+            
+            if not all_set:
+                print(f"\n{Colors.YELLOW}⚠ Some environment variables are not set{Colors.NC}")
+        
+        # Test command
+        cmd = [server["command"] or ""] + server.get("args", [])
+        print(f"\n{Colors.CYAN}Testing command:{Colors.NC} {' '.join(cmd)}")
+        
+        # Run test
+        if options.get("soak"):
+            print(f"Soaking for {options['soak']:g}s...")
+        results, _, _ = self._probe([name], 1, timeout, probe, **options)
+        result = results[0]
+        if result.get("cached"):
+            print(f"{Colors.CYAN}Result from the health cache, probed "
+                  f"{_format_age(result['age'])} ago{Colors.NC}")
+        if result["ok"]:
+            print(f"{Colors.GREEN}✓ Server responded successfully ({result['latency']:.2f}s){Colors.NC}")
+            if result["output"]:
+                print(f"  Output: {result['output']}")
+        else:
+            print(f"{Colors.RED}✗ Server test failed ({result['latency']:.2f}s){Colors.NC}")
+            if result["error"]:
+                print(f"  Error: {result['error']}")
+        if _format_cleanup(result.get("cleanup")):
+            print(f"{Colors.YELLOW}⚠ Cleanup: {_format_cleanup(result['cleanup'])}{Colors.NC}")
+        
+        if probe == "handshake":
+            print(f"\n{Colors.CYAN}Timing:{Colors.NC}")
+            for key, label in (("spawn", "Spawn"),
+                               ("initialize", "Initialize response"),
+                               ("tools_list", "tools/list round trip")):
+                if result[key] is not None:
+                    print(f"  {label}: {result[key] * 1000:.0f}ms")
+            if result["tools"] is not None:
+                print(f"\n{Colors.CYAN}Tools ({len(result['tools'])}):{Colors.NC}")
+                for tool in result["tools"]:
+                    print(f"  • {tool}")
+        
+        usage = result.get("resources")
+        if usage:
+            print(f"\n{Colors.CYAN}Resources (process tree, {usage['samples']} samples):{Colors.NC}")
+            print(f"  RSS: {usage['peak_rss_mb']:.1f}MB peak, {usage['steady_rss_mb']:.1f}MB steady")
+            print(f"  CPU time: {usage['cpu_time']:.2f}s")
+            print(f"  Threads: {usage['peak_threads']}  File descriptors: {usage['peak_fds']}  "
+                  f"Child processes: {usage['peak_children']}")
+        if result.get("soak"):
+            print(f"\n{Colors.CYAN}Soak:{Colors.NC} {_format_growth(result['soak'])}")
+            if "latency" in result["soak"]:
+                latency = result["soak"]["latency"]
+                if latency["p50"] is not None:
+                    print(f"  Latency: p50 {latency['p50']:.1f}ms, p95 {latency['p95']:.1f}ms, "
+                          f"max {latency['max']:.1f}ms")
+        
+        return result["ok"]
+    
+    def test_servers(self, names: List[str] = None,
+                     concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                     timeout: float = DEFAULT_TEST_TIMEOUT,
+                     probe: str = "handshake", as_json: bool = False, **options):
+        """Test several MCP servers concurrently"""
+        if as_json:
+            results, wall, missing = self._probe(names, concurrency, timeout, probe, **options)
+            print(json.dumps({"results": results, "wall": wall, "missing": missing}, indent=2))
+            return bool(results) and all(r["ok"] for r in results) and not missing
+        
+        width = max([len(name) for name in names or []] + [8])
+        
+        def show(result: Dict[str, Any]):
+            if result["ok"]:
+                status = f"{Colors.GREEN}✓{Colors.NC}"
+                detail = result["output"].splitlines()[0] if result["output"] else ""
+                if probe == "handshake":
+                    detail = f"{detail} ({_format_phases(result)})"
+            else:
+                status = f"{Colors.RED}✗{Colors.NC}"
+                detail = result["error"].splitlines()[-1] if result["error"] else "failed"
+            if result.get("cached"):
+                detail = f"{detail} [cached {_format_age(result['age'])} ago]"
+            print(f"  {status} {result['name']:<{width}}  {result['latency']:6.2f}s  {detail}")
+            if _format_cleanup(result.get("cleanup")):
+                print(f"    {' ' * width}  {Colors.YELLOW}{_format_cleanup(result['cleanup'])}{Colors.NC}")
+            if result.get("resources"):
+                print(f"    {' ' * width}  {_format_resources(result['resources'])}")
+            if result.get("soak"):
+                print(f"    {' ' * width}  soak: {_format_growth(result['soak'])}")
+        
+        print(f"\n{Colors.BLUE}Testing {len(names) if names else 'all'} servers "
+              f"(concurrency {concurrency}, timeout {timeout:g}s)...{Colors.NC}\n")
+        results, wall, missing = self._probe(names, concurrency, timeout, probe,
+                                             on_result=show, **options)
+        
+        for name in missing:
+            print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+        if not results:
+            if not missing:
+                print(f"{Colors.YELLOW}No MCP servers installed{Colors.NC}")
+            return False
+        
+        passed = sum(1 for r in results if r["ok"])
+        total = sum(r["latency"] for r in results)
+        color = Colors.GREEN if passed == len(results) and not missing else Colors.YELLOW
+        print(f"\n{color}{passed}/{len(results)} servers passed{Colors.NC}")
+        leaked = [r["name"] for r in results if (r.get("cleanup") or {}).get("leftover")]
+        if leaked:
+            print(f"{Colors.RED}  Processes still running after cleanup: {', '.join(leaked)}{Colors.NC}")
+        print(f"  Wall time: {wall:.2f}s (sequential would be ~{total:.2f}s)")
+        return passed == len(results) and not missing
+    
+    def metrics(self, max_age: float = HEALTH_TTL, cached_only: bool = False,
+                concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                timeout: float = DEFAULT_TEST_TIMEOUT,
+                output_file: str = None, as_json: bool = False):
+        """Export server health as Prometheus textfile metrics or JSON
+        
+        Servers without a health cache entry younger than ``max_age`` are
+        probed first (unless ``cached_only``), so running this from cron
+        starts each server at most once per TTL.
+        """
+        servers = self.servers
+        health = HealthCache()
+        entries = {name: health.get(name, server, "handshake") for name, server in servers.items()}
+        stale = [name for name, entry in entries.items() if not entry or entry["age"] > max_age]
+        if stale and not cached_only:
+            results, _, _ = self._probe(stale, concurrency, timeout, "handshake")
+            for result in results:
+                entries[result["name"]] = dict(HealthCache.entry(result, "handshake"), age=0.0)
+        
+        rows = []
+        for name in sorted(servers):
+            entry = entries[name]
+            if entry is None:
+                rows.append({"server": name, "up": None, "startup": None, "age": None,
+                             "probed_at": None, "latency": None, "error": None})
+                continue
+            rows.append({"server": name, "up": 1 if entry["ok"] else 0,
+                         "startup": entry["initialize"] if entry["ok"] else None,
+                         "age": round(entry["age"], 3), "probed_at": round(entry["probed_at"], 3),
+                         "latency": entry["latency"], "error": entry["error"] or None})
+        
+        if as_json:
+            text = json.dumps({"config": str(self.config_path), "generated": time.time(),
+                               "max_age": max_age, "servers": rows}, indent=2) + "\n"
+        else:
+            text = _prometheus_text([row for row in rows if row["up"] is not None],
+                                    {"config": str(self.config_path)})
+        if output_file:
+            # The textfile collector may read at any time, so replace the file in one step
+            _write_text_atomic(Path(output_file), text)
+        else:
+            sys.stdout.write(text)
+        return True
+    
+    def bench_servers(self, names: List[str] = None,
+                      runs: int = DEFAULT_BENCH_RUNS,
+                      cold_runs: int = DEFAULT_BENCH_COLD_RUNS,
+                      timeout: float = DEFAULT_TEST_TIMEOUT,
+                      output_file: str = None, compare_file: str = None,
+                      threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+                      resources: bool = False):
+        """Benchmark cold/warm startup and first-request latency"""
+        import datetime
+        import platform
+        servers = self.servers
+        names = names or list(servers)
+        
+        for name in names:
+            if name not in servers:
+                print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+                return False
+        if not names:
+            print(f"{Colors.YELLOW}No MCP servers installed{Colors.NC}")
+            return False
+        
+        baseline = None
+        if compare_file:
+            try:
+                with open(compare_file, 'r') as f:
+                    baseline = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"{Colors.RED}Cannot read baseline {compare_file}: {e}{Colors.NC}")
+                return False
+        
+        print(f"\n{Colors.BLUE}Benchmarking {len(names)} servers "
+              f"({cold_runs} cold, {runs} warm runs each)...{Colors.NC}")
+        
+        results = {
+            "version": 1,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "runs": runs,
+            "cold_runs": cold_runs,
+            "servers": {},
+        }
+        
+        def fmt(stats: Dict[str, Any]) -> str:
+            if stats["p50"] is None:
+                return "-"
+            return f"{stats['p50']:.0f}/{stats['p95']:.0f}/{stats['max']:.0f}"
+        
+        width = max(len(name) for name in names)
+        print(f"\n  {'Server':<{width}}  {'Mode':<4}  {'OK':>5}  "
+              f"{'Ready ms p50/p95/max':>22}  {'First request ms':>22}")
+        for name in names:
+            report = _bench_server(name, servers[name], runs, cold_runs, timeout, resources)
+            results["servers"][name] = report
+            for mode in ("cold", "warm"):
+                if mode not in report:
+                    continue
+                stats = report[mode]
+                ok = f"{stats['runs'] - stats['failures']}/{stats['runs']}"
+                color = Colors.RED if stats["failures"] else ""
+                print(f"  {color}{name:<{width}}  {mode:<4}  {ok:>5}  "
+                      f"{fmt(stats['ready']):>22}  {fmt(stats['first_request']):>22}"
+                      f"{Colors.NC if color else ''}")
+                for error in stats["errors"]:
+                    print(f"    {Colors.RED}✗ {error}{Colors.NC}")
+                usage = stats.get("resources")
+                if usage:
+                    print(f"    {' ' * width}  rss {usage['peak_rss_mb']:.0f}MB peak, "
+                          f"cpu {usage['cpu_time_p50']:.2f}s p50, {usage['peak_threads']} threads, "
+                          f"{usage['peak_fds']} fds, {usage['peak_children']} children")
+        
+        if output_file:
+            _write_bench_results(results, output_file)
+            print(f"\n{Colors.GREEN}✓ Wrote results to: {output_file}{Colors.NC}")
+        
+        if baseline is None:
+            return True
+        
+        rows = _compare_bench(results, baseline, threshold)
+        regressions = [row for row in rows if row["regression"]]
+        print(f"\n{Colors.BLUE}Comparison with {compare_file} "
+              f"(threshold {threshold:g}%):{Colors.NC}")
+        if not rows:
+            print(f"  {Colors.YELLOW}No common servers to compare{Colors.NC}")
+        for row in rows:
+            color = Colors.RED if row["regression"] else Colors.GREEN
+            label = f"{row['server']} {row['mode']} {row['metric']} {row['stat']}"
+            print(f"  {color}{label:<{width + 26}} {row['baseline']:8.1f} → "
+                  f"{row['current']:8.1f}ms  {row['change']:+6.1f}%{Colors.NC}")
+        if regressions:
+            print(f"\n{Colors.RED}✗ {len(regressions)} regressions beyond {threshold:g}%{Colors.NC}")
+            return False
+        print(f"\n{Colors.GREEN}✓ No regressions{Colors.NC}")
+        return True
+    
+    def prefetch_servers(self, names: List[str] = None, pin: bool = False,
+                         version: str = None,
+                         concurrency: int = DEFAULT_TEST_CONCURRENCY):
+        """Install server packages into the local store, optionally pinning them"""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        servers = self.servers
+        ledger = RewriteLedger()
+        if not names:
+            names = [name for name, server in servers.items()
+                     if _parse_npx_args(server) or (pin and ledger.layer(self.config_path, name, "pin"))]
+        
+        for name in names:
+            if name not in servers:
+                print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+                return False
+        
+        todo = []
+        for name in names:
+            layer = ledger.layer(self.config_path, name, "pin")
+            if layer and not version:
+                print(f"  {Colors.YELLOW}⚠ '{name}' is already pinned to "
+                      f"{layer['package']}@{layer['version']}{Colors.NC}")
+            elif layer:
+                print(f"  {Colors.YELLOW}⚠ '{name}' is pinned; run 'unpin {name}' before "
+                      f"pinning another version{Colors.NC}")
+            else:
+                todo.append(name)
+        if not todo:
+            if not names:
+                print(f"{Colors.YELLOW}No npx servers to prefetch{Colors.NC}")
+            return bool(names) and not version
+        
+        action = "Pinning" if pin else "Prefetching"
+        print(f"\n{Colors.BLUE}{action} {len(todo)} servers into {PACKAGE_STORE}...{Colors.NC}\n")
+        
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(todo)))) as pool:
+            futures = [pool.submit(_prefetch, name, servers[name], version) for name in todo]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result["ok"]:
+                    print(f"  {Colors.GREEN}✓{Colors.NC} {result['name']}: "
+                          f"{result['package']}@{result['version']}")
+                else:
+                    print(f"  {Colors.RED}✗{Colors.NC} {result['name']}: {result['error']}")
+        
+        pinned = [result for result in results if result["ok"]] if pin else []
+        for result in pinned:
+            name = result["name"]
+            original = servers[name]
+            rewritten = dict(original, **result["pinned"])
+            servers[name] = rewritten
+            ledger.push(self.config_path, name, "pin", original, rewritten,
+                        package=result["package"], version=result["version"])
+        if pinned:
+            self._save_config()
+            ledger.save()
+            print(f"\n{Colors.GREEN}✓ Pinned {len(pinned)} servers to local installs{Colors.NC}")
+            print("Restart Claude for changes to take effect")
+        
+        return all(result["ok"] for result in results)
+    
+    def unpin_servers(self, names: List[str] = None):
+        """Restore the original npx entries of pinned servers"""
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or [name for name in servers
+                          if ledger.layer(self.config_path, name, "pin")]
+        if not names:
+            print(f"{Colors.YELLOW}No pinned servers{Colors.NC}")
+            return True
+        
+        restored = 0
+        for name in names:
+            try:
+                layer = ledger.pop(self.config_path, name, "pin")
+            except KeyError:
+                print(f"{Colors.YELLOW}⚠ '{name}' is not pinned{Colors.NC}")
+                continue
+            except ValueError as e:
+                print(f"{Colors.RED}✗ {e}{Colors.NC}")
+                continue
+            if servers.get(name) != layer["rewritten"]:
+                print(f"{Colors.YELLOW}⚠ '{name}' was edited after pinning; "
+                      f"restoring the original entry anyway{Colors.NC}")
+            servers[name] = layer["original"]
+            restored += 1
+            print(f"  {Colors.GREEN}✓{Colors.NC} {name}: restored "
+                  f"{layer['original'].get('command')} {' '.join(layer['original'].get('args', []))}")
+        
+        if restored:
+            self._save_config()
+            ledger.save()
+        return restored == len(names)
+    
+    def pool_servers(self, names: List[str] = None):
+        """Rewrite servers to attach to the warm pool instead of spawning"""
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or [name for name in servers
+                          if not ledger.layer(self.config_path, name, "pool")]
+        if not names:
+            print(f"{Colors.YELLOW}No servers to pool{Colors.NC}")
+            return True
+        
+        script = str(MANAGER_SCRIPT)
+        pooled = 0
+        for name in names:
+            if name not in servers:
+                print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+                continue
+            if ledger.layer(self.config_path, name, "pool"):
+                print(f"  {Colors.YELLOW}⚠ '{name}' is already pooled{Colors.NC}")
+                continue
+            original = servers[name]
+            rewritten = dict(original, command=sys.executable,
+                             args=[script, "attach", name, "--source", str(self.config_path)])
+            servers[name] = rewritten
+            ledger.push(self.config_path, name, "pool", original, rewritten)
+            pooled += 1
+            print(f"  {Colors.GREEN}✓{Colors.NC} {name}")
+        
+        if pooled:
+            self._save_config()
+            ledger.save()
+            print(f"\n{Colors.GREEN}✓ Pooled {pooled} servers{Colors.NC}")
+            print(f"Start the pool with '{sys.argv[0]} pool serve' and restart Claude")
+        return pooled == len(names)
+    
+    def unpool_servers(self, names: List[str] = None):
+        """Restore the original entries of pooled servers"""
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or [name for name in servers
+                          if ledger.layer(self.config_path, name, "pool")]
+        if not names:
+            print(f"{Colors.YELLOW}No pooled servers{Colors.NC}")
+            return True
+        
+        restored = 0
+        for name in names:
+            try:
+                layer = ledger.pop(self.config_path, name, "pool")
+            except KeyError:
+                print(f"{Colors.YELLOW}⚠ '{name}' is not pooled{Colors.NC}")
+                continue
+            except ValueError as e:
+                print(f"{Colors.RED}✗ {e}{Colors.NC}")
+                continue
+            servers[name] = layer["original"]
+            restored += 1
+            print(f"  {Colors.GREEN}✓{Colors.NC} {name}: restored")
+        
+        if restored:
+            self._save_config()
+            ledger.save()
+        return restored == len(names)
+    
+    def trace_servers(self, names: List[str] = None, capacity: int = DEFAULT_TRACE_CAPACITY,
+                      capture: bool = False):
+        """Rewrite servers to run through the tracing relay
+        
+        With ``capture`` the relay also saves the requests it sees as NDJSON,
+        for use as a replay script.
+        """
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or [name for name in servers
+                          if not ledger.layer(self.config_path, name, "trace")]
+        if not names:
+            print(f"{Colors.YELLOW}No servers to trace{Colors.NC}")
+            return True
+        
+        script = str(MANAGER_SCRIPT)
+        traced = 0
+        for name in names:
+            if name not in servers:
+                print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+                continue
+            if ledger.layer(self.config_path, name, "trace"):
+                print(f"  {Colors.YELLOW}⚠ '{name}' is already traced{Colors.NC}")
+                continue
+            ring = _trace_path(self.config_path, name)
+            TraceRing(ring, capacity, reset=True).close()
+            info = {"ring": str(ring), "capacity": capacity}
+            if capture:
+                info["capture"] = str(ring.with_suffix(".ndjson"))
+                Path(info["capture"]).write_bytes(b"")
+            original = servers[name]
+            rewritten = dict(original, command=sys.executable,
+                             args=[script, "trace", "relay", name, "--source", str(self.config_path)])
+            servers[name] = rewritten
+            ledger.push(self.config_path, name, "trace", original, rewritten, **info)
+            traced += 1
+            print(f"  {Colors.GREEN}✓{Colors.NC} {name}"
+                  f"{'  (capturing to ' + info['capture'] + ')' if capture else ''}")
+        
+        if traced:
+            self._save_config()
+            ledger.save()
+            print(f"\n{Colors.GREEN}✓ Tracing {traced} servers{Colors.NC}")
+            print(f"Restart Claude, then run '{sys.argv[0]} trace report <server>'")
+        return traced == len(names)
+    
+    def untrace_servers(self, names: List[str] = None):
+        """Restore the original entries of traced servers (keeping their traces)"""
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or [name for name in servers
+                          if ledger.layer(self.config_path, name, "trace")]
+        if not names:
+            print(f"{Colors.YELLOW}No traced servers{Colors.NC}")
+            return True
+        
+        restored = 0
+        for name in names:
+            try:
+                layer = ledger.pop(self.config_path, name, "trace")
+            except KeyError:
+                print(f"{Colors.YELLOW}⚠ '{name}' is not traced{Colors.NC}")
+                continue
+            except ValueError as e:
+                print(f"{Colors.RED}✗ {e}{Colors.NC}")
+                continue
+            servers[name] = layer["original"]
+            restored += 1
+            print(f"  {Colors.GREEN}✓{Colors.NC} {name}: restored")
+        
+        if restored:
+            self._save_config()
+            ledger.save()
+        return restored == len(names)
+    
+    def lazy_servers(self, names: List[str] = None,
+                     idle_timeout: float = DEFAULT_LAZY_IDLE_TIMEOUT,
+                     timeout: float = DEFAULT_TEST_TIMEOUT):
+        """Rewrite servers to start on first use behind the lazy shim
+        
+        Each server is started once to snapshot its capabilities. Running
+        this on a server that is already lazy refreshes its snapshot.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or list(servers)
+        if not names:
+            print(f"{Colors.YELLOW}No servers to make lazy{Colors.NC}")
+            return True
+        for name in names:
+            if name not in servers:
+                print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+                return False
+        
+        def original(name: str) -> Dict[str, Any]:
+            layer = ledger.layer(self.config_path, name, "lazy")
+            return layer["original"] if layer else servers[name]
+        
+        print(f"\n{Colors.BLUE}Snapshotting {len(names)} servers...{Colors.NC}\n")
+        snapshots = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(DEFAULT_TEST_CONCURRENCY, len(names)))) as pool:
+            futures = {pool.submit(_lazy_snapshot, original(name), timeout): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    snapshots[name] = future.result()
+                except (MCPError, OSError) as e:
+                    print(f"  {Colors.RED}✗{Colors.NC} {name}: {e}")
+        
+        changed = 0
+        for name in names:
+            if name not in snapshots:
+                continue
+            path = _lazy_path(self.config_path, name)
+            _write_json_atomic(path, snapshots[name], indent=None)
+            answered = ", ".join(snapshots[name]["lists"]) or "initialize only"
+            layer = ledger.layer(self.config_path, name, "lazy")
+            if layer:
+                layer["idle_timeout"] = idle_timeout
+                print(f"  {Colors.GREEN}✓{Colors.NC} {name}: snapshot refreshed ({answered})")
+            else:
+                rewritten = dict(servers[name], command=sys.executable,
+                                 args=[str(MANAGER_SCRIPT), "lazy", "shim", name,
+                                       "--source", str(self.config_path)])
+                ledger.push(self.config_path, name, "lazy", servers[name], rewritten,
+                            snapshot=str(path), idle_timeout=idle_timeout)
+                servers[name] = rewritten
+                print(f"  {Colors.GREEN}✓{Colors.NC} {name}: starts on first use ({answered})")
+            changed += 1
+        
+        if changed:
+            self._save_config()
+            ledger.save()
+            print(f"\n{Colors.GREEN}✓ {changed} lazy servers{Colors.NC}")
+            print("Restart Claude to use them")
+        return changed == len(names)
+    
+    def unlazy_servers(self, names: List[str] = None):
+        """Restore the original entries of lazy servers"""
+        servers = self.servers
+        ledger = RewriteLedger()
+        names = names or [name for name in servers
+                          if ledger.layer(self.config_path, name, "lazy")]
+        if not names:
+            print(f"{Colors.YELLOW}No lazy servers{Colors.NC}")
+            return True
+        
+        restored = 0
+        for name in names:
+            try:
+                layer = ledger.pop(self.config_path, name, "lazy")
+            except KeyError:
+                print(f"{Colors.YELLOW}⚠ '{name}' is not lazy{Colors.NC}")
+                continue
+            except ValueError as e:
+                print(f"{Colors.RED}✗ {e}{Colors.NC}")
+                continue
+            servers[name] = layer["original"]
+            with contextlib.suppress(OSError):
+                Path(layer["snapshot"]).unlink()
+            restored += 1
+            print(f"  {Colors.GREEN}✓{Colors.NC} {name}: restored")
+        
+        if restored:
+            self._save_config()
+            ledger.save()
+        return restored == len(names)
+    
+    def replay(self, name: str, script_file: str, variants: List[str] = None,
+               rate: float = None, concurrency: int = DEFAULT_REPLAY_CONCURRENCY,
+               iterations: int = 1, duration: float = None, warmup: int = 0,
+               timeout: float = DEFAULT_TEST_TIMEOUT,
+               threshold: float = DEFAULT_REGRESSION_THRESHOLD, as_json: bool = False):
+        """Replay a request script against a server and its variants"""
+        import shlex
+        if name not in self.servers:
+            print(f"{Colors.RED}Server '{name}' not found{Colors.NC}")
+            return False
+        try:
+            script = _load_replay_script(script_file)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.RED}Cannot read script {script_file}: {e}{Colors.NC}")
+            return False
+        
+        runs = [(name, self.servers[name])]
+        for variant in variants or []:
+            label, sep, command = variant.partition("=")
+            parts = shlex.split(command)
+            if not sep or not label or not parts:
+                print(f"{Colors.RED}Invalid variant '{variant}' (expected LABEL=COMMAND ARGS){Colors.NC}")
+                return False
+            runs.append((label, dict(self.servers[name], command=parts[0], args=parts[1:])))
+        
+        mode = f"{rate:g} req/s" if rate else f"concurrency {concurrency}"
+        amount = _format_age(duration) if duration else f"{iterations} × {len(script)} steps"
+        if not as_json:
+            print(f"\n{Colors.BLUE}Replaying {script_file} against {name} "
+                  f"({amount}, {mode}){Colors.NC}\n")
+        results = []
+        for label, server in runs:
+            if not as_json:
+                print(f"  {label}...", flush=True)
+            results.append(_replay(label, server, script, rate, concurrency,
+                                   iterations, duration, warmup, timeout))
+        if as_json:
+            print(json.dumps({"server": name, "script": script_file, "runs": results}, indent=2))
+            return all(not result["failure"] for result in results)
+        
+        def fmt(value, spec=".1f"):
+            return format(value, spec) if value is not None else "-"
+        
+        width = max(len("Variant"), *(len(result["label"]) for result in results))
+        print(f"\n  {'Variant':<{width}}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  "
+              f"{'p99 ms':>8}  {'max ms':>8}  {'errors':>7}  {'startup':>8}")
+        for result in results:
+            color = Colors.RED if result["failure"] or result["errors"] else Colors.CYAN
+            print(f"  {color}{result['label']:<{width}}{Colors.NC}  {fmt(result['throughput']):>8}  "
+                  f"{fmt(result['p50']):>8}  {fmt(result['p95']):>8}  {fmt(result['p99']):>8}  "
+                  f"{fmt(result['max']):>8}  {fmt(result['error_rate']):>6}%  "
+                  f"{fmt(result['startup'], '.2f'):>7}s")
+        for result in results:
+            if result["failure"]:
+                print(f"  {Colors.RED}✗ {result['label']}: {result['failure']}{Colors.NC}")
+        
+        regressions = 0
+        baseline = results[0]
+        for result in results[1:]:
+            if result["failure"] or baseline["failure"]:
+                continue  # partial runs are not comparable
+            changes = []
+            for stat in ("p50", "p95", "p99"):
+                old, new = baseline[stat], result[stat]
+                if old and new is not None:
+                    change = (new - old) / old * 100
+                    regressed = change > threshold and new - old >= REGRESSION_FLOOR_MS
+                    regressions += regressed
+                    color = Colors.RED if regressed else Colors.GREEN if change <= 0 else Colors.NC
+                    changes.append(f"{stat} {color}{change:+.1f}%{Colors.NC}")
+            if baseline["throughput"] and result["throughput"] is not None:
+                change = (result["throughput"] - baseline["throughput"]) / baseline["throughput"] * 100
+                changes.append(f"req/s {change:+.1f}%")
+            if changes:
+                print(f"\n  {result['label']} vs {baseline['label']}: {', '.join(changes)}")
+        if regressions:
+            print(f"\n{Colors.RED}✗ {regressions} latency regressions beyond {threshold:g}%{Colors.NC}")
+        return not regressions and all(not result["failure"] for result in results)
+    
+    def trace_report(self, name: str, since: float = None, as_json: bool = False):
+        """Summarize the recorded traffic of a server"""
+        import datetime
+        path = _trace_path(self.config_path, name)
+        if not path.exists():
+            print(f"{Colors.YELLOW}No trace for '{name}' (enable it with 'trace on {name}'){Colors.NC}")
+            return False
+        ring = TraceRing(path)
+        records, written, capacity = ring.records(), ring.written, ring.capacity
+        ring.close()
+        if since:
+            cutoff = time.time() - since
+            records = [record for record in records if record["start"] >= cutoff]
+        calls = [record for record in records if not record["notification"]]
+        report = {
+            "server": name,
+            "calls": len(calls),
+            "notifications": len(records) - len(calls),
+            "dropped": max(0, written - capacity),
+            "first": records[0]["start"] if records else None,
+            "last": records[-1]["start"] if records else None,
+            "methods": _trace_stats(calls, "method"),
+            "tools": _trace_stats(calls, "tool"),
+        }
+        if as_json:
+            print(json.dumps(report, indent=2))
+            return True
+        
+        if not calls:
+            print(f"{Colors.YELLOW}No calls recorded for '{name}' yet{Colors.NC}")
+            return True
+        span = datetime.datetime.fromtimestamp(report["first"]).strftime("%Y-%m-%d %H:%M")
+        dropped = f" ({report['dropped']} older records overwritten)" if report["dropped"] else ""
+        print(f"\n{Colors.BLUE}Traffic of {name}: {report['calls']} calls since {span}"
+              f"{dropped}{Colors.NC}")
+        
+        def fmt(value):
+            return f"{value:.1f}" if value is not None else "-"
+        
+        def size(total, count):
+            return f"{total / count / 1024:.1f} KB"
+        
+        for title, key in (("Method", "methods"), ("Tool", "tools")):
+            if not report[key]:
+                continue
+            width = max(len(title), *(len(group) for group in report[key]))
+            print(f"\n  {title:<{width}}  {'calls':>6}  {'errors':>6}  {'p50 ms':>8}  "
+                  f"{'p95 ms':>8}  {'p99 ms':>8}  {'avg in':>8}  {'avg out':>8}")
+            for group, stats in report[key].items():
+                color = Colors.RED if stats["errors"] or stats["unanswered"] else Colors.CYAN
+                print(f"  {color}{group:<{width}}{Colors.NC}  {stats['count']:>6}  "
+                      f"{stats['errors']:>6}  {fmt(stats['p50']):>8}  {fmt(stats['p95']):>8}  "
+                      f"{fmt(stats['p99']):>8}  "
+                      f"{size(stats['request_bytes'], stats['count']):>8}  "
+                      f"{size(stats['response_bytes'], stats['count']):>8}")
+        return True
+    
+    def serve_pool(self, socket_path: Path = POOL_SOCKET,
+                   max_size: int = DEFAULT_POOL_MAX_SIZE,
+                   idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT,
+                   warm: bool = False):
+        """Run the warm server pool"""
+        import socket
+        if not hasattr(socket, "AF_UNIX"):
+            print(f"{Colors.RED}pool needs Unix-domain socket support{Colors.NC}")
+            return False
+        pool = ServerPool(self.config_path, socket_path, max_size, idle_timeout)
+        print(f"{Colors.GREEN}✓ Pool listening on {socket_path} "
+              f"(max {max_size} servers, idle timeout {idle_timeout:g}s){Colors.NC}", flush=True)
+        try:
+            pool.serve(warm=warm)
+        except RuntimeError as e:
+            print(f"{Colors.RED}{e}{Colors.NC}")
+            return False
+        return True
+    
+    def pool_status(self, socket_path: Path = POOL_SOCKET, as_json: bool = False):
+        """Show the processes the pool keeps warm"""
+        try:
+            reply = _pool_call({"op": "status"}, socket_path)
+        except OSError:
+            print(f"{Colors.YELLOW}Pool is not running{Colors.NC}")
+            return False
+        if as_json:
+            print(json.dumps(reply["instances"], indent=2))
+            return True
+        if not reply["instances"]:
+            print(f"{Colors.YELLOW}Pool is running with no warm servers{Colors.NC}")
+            return True
+        print(f"\n{Colors.BLUE}Warm servers:{Colors.NC}\n")
+        for instance in reply["instances"]:
+            status = f"{Colors.GREEN}✓{Colors.NC}" if instance["alive"] else f"{Colors.RED}✗{Colors.NC}"
+            usage = (f"{instance['clients']} clients" if instance["clients"]
+                     else f"idle {instance['idle']:.0f}s")
+            print(f"  {status} {instance['name']:<20} pid {instance['pid']:<8} {usage}")
+        return True
+    
+    def apply_manifest(self, manifest_file: str, prune: bool = False,
+                       dry_run: bool = False, verify: bool = True,
+                       force: bool = False, probe: str = "handshake",
+                       concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                       timeout: float = DEFAULT_TEST_TIMEOUT):
+        """Make mcpServers match a manifest in a single save"""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        try:
+            desired = _load_manifest(manifest_file, self.registry)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.RED}Cannot read manifest {manifest_file}: {e}{Colors.NC}")
+            return False
+        
+        servers = self.servers
+        plan = _diff_servers(servers, desired, prune)
+        
+        print(f"\n{Colors.BLUE}Plan for {self.config_path or Path.home() / '.claude.json'}:{Colors.NC}\n")
+        for name in plan["add"]:
+            entry = desired[name]
+            print(f"  {Colors.GREEN}+ {name}{Colors.NC}  "
+                  f"{entry.get('command', '')} {' '.join(entry.get('args', []))}")
+        for name in plan["change"]:
+            print(f"  {Colors.YELLOW}~ {name}{Colors.NC}  "
+                  f"({_describe_change(servers[name], desired[name])})")
+        for name in plan["remove"]:
+            print(f"  {Colors.RED}- {name}{Colors.NC}")
+        changes = len(plan["add"]) + len(plan["change"]) + len(plan["remove"])
+        print(f"\n  {len(plan['add'])} to add, {len(plan['change'])} to change, "
+              f"{len(plan['remove'])} to remove, {len(plan['same'])} unchanged")
+        
+        if not changes:
+            print(f"\n{Colors.GREEN}✓ Configuration already matches the manifest{Colors.NC}")
+            return True
+        if dry_run:
+            return True
+        
+        to_verify = plan["add"] + plan["change"]
+        if verify and to_verify:
+            print(f"\n{Colors.BLUE}Verifying {len(to_verify)} servers...{Colors.NC}\n")
+            failed = []
+            workers = max(1, min(concurrency, len(to_verify)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(PROBES[probe], name, desired[name], timeout)
+                           for name in to_verify]
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result["ok"]:
+                        print(f"  {Colors.GREEN}✓{Colors.NC} {result['name']} "
+                              f"({result['latency']:.2f}s)")
+                    else:
+                        failed.append(result["name"])
+                        print(f"  {Colors.RED}✗{Colors.NC} {result['name']}: {result['error']}")
+            if failed and not force:
+                print(f"\n{Colors.RED}✗ {len(failed)} servers failed verification; "
+                      f"nothing was changed (use --force to apply anyway){Colors.NC}")
+                return False
+        
+        for name in to_verify:
+            servers[name] = desired[name]
+        for name in plan["remove"]:
+            del servers[name]
+        
+        print()
+        self._save_config()
+        print(f"{Colors.GREEN}✓ Applied {changes} changes{Colors.NC}")
+        print("Restart Claude for changes to take effect")
+        return True
+    
+    def validation_report(self, env: Dict[str, str] = None, skip: List[str] = None,
+                          concurrency: int = DEFAULT_TEST_CONCURRENCY) -> Dict[str, Any]:
+        """Check the configuration offline without changing anything"""
+        start = time.monotonic()
+        report = {"config": str(self.config_path), "valid": True, "structure_ok": True,
+                  "has_servers_section": True, "errors": 0, "warnings": 0,
+                  "servers": {}, "issues": []}
+        servers = self.servers
+        if self.section_missing and "mcpServers" in self.config and self.config["mcpServers"] != {}:
+            report["structure_ok"] = report["valid"] = False
+            report["errors"] = 1
+            report["issues"].append({"server": None, "rule": "structure", "severity": "error",
+                                     "message": "Invalid configuration structure"})
+            return report
+        report["has_servers_section"] = not self.section_missing
+        
+        ctx = ValidationContext(env)
+        rules = [rule for rule in VALIDATION_RULES if rule not in (skip or [])]
+        checked = _validate_servers(servers, ctx, rules, concurrency)
+        for name, issues in checked.items():
+            server = servers[name]
+            report["servers"][name] = {
+                "command": server.get("command") if isinstance(server, dict) else None,
+                "resolved": ctx.which(server["command"]) if _runnable(server) else None,
+                "issues": issues,
+            }
+            for issue in issues:
+                report["issues"].append(dict(issue, server=name))
+                report["errors" if issue["severity"] == "error" else "warnings"] += 1
+        report["valid"] = report["errors"] == 0
+        report["elapsed"] = time.monotonic() - start
+        return report
+    
+    def validate_config(self, as_json: bool = False, strict: bool = False,
+                        skip: List[str] = None,
+                        concurrency: int = DEFAULT_TEST_CONCURRENCY) -> int:
+        """Validate the entire configuration; returns the exit status
+        
+        0 when valid, 1 when there are errors and 2 when ``strict`` and
+        there are only warnings.
+        """
+        report = self._remote("validate", {"env": dict(os.environ), "skip": skip or [],
+                                           "concurrency": concurrency})
+        report = report or self.validation_report(skip=skip, concurrency=concurrency)
+        status = 1 if report["errors"] else (2 if strict and report["warnings"] else 0)
+        if as_json:
+            print(json.dumps(dict(report, status=status), indent=2))
+            return status
+        
+        print(f"\n{Colors.BLUE}Validating configuration...{Colors.NC}")
+        
+        # Check JSON structure
+        if not report["structure_ok"]:
+            print(f"{Colors.RED}✗ Invalid configuration structure{Colors.NC}")
+            return status
+        
+        # Check mcpServers
+        if not report["has_servers_section"]:
+            print(f"{Colors.YELLOW}⚠ No mcpServers section found{Colors.NC}")
+        
+        for name, server in report["servers"].items():
+            print(f"\n{Colors.CYAN}Checking '{name}'...{Colors.NC}")
+            if server["resolved"]:
+                print(f"  {Colors.GREEN}✓ Command: {server['command']} → {server['resolved']}{Colors.NC}")
+            for issue in server["issues"]:
+                if issue["severity"] == "error":
+                    print(f"  {Colors.RED}✗ {issue['message']}{Colors.NC}")
+                else:
+                    print(f"  {Colors.YELLOW}⚠ {issue['message']}{Colors.NC}")
+        
+        summary = f"{report['errors']} errors, {report['warnings']} warnings"
+        elapsed = f" ({report['elapsed'] * 1000:.0f}ms)" if "elapsed" in report else ""
+        if report["errors"]:
+            print(f"\n{Colors.RED}✗ Found {summary}{elapsed}{Colors.NC}")
+        elif report["warnings"]:
+            print(f"\n{Colors.YELLOW}⚠ Configuration is valid with {report['warnings']} warnings{elapsed}{Colors.NC}")
+        else:
+            print(f"\n{Colors.GREEN}✓ Configuration is valid{elapsed}{Colors.NC}")
+        return status
+    
+    def watch(self, test: bool = True, initial: bool = False, skip: List[str] = None,
+              probe: str = "handshake", concurrency: int = DEFAULT_TEST_CONCURRENCY,
+              timeout: float = DEFAULT_TEST_TIMEOUT, poll: bool = False, as_json: bool = False):
+        """Re-validate and re-test only the server entries that change
+        
+        After each burst of writes to the config file the mcpServers entries
+        are hashed and compared with the previous version; added and
+        modified entries are validated and, if valid, probed. Results are
+        printed (or emitted as JSON lines) as they complete.
+        """
+        import datetime
+        watcher = ConfigWatcher(self.config_path, poll=poll)
+        rules = [rule for rule in VALIDATION_RULES if rule not in (skip or [])]
+        
+        def emit(event: Dict[str, Any]):
+            print(json.dumps(dict(event, time=time.time())), flush=True)
+        
+        def show(result: Dict[str, Any]):
+            if as_json:
+                emit({"event": "probe", "server": result["name"], "ok": result["ok"],
+                      "latency": result["latency"], "error": result["error"] or None,
+                      "tools": result.get("tools")})
+            elif result["ok"]:
+                print(f"  {Colors.GREEN}✓{Colors.NC} {result['name']}: responded in "
+                      f"{result['latency']:.2f}s", flush=True)
+            else:
+                error = result["error"].splitlines()[-1] if result["error"] else "failed"
+                print(f"  {Colors.RED}✗{Colors.NC} {result['name']}: {error}", flush=True)
+        
+        def check(servers: Dict[str, Any], names: List[str]):
+            checked = _validate_servers({name: servers[name] for name in names},
+                                        ValidationContext(), rules, concurrency)
+            valid = []
+            for name, issues in checked.items():
+                errors = [issue for issue in issues if issue["severity"] == "error"]
+                if not errors:
+                    valid.append(name)
+                if as_json:
+                    emit({"event": "validate", "server": name, "valid": not errors, "issues": issues})
+                    continue
+                for issue in issues:
+                    color, mark = ((Colors.RED, "✗") if issue["severity"] == "error"
+                                   else (Colors.YELLOW, "⚠"))
+                    print(f"  {color}{mark}{Colors.NC} {name}: {issue['message']}")
+                if not issues and not test:
+                    print(f"  {Colors.GREEN}✓{Colors.NC} {name}: valid")
+            if test and valid:
+                _run_probes(servers, valid, concurrency, timeout, probe, on_result=show)
+        
+        servers = self.servers
+        hashes = {name: _entry_hash(server) for name, server in servers.items()}
+        if as_json:
+            emit({"event": "watching", "config": str(self.config_path), "mode": watcher.mode,
+                  "servers": len(servers)})
+        else:
+            print(f"{Colors.BLUE}Watching {self.config_path} ({watcher.mode}, {len(servers)} servers); "
+                  f"Ctrl-C to stop{Colors.NC}", flush=True)
+        try:
+            if initial and servers:
+                check(servers, list(servers))
+            while True:
+                watcher.wait()
+                self._config = self._servers = None
+                self.section_missing = False
+                servers, error = _quietly(lambda: dict(self.servers))
+                stamp = datetime.datetime.now().strftime("%H:%M:%S")
+                if error:
+                    if as_json:
+                        emit({"event": "error", "error": error})
+                    else:
+                        print(f"{Colors.YELLOW}[{stamp}] ⚠ {error}{Colors.NC}", flush=True)
+                    continue
+                
+                current = {name: _entry_hash(server) for name, server in servers.items()}
+                added = [name for name in current if name not in hashes]
+                modified = [name for name in current if name in hashes and current[name] != hashes[name]]
+                removed = [name for name in hashes if name not in current]
+                hashes = current
+                if as_json:
+                    emit({"event": "change", "added": added, "modified": modified, "removed": removed})
+                elif added or modified or removed:
+                    summary = [f"+{name}" for name in added] + [f"~{name}" for name in modified] \
+                        + [f"-{name}" for name in removed]
+                    print(f"\n{Colors.BLUE}[{stamp}] {' '.join(summary)}{Colors.NC}", flush=True)
+                else:
+                    print(f"{Colors.BLUE}[{stamp}]{Colors.NC} no server changes", flush=True)
+                if added or modified:
+                    check(servers, added + modified)
+        except KeyboardInterrupt:
+            return True
+    
+    def serve(self, socket_path: Path = DAEMON_SOCKET):
+        """Run the manager daemon"""
+        import socket
+        if not hasattr(socket, "AF_UNIX"):
+            print(f"{Colors.RED}serve needs Unix-domain socket support{Colors.NC}")
+            return False
+        daemon = ManagerDaemon(self, socket_path)
+        print(f"{Colors.GREEN}✓ Serving {self.config_path} on {socket_path} "
+              f"(pid {os.getpid()}){Colors.NC}", flush=True)
+        try:
+            daemon.serve()
+        except RuntimeError as e:
+            print(f"{Colors.RED}{e}{Colors.NC}")
+            return False
+        return True
+    
+    def export_config(self, output_file: str = None, full: bool = False):
+        """Export the servers (or with full, the whole configuration)"""
+        import datetime
+        if not output_file:
+            output_file = f"claude-config-export-{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        
+        # Create export without sensitive data; only mcpServers is copied
+        servers = _sanitize_servers(json.loads(json.dumps(self.servers)))
+        if full:
+            export_config = {**self.config, "mcpServers": servers}
+        else:
+            export_config = {"mcpServers": servers}
+        
+        with open(output_file, 'w') as f:
+            json.dump(export_config, f, indent=2)
+        
+        print(f"{Colors.GREEN}✓ Exported {len(servers)} servers to: {output_file}{Colors.NC}")
+        return True
+    
+    def import_config(self, input_file: str, merge: bool = True):
+        """Import configuration"""
+        if not os.path.exists(input_file):
+            print(f"{Colors.RED}File not found: {input_file}{Colors.NC}")
+            return False
+        
+        try:
+            with open(input_file, 'r') as f:
+                import_config = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"{Colors.RED}Invalid JSON in import file: {e}{Colors.NC}")
+            return False
+        
+        if merge:
+            # Merge with existing
+            if "mcpServers" in import_config:
+                for name, server in import_config["mcpServers"].items():
+                    if name in self.servers:
+                        print(f"{Colors.YELLOW}⚠ '{name}' already exists, skipping{Colors.NC}")
+                    else:
+                        self.servers[name] = server
+                        print(f"{Colors.GREEN}✓ Imported '{name}'{Colors.NC}")
+        elif set(import_config) == {"mcpServers"}:
+            # A servers-only export replaces just the servers
+            self.servers.clear()
+            self.servers.update(import_config["mcpServers"])
+            print(f"{Colors.GREEN}✓ Replaced servers{Colors.NC}")
+        else:
+            # Replace entire config
+            self.config = import_config
+            print(f"{Colors.GREEN}✓ Replaced configuration{Colors.NC}")
+        
+        self._save_config()
+        return True
+    
+    def _sync_view(self, servers: Dict[str, Any] = None,
+                   config_path: Path = None) -> tuple:
+        """mcpServers as sync compares them, and the names of rewritten entries
+        
+        Entries rewritten by pin/pool are compared as their originals, and
+        secret-looking env values are redacted to ${VAR}, so neither
+        machine-local commands nor tokens are ever put into a patch.
+        """
+        if servers is None:
+            servers, config_path = self.servers, self.config_path
+        view = json.loads(json.dumps(servers))
+        ledger = RewriteLedger()
+        protected = set()
+        for name in view:
+            layers = ledger.layers(config_path, name)
+            if layers:
+                view[name] = json.loads(json.dumps(layers[0]["original"]))
+                protected.add(name)
+        return _sanitize_servers(view, secrets_only=True), protected
+    
+    def _peer_view(self, other: str) -> Optional[Dict[str, Any]]:
+        path = Path(other).expanduser()
+        if not path.is_file():
+            print(f"{Colors.RED}Config not found: {other}{Colors.NC}")
+            return None
+        peer = MCPManager(config_path=path, parse_cache=False)
+        servers, error = _quietly(lambda: peer.servers)
+        if error:
+            print(f"{Colors.RED}Cannot read {other}: {error}{Colors.NC}")
+            return None
+        return self._sync_view(servers, path)[0]
+    
+    def sync_diff(self, other: str = None, since: str = None, output_file: str = None):
+        """Write the JSON Patch from this config (or a synced state) to another
+        
+        With ``other`` the patch turns this config's servers into the other
+        file's; with ``since`` it carries the changes made here since that
+        synced state, for shipping to machines that are still at it.
+        """
+        info = sys.stdout if output_file else sys.stderr
+        store = SyncStore()
+        if since:
+            try:
+                source = store.get(since)
+            except KeyError as e:
+                print(f"{Colors.RED}{e.args[0]}{Colors.NC}", file=info)
+                return False
+        else:
+            source = self._sync_view()[0]
+        target = self._peer_view(other) if other else self._sync_view()[0]
+        if target is None:
+            return False
+        
+        patch = _json_diff({"mcpServers": source}, {"mcpServers": target})
+        text = json.dumps(patch, indent=2)
+        if output_file:
+            with open(output_file, 'w') as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        changes = sum(op["op"] != "test" for op in patch)
+        digest = store.put(target)
+        print(f"{Colors.GREEN}✓ {changes} changes ({len(text.encode())} bytes)"
+              f"{' written to: ' + output_file if output_file else ''}{Colors.NC}", file=info)
+        print(f"State {digest}; use --since {digest} for the next incremental diff", file=info)
+        return True
+    
+    def _sync_patch(self, patch: List[Dict[str, Any]], strategy: Optional[str] = None,
+                    dry_run: bool = False) -> Optional[bool]:
+        """Apply a /mcpServers patch; returns None when nothing changed"""
+        view, protected = self._sync_view()
+        held = set()
+        if strategy == "ours":
+            trial = _apply_servers_patch(json.loads(json.dumps(self.servers)),
+                                         json.loads(json.dumps(view)), patch, None, protected)
+            held = {_patch_server(op) for op, _ in trial["conflicts"]} - {None}
+        servers = json.loads(json.dumps(self.servers))
+        result = _apply_servers_patch(servers, view, patch, strategy, protected, held)
+        if not any(result.values()):
+            print(f"{Colors.GREEN}✓ Already in sync{Colors.NC}")
+            return None
+        
+        symbols = {"add": (Colors.GREEN, "+"), "remove": (Colors.RED, "-"),
+                   "replace": (Colors.YELLOW, "~"), "move": (Colors.YELLOW, "→"),
+                   "copy": (Colors.GREEN, "→")}
+        print(f"\n{Colors.BLUE}Changes for {self.config_path or Path.home() / '.claude.json'}:"
+              f"{Colors.NC}\n")
+        for op in result["applied"]:
+            color, symbol = symbols[op["op"]]
+            print(f"  {color}{symbol} {op['path']}{Colors.NC}")
+        for op, reason in result["conflicts"]:
+            if strategy is None:
+                print(f"  {Colors.RED}! {op['path']}{Colors.NC}  ({reason})")
+            else:
+                print(f"  {Colors.YELLOW}= {op['path']}{Colors.NC}  (kept local value: {reason})")
+        for op, reason in result["skipped"]:
+            print(f"  {Colors.YELLOW}· {op['path']}{Colors.NC}  ({reason})")
+        print(f"\n  {len(result['applied'])} to apply, {len(result['conflicts'])} conflicts, "
+              f"{len(result['skipped'])} skipped")
+        
+        if result["conflicts"] and strategy is None:
+            print(f"\n{Colors.RED}✗ {len(result['conflicts'])} changes conflict with local edits; "
+                  f"nothing was changed (use --strategy ours|theirs|field){Colors.NC}")
+            return False
+        if not result["applied"]:
+            print(f"\n{Colors.GREEN}✓ Already in sync{Colors.NC}")
+            return None
+        if dry_run:
+            return True
+        
+        self.servers.clear()
+        self.servers.update(servers)
+        print()
+        self._save_config()
+        print(f"{Colors.GREEN}✓ Applied {len(result['applied'])} changes{Colors.NC}")
+        print("Restart Claude for changes to take effect")
+        return True
+    
+    def sync_apply(self, patch_file: str, strategy: str = None, dry_run: bool = False):
+        """Apply a JSON Patch of mcpServers made by 'sync diff'"""
+        try:
+            if patch_file == "-":
+                patch = json.load(sys.stdin)
+            else:
+                with open(patch_file, 'r') as f:
+                    patch = json.load(f)
+            _check_patch(patch)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.RED}Cannot read patch {patch_file}: {e}{Colors.NC}")
+            return False
+        
+        ok = self._sync_patch(patch, strategy, dry_run)
+        if ok and not dry_run:
+            digest = SyncStore().put(self._sync_view()[0])
+            print(f"State {digest}")
+        return ok is not False
+    
+    def sync_pull(self, other: str, strategy: str = None, dry_run: bool = False):
+        """Bring changes made in another config since the last sync into this one
+        
+        The other file's servers are diffed against the state recorded at
+        the last sync with it (three-way), so only its own changes are
+        applied and edits made here show up as conflicts. The first sync
+        adds missing servers and treats differing entries as conflicts.
+        """
+        theirs = self._peer_view(other)
+        if theirs is None:
+            return False
+        store = SyncStore()
+        peer = str(Path(other).expanduser().resolve())
+        digest = store.base(self.config_path, peer)
+        base = {}
+        if digest:
+            try:
+                base = store.get(digest)
+            except KeyError:
+                print(f"{Colors.YELLOW}⚠ State {digest} of the last sync is gone; "
+                      f"comparing in full{Colors.NC}")
+        else:
+            print(f"{Colors.BLUE}First sync with {other}{Colors.NC}")
+        
+        patch = _json_diff({"mcpServers": base}, {"mcpServers": theirs})
+        ok = self._sync_patch(patch, strategy, dry_run)
+        if ok is not False and not dry_run:
+            store.set_base(self.config_path, peer, store.put(theirs))
+        return ok is not False
+    
+    def fleet_list(self, fleet: Fleet, as_json: bool = False):
+        """Aggregated server inventory across many config files"""
+        report = fleet.inventory()
+        if as_json:
+            print(json.dumps(report, indent=2))
+            return not report["failed"]
+        
+        print(f"\n{Colors.BLUE}Server inventory across {report['files']} configs "
+              f"({report['elapsed']:.2f}s):{Colors.NC}\n")
+        if not report["servers"]:
+            print(f"{Colors.YELLOW}No MCP servers installed{Colors.NC}")
+        width = max([len(name) for name in report["servers"]] + [6])
+        for name, entry in report["servers"].items():
+            color = Colors.YELLOW if name in report["skew"] else Colors.CYAN
+            print(f"  {color}{name:<{width}}{Colors.NC}  {entry['files']:>6} files")
+            if name in report["skew"]:
+                for variant, count in entry["variants"].items():
+                    print(f"    {' ' * width}{count:>6} × {variant}")
+        
+        if report["skew"]:
+            print(f"\n{Colors.YELLOW}⚠ Version skew in {len(report['skew'])} servers: "
+                  f"{', '.join(report['skew'])}{Colors.NC}")
+        if report["missing_env"]:
+            print(f"\n{Colors.YELLOW}Missing environment variables:{Colors.NC}")
+            for item in report["missing_env"]:
+                print(f"  ⚠ {item['server']}: {item['var']} missing in {item['files']} files")
+        for path, error in report["failed"].items():
+            print(f"{Colors.RED}✗ {path}: {error}{Colors.NC}")
+        return not report["failed"]
+    
+    def fleet_validate(self, fleet: Fleet, as_json: bool = False, strict: bool = False,
+                       skip: List[str] = None) -> int:
+        """Validate many config files; returns the exit status"""
+        report = fleet.validate(skip)
+        status = 1 if report["errors"] else (2 if strict and report["warnings"] else 0)
+        if as_json:
+            print(json.dumps(dict(report, status=status), indent=2))
+            return status
+        
+        print(f"\n{Colors.BLUE}Validated {report['files']} configs "
+              f"({report['elapsed']:.2f}s){Colors.NC}\n")
+        for problem in report["problems"]:
+            color = Colors.RED if problem["severity"] == "error" else Colors.YELLOW
+            mark = "✗" if problem["severity"] == "error" else "⚠"
+            server = f"{problem['server']}: " if problem["server"] else ""
+            print(f"  {color}{mark} {server}{problem['message']}{Colors.NC}  "
+                  f"({problem['files']} files)")
+        if report["invalid"]:
+            print(f"\n{Colors.RED}✗ {len(report['invalid'])} of {report['files']} configs "
+                  f"have errors{Colors.NC}")
+            for path in report["invalid"][:20]:
+                print(f"  {path}")
+            if len(report["invalid"]) > 20:
+                print(f"  ... and {len(report['invalid']) - 20} more")
+        else:
+            print(f"\n{Colors.GREEN}✓ All {report['files']} configs are valid "
+                  f"({report['warnings']} warnings){Colors.NC}")
+        return status
+    
+    def fleet_export(self, fleet: Fleet, output_file: str = None):
+        """Export the sanitized mcpServers of many config files into one file"""
+        import datetime
+        if not output_file:
+            output_file = f"claude-fleet-export-{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        export = fleet.export()
+        with open(output_file, 'w') as f:
+            json.dump(export, f, indent=2)
+        print(f"{Colors.GREEN}✓ Exported {len(export['configs'])} configs to: {output_file}{Colors.NC}")
+        for path, error in export["failed"].items():
+            print(f"{Colors.RED}✗ {path}: {error}{Colors.NC}")
+        return not export["failed"]
+    
+    def fleet_apply(self, fleet: Fleet, manifest_file: str, prune: bool = False,
+                    dry_run: bool = False, verify: bool = True, force: bool = False,
+                    probe: str = "handshake",
+                    concurrency: int = DEFAULT_TEST_CONCURRENCY,
+                    timeout: float = DEFAULT_TEST_TIMEOUT):
+        """Apply a manifest to many config files
+        
+        The manifest's servers are verified once here, then every file is
+        updated by the process pool without further probes.
+        """
+        try:
+            desired = _load_manifest(manifest_file, self.registry)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.RED}Cannot read manifest {manifest_file}: {e}{Colors.NC}")
+            return False
+        
+        if verify and not dry_run and desired:
+            print(f"\n{Colors.BLUE}Verifying {len(desired)} manifest servers...{Colors.NC}\n")
+            results, _ = _run_probes(desired, list(desired), concurrency, timeout, probe)
+            failed = [r for r in results if not r["ok"]]
+            for result in results:
+                mark = f"{Colors.GREEN}✓{Colors.NC}" if result["ok"] else f"{Colors.RED}✗{Colors.NC}"
+                print(f"  {mark} {result['name']}" + ("" if result["ok"] else f": {result['error']}"))
+            if failed and not force:
+                print(f"\n{Colors.RED}✗ {len(failed)} servers failed verification; "
+                      f"nothing was changed (use --force to apply anyway){Colors.NC}")
+                return False
+        
+        start = time.monotonic()
+        results = fleet.apply(desired, prune, dry_run)
+        changed = [r for r in results if not r["error"] and r["add"] + r["change"] + r["remove"]]
+        failed = [r for r in results if r["error"]]
+        totals = {key: sum(r.get(key, 0) for r in results) for key in ("add", "change", "remove")}
+        verb = "Would change" if dry_run else "Changed"
+        print(f"\n{Colors.GREEN}✓ {verb} {len(changed)} of {len(results)} configs "
+              f"({totals['add']} added, {totals['change']} changed, {totals['remove']} removed "
+              f"servers, {time.monotonic() - start:.2f}s){Colors.NC}")
+        for result in failed:
+            print(f"{Colors.RED}✗ {result['path']}: {result['error']}{Colors.NC}")
+        return not failed
+    
+    def _print_registry_entry(self, info: Dict[str, Any]):
+        print(f"\n  {Colors.CYAN}{info['name']}{Colors.NC}")
+        print(f"    Package: {info['package']}")
+        print(f"    Description: {info['description']}")
+        
+        if info['env_vars']:
+            print(f"    Required vars: {', '.join(info['env_vars'])}")
+        
+        if 'setup_help' in info:
+            print(f"    Setup: {info['setup_help']}")
+    
+    def show_registry(self):
+        """Show available MCP servers in registry"""
+        print(f"\n{Colors.BLUE}Available MCP Servers:{Colors.NC}")
+        
+        for info in self.registry.entries():
+            self._print_registry_entry(info)
+    
+    def search_registry(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT):
+        """Search the registry"""
+        start = time.monotonic()
+        results = self.registry.search(query, limit)
+        elapsed = (time.monotonic() - start) * 1000
+        
+        if not results:
+            print(f"{Colors.YELLOW}No servers match '{query}'{Colors.NC}")
+            return False
+        
+        print(f"\n{Colors.BLUE}Servers matching '{query}' ({elapsed:.1f}ms):{Colors.NC}")
+        for score, info in results:
+            self._print_registry_entry(info)
+        return True
+
+def run_fleet(args: argparse.Namespace, paths: List[Path]) -> int:
+    """Run a command over many config files; returns the exit status"""
+    if args.command not in ('list', 'validate', 'export', 'apply'):
+        print(f"{Colors.RED}'{args.command}' works on one config; multiple configs support "
+              f"list, validate, export and apply{Colors.NC}")
+        return 1
+    if not paths:
+        print(f"{Colors.YELLOW}No config files matched{Colors.NC}")
+        return 1
+    
+    manager = MCPManager(args.registry)
+    fleet = Fleet(paths, manager.registry, args.jobs)
+    if args.command == 'list':
+        return 0 if manager.fleet_list(fleet, as_json=args.json) else 1
+    if args.command == 'validate':
+        return manager.fleet_validate(fleet, as_json=args.json, strict=args.strict, skip=args.skip)
+    if args.command == 'export':
+        return 0 if manager.fleet_export(fleet, args.output) else 1
+    ok = manager.fleet_apply(fleet, args.manifest,
+                             prune=args.prune,
+                             dry_run=args.dry_run,
+                             verify=not args.skip_verify,
+                             force=args.force,
+                             probe=args.probe,
+                             concurrency=args.concurrency,
+                             timeout=args.timeout)
+    return 0 if ok else 1
+
+def _add_global_arguments(parser: argparse.ArgumentParser):
+    """Options that go before the subcommand"""
+    parser.add_argument('--registry', action='append', metavar='PATH',
+                        help='Extra registry catalog file or directory (repeatable)')
+    parser.add_argument('--config', action='append', metavar='PATH',
+                        help='Config file to use instead of the default (repeatable)')
+    parser.add_argument('--config-glob', action='append', metavar='PATTERN',
+                        help='Run list/validate/export/apply over every matching config '
+                             '(e.g. "/homes/*/.claude.json", ** allowed)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Worker processes for multiple configs (default: CPU count)')
+    parser.add_argument('--json', action='store_true',
+                        help='Machine-readable output for list, test and validate')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Do not use a running serve daemon')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print the wall time of each phase of the run to stderr')
+    parser.add_argument('--profile-dump', metavar='FILE',
+                        help='Also save cProfile statistics of the command to FILE')
+
+def main(started: float = None):
+    try:
+        _main(started)
+    except TimeoutError as e:  # e.g. the config lock is held too long
+        print(f"{Colors.RED}Error: {e}{Colors.NC}")
+        sys.exit(1)
+
+def _main(started: float = None):
+    parsing_from = time.perf_counter()
+    parser = argparse.ArgumentParser(
+        description="MCP Manager - Advanced MCP Server Management for Claude",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s list                          # List installed servers
+  %(prog)s list -v                       # List with details and cached tools
+  %(prog)s tools github                  # Show tools (probes only if not cached)
+  %(prog)s add jina                      # Add Jina server from registry
+  %(prog)s add custom-server --package @org/package
+  %(prog)s remove jina                   # Remove server
+  %(prog)s test github                   # Test server connection
+  %(prog)s test --all -j 16              # Test every server in parallel
+  %(prog)s test github --resources --soak 5m  # Memory/fd growth over 5 minutes
+  %(prog)s test --all --max-age 5m       # Reuse health results from the last 5 minutes
+  %(prog)s metrics -o /var/lib/node_exporter/mcp.prom  # Health for Prometheus
+  %(prog)s bench --output base.json      # Benchmark startup latency
+  %(prog)s bench --compare base.json     # Flag regressions vs a baseline
+  %(prog)s pin github                    # Run github from a pinned local install
+  %(prog)s unpin github                  # Go back to npx
+  %(prog)s apply servers.yaml --prune    # Sync servers with a manifest
+  %(prog)s validate                      # Validate configuration
+  %(prog)s watch                         # Re-check servers as the config is edited
+  %(prog)s --json validate --strict      # CI gate: JSON report, fail on warnings
+  %(prog)s --config-glob '/home/*/.claude.json' list   # Inventory across many configs
+  %(prog)s sync pull other.json --strategy field   # Bring in another config's changes
+  %(prog)s trace on github               # Record github's calls; then 'trace report github'
+  %(prog)s lazy on playwright            # Start playwright only when it is first used
+  %(prog)s serve &                       # Keep a manager daemon running
+  %(prog)s pool enable github            # Share one warm github server
+  %(prog)s pool serve &                  # Run the warm server pool
+  %(prog)s --json list                   # Machine-readable output
+  %(prog)s --profile list                # Time each phase of a command
+  %(prog)s registry                      # Show available servers
+  %(prog)s registry search browser       # Search the registry
+  %(prog)s --registry catalog/ add acme  # Add from an extra catalog
+  %(prog)s backups list                  # Show configuration backups
+  %(prog)s backups restore 3f2a9c        # Restore a backup
+        """
+    )
+    _add_global_arguments(parser)
+    
+    subparsers = parser.add_subparsers(dest='command', help='Commands')
+    
+    # List command
+    list_parser = subparsers.add_parser('list', help='List installed MCP servers')
+    list_parser.add_argument('-v', '--verbose', action='store_true', 
+                            help='Show detailed information')
+    
+    # Tools command
+    tools_parser = subparsers.add_parser('tools', help='Show the tools servers provide')
+    tools_parser.add_argument('names', nargs='*', metavar='name',
+                              help='Servers to show (default: all)')
+    tools_parser.add_argument('--refresh', action='store_true',
+                              help='Probe every server even if its catalog entry is fresh')
+    tools_parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_TEST_CONCURRENCY,
+                              help=f'Servers to probe at once (default: {DEFAULT_TEST_CONCURRENCY})')
+    tools_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                              help=f'Seconds per probe (default: {DEFAULT_TEST_TIMEOUT})')
+    
+    # Add command
+    add_parser = subparsers.add_parser('add', help='Add one or more MCP servers')
+    add_parser.add_argument('names', nargs='+', metavar='name', help='Server name(s)')
+    add_parser.add_argument('--package', help='NPM package name (single server)')
+    add_parser.add_argument('--command', dest='server_command',
+                           help='Command to run (single server, default: npx)')
+    add_parser.add_argument('--args', nargs='*', help='Command arguments (single server)')
+    add_parser.add_argument('--env', nargs='*', help='Environment variables (KEY=VALUE)')
+    add_parser.add_argument('--force', action='store_true', help='Overwrite existing')
+    add_parser.add_argument('--set', action='append', metavar='NAME.KEY=VALUE',
+                           help='Answer a registry prompt, e.g. filesystem.path=~/src '
+                                '(KEY=VALUE answers it for every server)')
+    add_parser.add_argument('--answers', metavar='FILE',
+                           help='JSON/YAML file of prompt answers: {name: {key: value}}')
+    add_parser.add_argument('-y', '--yes', action='store_true',
+                           help='Never prompt: use defaults and add unverified servers')
+    add_parser.add_argument('--probe', choices=sorted(PROBES), default='handshake',
+                           help='How to verify servers (default: handshake)')
+    add_parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_TEST_CONCURRENCY,
+                           help=f'Servers to set up in parallel (default: {DEFAULT_TEST_CONCURRENCY})')
+    add_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                           help=f'Per-server verification timeout (default: {DEFAULT_TEST_TIMEOUT})')
+    add_parser.add_argument('--post-install-timeout', type=float,
+                           default=DEFAULT_POST_INSTALL_TIMEOUT, metavar='SECONDS',
+                           help='Stop a registry post-install step after this long '
+                                f'(default: {DEFAULT_POST_INSTALL_TIMEOUT})')
+    add_parser.add_argument('--limit', action='append', default=[], metavar='KEY=VALUE',
+                           help='Cap resources while verifying: as=SIZE, cpu=SECONDS, nofile=N')
+    
+    # Remove command
+    remove_parser = subparsers.add_parser('remove', help='Remove an MCP server')
+    remove_parser.add_argument('name', help='Server name to remove')
+    
+    # Update command
+    update_parser = subparsers.add_parser('update', help='Update server configuration')
+    update_parser.add_argument('name', help='Server name')
+    update_parser.add_argument('--command', dest='server_command', help='New command')
+    update_parser.add_argument('--args', nargs='*', help='New arguments')
+    update_parser.add_argument('--env', nargs='*', help='Environment variables (KEY=VALUE)')
+    
+    # Test command
+    test_parser = subparsers.add_parser('test', help='Test MCP servers')
+    test_parser.add_argument('names', nargs='*', metavar='name',
+                            help='Server name(s) to test')
+    test_parser.add_argument('--all', action='store_true',
+                            help='Test all configured servers')
+    test_parser.add_argument('-j', '--concurrency', type=int,
+                            default=DEFAULT_TEST_CONCURRENCY,
+                            help=f'Servers to test in parallel (default: {DEFAULT_TEST_CONCURRENCY})')
+    test_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                            help=f'Per-server timeout in seconds (default: {DEFAULT_TEST_TIMEOUT})')
+    test_parser.add_argument('--resources', action='store_true',
+                             help='Sample memory, CPU, threads and fds of the server process tree')
+    test_parser.add_argument('--soak', type=_parse_duration, default=0, metavar='DURATION',
+                             help='Keep calling tools/list for DURATION (e.g. 5m) and report growth')
+    test_parser.add_argument('--probe', choices=sorted(PROBES), default='handshake',
+                            help='handshake: MCP initialize + tools/list (default); '
+                                 'version: run the command with --version')
+    test_parser.add_argument('--limit', action='append', default=[], metavar='KEY=VALUE',
+                            help='Cap server resources: as=SIZE (address space), cpu=SECONDS, '
+                                 f'nofile=N (repeatable; defaults from ${PROBE_LIMITS_ENV})')
+    test_parser.add_argument('--max-age', type=_parse_duration, metavar='DURATION',
+                            help='Reuse health results younger than DURATION (e.g. 5m) '
+                                 'instead of starting the server')
+    
+    # Metrics command
+    metrics_parser = subparsers.add_parser('metrics',
+                                           help='Export server health for monitoring')
+    metrics_parser.add_argument('--max-age', type=_parse_duration, default=HEALTH_TTL,
+                                metavar='DURATION',
+                                help=f'Probe servers whose last result is older than this '
+                                     f'(default: {HEALTH_TTL:g}s)')
+    metrics_parser.add_argument('--cached', action='store_true',
+                                help='Never start servers; report only cached results')
+    metrics_parser.add_argument('-o', '--output',
+                                help='Write to a file (e.g. for the node_exporter textfile collector)')
+    metrics_parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_TEST_CONCURRENCY,
+                                help=f'Servers to probe in parallel (default: {DEFAULT_TEST_CONCURRENCY})')
+    metrics_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                                help=f'Per-server timeout in seconds (default: {DEFAULT_TEST_TIMEOUT})')
+    
+    # Bench command
+    bench_parser = subparsers.add_parser('bench', help='Benchmark server startup latency')
+    bench_parser.add_argument('names', nargs='*', metavar='name',
+                             help='Server name(s) to benchmark (default: all)')
+    bench_parser.add_argument('-n', '--runs', type=int, default=DEFAULT_BENCH_RUNS,
+                             help=f'Warm runs per server (default: {DEFAULT_BENCH_RUNS})')
+    bench_parser.add_argument('--cold-runs', type=int, default=DEFAULT_BENCH_COLD_RUNS,
+                             help=f'Cold runs per server (default: {DEFAULT_BENCH_COLD_RUNS})')
+    bench_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                             help=f'Per-run timeout in seconds (default: {DEFAULT_TEST_TIMEOUT})')
+    bench_parser.add_argument('--output', help='Write results to a .json or .csv file')
+    bench_parser.add_argument('--resources', action='store_true',
+                              help='Also record peak memory, CPU, threads and fds per mode')
+    bench_parser.add_argument('--compare', metavar='BASELINE',
+                             help='Flag regressions against a previous JSON result')
+    bench_parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                             help=f'Regression threshold in percent (default: {DEFAULT_REGRESSION_THRESHOLD:g})')
+    
+    # Replay command
+    replay_parser = subparsers.add_parser('replay', help='Load-test a server with a request script')
+    replay_parser.add_argument('name', help='Server name')
+    replay_parser.add_argument('script', help='Requests as a JSON array or NDJSON (e.g. a trace capture)')
+    replay_load = replay_parser.add_mutually_exclusive_group()
+    replay_load.add_argument('--rate', type=float, metavar='RPS',
+                             help='Send at a fixed rate (open loop)')
+    replay_load.add_argument('-c', '--concurrency', type=int, default=DEFAULT_REPLAY_CONCURRENCY,
+                             help=f'Requests in flight (default: {DEFAULT_REPLAY_CONCURRENCY})')
+    replay_parser.add_argument('-n', '--iterations', type=int, default=1,
+                               help='Times to run the script (default: 1)')
+    replay_parser.add_argument('--duration', type=_parse_duration, metavar='DURATION',
+                               help='Repeat the script for this long instead (e.g. 30s)')
+    replay_parser.add_argument('--warmup', type=int, default=0,
+                               help='Untimed requests before measuring (default: 0)')
+    replay_parser.add_argument('--variant', action='append', metavar='LABEL=COMMAND',
+                               help='Also run with another command line, e.g. '
+                                    'next="npx -y @scope/server@2.0.0" (repeatable)')
+    replay_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                               help=f'Handshake and response timeout (default: {DEFAULT_TEST_TIMEOUT})')
+    replay_parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                               help=f'Regression threshold in percent (default: {DEFAULT_REGRESSION_THRESHOLD:g})')
+    
+    # Prefetch / pin / unpin commands
+    prefetch_parser = subparsers.add_parser('prefetch',
+                                            help='Install server packages into the local store')
+    prefetch_parser.add_argument('names', nargs='*', metavar='name',
+                                help='Server name(s) (default: all npx servers)')
+    prefetch_parser.add_argument('--version', dest='package_version',
+                                help='Install this package version instead of the configured one')
+    prefetch_parser.add_argument('-j', '--concurrency', type=int, default=4,
+                                help='Packages to install in parallel (default: 4)')
+    
+    pin_parser = subparsers.add_parser('pin',
+                                       help='Run servers from pinned local installs instead of npx')
+    pin_parser.add_argument('names', nargs='*', metavar='name',
+                           help='Server name(s) (default: all npx servers)')
+    pin_parser.add_argument('--version', dest='package_version',
+                           help='Pin this package version instead of the configured one')
+    pin_parser.add_argument('-j', '--concurrency', type=int, default=4,
+                           help='Packages to install in parallel (default: 4)')
+    
+    unpin_parser = subparsers.add_parser('unpin', help='Restore the original npx entries')
+    unpin_parser.add_argument('names', nargs='*', metavar='name',
+                             help='Server name(s) (default: all pinned servers)')
+    
+    # Apply command
+    apply_parser = subparsers.add_parser('apply',
+                                         help='Make mcpServers match a JSON/YAML manifest')
+    apply_parser.add_argument('manifest', help='Manifest file (.json, .yaml or .yml)')
+    apply_parser.add_argument('--prune', action='store_true',
+                             help='Remove servers that are not in the manifest')
+    apply_parser.add_argument('--dry-run', action='store_true',
+                             help='Only print the plan')
+    apply_parser.add_argument('--skip-verify', action='store_true',
+                             help='Do not test added or changed servers')
+    apply_parser.add_argument('--force', action='store_true',
+                             help='Apply even if some servers fail verification')
+    apply_parser.add_argument('--probe', choices=sorted(PROBES), default='handshake',
+                             help='How to verify servers (default: handshake)')
+    apply_parser.add_argument('-j', '--concurrency', type=int,
+                             default=DEFAULT_TEST_CONCURRENCY,
+                             help=f'Servers to verify in parallel (default: {DEFAULT_TEST_CONCURRENCY})')
+    apply_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                             help=f'Per-server verification timeout (default: {DEFAULT_TEST_TIMEOUT})')
+    
+    # Validate command
+    validate_parser = subparsers.add_parser('validate', help='Validate configuration offline')
+    validate_parser.add_argument('--strict', action='store_true',
+                                 help='Exit with status 2 when there are warnings')
+    validate_parser.add_argument('--skip', action='append', choices=sorted(VALIDATION_RULES),
+                                 metavar='RULE', help=f'Skip a rule ({", ".join(VALIDATION_RULES)})')
+    validate_parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_TEST_CONCURRENCY,
+                                 help=f'Servers to check at once (default: {DEFAULT_TEST_CONCURRENCY})')
+    
+    # Watch command
+    watch_parser = subparsers.add_parser('watch',
+                                         help='Re-check changed servers whenever the config changes')
+    watch_parser.add_argument('--no-test', action='store_true',
+                              help='Only validate changed servers, do not start them')
+    watch_parser.add_argument('--initial', action='store_true',
+                              help='Check every server once at startup')
+    watch_parser.add_argument('--skip', action='append', choices=sorted(VALIDATION_RULES),
+                              metavar='RULE', help='Skip a validation rule')
+    watch_parser.add_argument('--probe', choices=sorted(PROBES), default='handshake',
+                              help='How to test servers (default: handshake)')
+    watch_parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_TEST_CONCURRENCY,
+                              help=f'Servers to check at once (default: {DEFAULT_TEST_CONCURRENCY})')
+    watch_parser.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                              help=f'Seconds per probe (default: {DEFAULT_TEST_TIMEOUT})')
+    watch_parser.add_argument('--poll', action='store_true',
+                              help='Poll the file instead of using inotify')
+    
+    # Export command
+    export_parser = subparsers.add_parser('export', help='Export configuration')
+    export_parser.add_argument('--output', help='Output file')
+    export_parser.add_argument('--full', action='store_true',
+                              help='Export the whole configuration, not just mcpServers')
+    
+    # Import command
+    import_parser = subparsers.add_parser('import', help='Import configuration')
+    import_parser.add_argument('file', help='Import file')
+    import_parser.add_argument('--replace', action='store_true', 
+                              help='Replace instead of merge')
+    
+    # Sync commands
+    sync_parser = subparsers.add_parser('sync', help='Keep servers aligned with JSON Patch diffs')
+    sync_sub = sync_parser.add_subparsers(dest='sync_command')
+    sync_diff = sync_sub.add_parser('diff', help='Print the patch from this config to another')
+    sync_diff.add_argument('other', nargs='?', help='Config to diff against (default: this one)')
+    sync_diff.add_argument('--since', metavar='STATE',
+                           help='Diff from a synced state hash instead of this config')
+    sync_diff.add_argument('-o', '--output', help='Write the patch to a file')
+    for sync_cmd, sync_help in (('apply', 'Apply a patch to this config'),
+                                ('pull', "Bring in another config's changes since the last sync")):
+        sync_cmd_parser = sync_sub.add_parser(sync_cmd, help=sync_help)
+        sync_cmd_parser.add_argument('source', help="Patch file ('-' for stdin)" if sync_cmd == 'apply'
+                                     else 'Other config file')
+        sync_cmd_parser.add_argument('--strategy', choices=SYNC_STRATEGIES,
+                                     help='Resolve conflicts: keep our entry, take theirs, '
+                                          'or take theirs only for non-conflicting fields '
+                                          '(default: stop on conflicts)')
+        sync_cmd_parser.add_argument('--dry-run', action='store_true',
+                                     help='Show the changes without saving')
+    
+    # Serve command
+    serve_parser = subparsers.add_parser('serve',
+                                         help='Keep a manager resident behind a local socket')
+    serve_parser.add_argument('--socket', default=str(DAEMON_SOCKET),
+                             help=f'Socket path (default: {DAEMON_SOCKET})')
+    
+    # Pool commands
+    pool_parser = subparsers.add_parser('pool', help='Share warm server processes between sessions')
+    pool_sub = pool_parser.add_subparsers(dest='pool_command')
+    pool_serve = pool_sub.add_parser('serve', help='Run the pool')
+    pool_serve.add_argument('--max-size', type=int, default=DEFAULT_POOL_MAX_SIZE,
+                            help=f'Most server processes kept (default: {DEFAULT_POOL_MAX_SIZE})')
+    pool_serve.add_argument('--idle-timeout', type=float, default=DEFAULT_POOL_IDLE_TIMEOUT,
+                            help=f'Stop servers unused for this many seconds '
+                                 f'(default: {DEFAULT_POOL_IDLE_TIMEOUT})')
+    pool_serve.add_argument('--warm', action='store_true',
+                            help='Start all pooled servers right away')
+    pool_enable = pool_sub.add_parser('enable', help='Route servers through the pool')
+    pool_enable.add_argument('names', nargs='*', help='Servers to pool (default: all)')
+    pool_disable = pool_sub.add_parser('disable', help='Restore original server entries')
+    pool_disable.add_argument('names', nargs='*', help='Servers to restore (default: all pooled)')
+    pool_sub.add_parser('status', help='Show warm servers')
+    pool_sub.add_parser('stop', help='Stop the pool and its servers')
+    for sub in (pool_serve, pool_sub.choices['status'], pool_sub.choices['stop']):
+        sub.add_argument('--socket', default=str(POOL_SOCKET),
+                         help=f'Socket path (default: {POOL_SOCKET})')
+    
+    attach_parser = subparsers.add_parser('attach',
+                                          help='Stdio client for a pooled server (used in config)')
+    attach_parser.add_argument('name', help='Pooled server name')
+    attach_parser.add_argument('--source', required=True, help='Config file the entry belongs to')
+    attach_parser.add_argument('--socket', default=str(POOL_SOCKET), help=argparse.SUPPRESS)
+    
+    # Trace commands
+    trace_parser = subparsers.add_parser('trace', help='Record JSON-RPC traffic of servers')
+    trace_sub = trace_parser.add_subparsers(dest='trace_command')
+    trace_on = trace_sub.add_parser('on', help='Run servers through the tracing relay')
+    trace_on.add_argument('names', nargs='*', metavar='name', help='Servers (default: all)')
+    trace_on.add_argument('--capacity', type=int, default=DEFAULT_TRACE_CAPACITY,
+                          help=f'Calls kept per server (default: {DEFAULT_TRACE_CAPACITY})')
+    trace_on.add_argument('--capture', action='store_true',
+                          help='Also save requests as NDJSON for "replay"')
+    trace_off = trace_sub.add_parser('off', help='Restore the original entries')
+    trace_off.add_argument('names', nargs='*', metavar='name', help='Servers (default: all traced)')
+    trace_report = trace_sub.add_parser('report', help='Latency, counts and sizes per method and tool')
+    trace_report.add_argument('name', help='Server name')
+    trace_report.add_argument('--since', type=_parse_duration, metavar='DURATION',
+                              help='Only calls in the last DURATION (e.g. 30m, 2h)')
+    trace_relay = trace_sub.add_parser('relay', help='Tracing relay (used in config)')
+    trace_relay.add_argument('name', help='Traced server name')
+    trace_relay.add_argument('--source', required=True, help='Config file the entry belongs to')
+    
+    # Lazy commands
+    lazy_parser = subparsers.add_parser('lazy', help='Start servers only when Claude first uses them')
+    lazy_sub = lazy_parser.add_subparsers(dest='lazy_command')
+    lazy_on = lazy_sub.add_parser('on', help='Put servers behind the lazy-start shim')
+    lazy_on.add_argument('names', nargs='*', metavar='name', help='Servers (default: all)')
+    lazy_on.add_argument('--idle-timeout', type=_parse_duration, default=DEFAULT_LAZY_IDLE_TIMEOUT,
+                         metavar='DURATION',
+                         help=f'Stop a started server after this long unused, 0 to keep it '
+                              f'(default: {DEFAULT_LAZY_IDLE_TIMEOUT}s)')
+    lazy_on.add_argument('--timeout', type=float, default=DEFAULT_TEST_TIMEOUT,
+                         help=f'Seconds per snapshot request (default: {DEFAULT_TEST_TIMEOUT})')
+    lazy_off = lazy_sub.add_parser('off', help='Restore the original entries')
+    lazy_off.add_argument('names', nargs='*', metavar='name', help='Servers (default: all lazy)')
+    lazy_shim = lazy_sub.add_parser('shim', help='Lazy-start shim (used in config)')
+    lazy_shim.add_argument('name', help='Lazy server name')
+    lazy_shim.add_argument('--source', required=True, help='Config file the entry belongs to')
+    
+    # Registry command
+    registry_parser = subparsers.add_parser('registry', help='Show or search available MCP servers')
+    registry_sub = registry_parser.add_subparsers(dest='registry_command')
+    registry_search = registry_sub.add_parser('search', help='Search the registry')
+    registry_search.add_argument('terms', nargs='+', help='Search terms')
+    registry_search.add_argument('--limit', type=int, default=DEFAULT_SEARCH_LIMIT,
+                                help=f'Maximum results (default: {DEFAULT_SEARCH_LIMIT})')
+    
+    # Backups command
+    backups_parser = subparsers.add_parser('backups', help='List, restore or prune backups')
+    backups_sub = backups_parser.add_subparsers(dest='backups_command')
+    backups_list = backups_sub.add_parser('list', help='List backups')
+    backups_list.add_argument('--all', action='store_true',
+                             help='Include backups of other config files')
+    backups_restore = backups_sub.add_parser('restore', help='Restore a backup')
+    backups_restore.add_argument('id', help='Backup id (or unique prefix)')
+    backups_restore.add_argument('--output', help='Write the backup to this file instead')
+    backups_prune = backups_sub.add_parser('prune', help='Apply the retention policy')
+    backups_prune.add_argument('--keep-last', type=int, default=BACKUP_KEEP_LAST,
+                              help=f'Newest backups to keep (default: {BACKUP_KEEP_LAST})')
+    backups_prune.add_argument('--keep-daily', type=int, default=BACKUP_KEEP_DAILY,
+                              help=f'Days to keep one backup for (default: {BACKUP_KEEP_DAILY})')
+    
+    args = parser.parse_args()
+    if args.profile or args.profile_dump:
+        _start_profiling(started, parsing_from, args.profile_dump)
+    
+    if args.command == 'attach':
+        sys.exit(_attach(args.name, args.source, Path(args.socket)))
+    if args.command == 'trace' and args.trace_command == 'relay':
+        sys.exit(_trace_relay(args.name, args.source))
+    if args.command == 'lazy' and args.lazy_command == 'shim':
+        sys.exit(_lazy_shim(args.name, args.source))
+    
+    # Initialize manager
+    config_paths = _expand_config_paths(args.config, args.config_glob)
+    if args.config_glob or len(config_paths) > 1:
+        sys.exit(run_fleet(args, config_paths))
+    manager = MCPManager(args.registry, config_paths[0] if config_paths else None)
+    
+    if not manager.config_path and args.command not in ('add', 'apply', 'registry', 'serve'):
+        print(f"{Colors.YELLOW}No Claude configuration found.{Colors.NC}")
+        print(f"Run '{sys.argv[0]} add <server>' to create one.")
+        sys.exit(1)
+    
+    if (args.command in ('list', 'test', 'validate', 'metrics') and not args.no_daemon
+            and not os.environ.get("MCP_MANAGER_NO_DAEMON") and DAEMON_SOCKET.exists()):
+        manager.daemon = DaemonClient(manager.config_path)
+    
+    # Execute command
+    if args.command == 'list':
+        manager.list_servers(verbose=args.verbose, as_json=args.json)
+    
+    elif args.command == 'add':
+        env_dict = {}
+        if args.env:
+            for env_pair in args.env:
+                if '=' in env_pair:
+                    key, value = env_pair.split('=', 1)
+                    env_dict[key] = value
+        if len(args.names) > 1 and (args.package or args.server_command or args.args is not None):
+            add_parser.error('--package, --command and --args need a single server name')
+        try:
+            answers = _parse_answers(args.set, args.answers)
+            limits = _parse_limits([os.environ.get(PROBE_LIMITS_ENV, "")] + args.limit)
+        except (OSError, ValueError) as e:
+            add_parser.error(str(e))
+        
+        ok = manager.add_servers(
+            args.names,
+            package=args.package,
+            command=args.server_command,
+            args=args.args,
+            env=env_dict if env_dict else None,
+            force=args.force,
+            answers=answers,
+            yes=args.yes,
+            probe=args.probe,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            limits=limits or None,
+            post_install_timeout=args.post_install_timeout
+        )
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'remove':
+        manager.remove_server(args.name)
+    
+    elif args.command == 'update':
+        kwargs = {}
+        if args.server_command:
+            kwargs['command'] = args.server_command
+        if args.args:
+            kwargs['args'] = args.args
+        if args.env:
+            env_dict = {}
+            for env_pair in args.env:
+                if '=' in env_pair:
+                    key, value = env_pair.split('=', 1)
+                    env_dict[key] = value
+            kwargs['env'] = env_dict
+        
+        manager.update_server(args.name, **kwargs)
+    
+    elif args.command == 'test':
+        if (args.resources or args.soak) and args.probe != 'handshake':
+            test_parser.error('--resources and --soak need the handshake probe')
+        if (args.resources or args.soak) and not ResourceSampler.available:
+            print(f"{Colors.YELLOW}⚠ Resource sampling needs /proc; "
+                  f"reporting timings only{Colors.NC}")
+        options = {}
+        try:
+            limits = _parse_limits([os.environ.get(PROBE_LIMITS_ENV, "")] + args.limit)
+        except ValueError as e:
+            test_parser.error(str(e))
+        if limits:
+            options["limits"] = limits
+        if args.max_age is not None:
+            if args.resources or args.soak:
+                test_parser.error('--max-age cannot be combined with --resources or --soak')
+            options["max_age"] = args.max_age
+        if args.resources:
+            options["resources"] = True
+        if args.soak:
+            options["soak"] = args.soak
+        if args.all or len(args.names) > 1:
+            ok = manager.test_servers(None if args.all else args.names,
+                                      concurrency=args.concurrency,
+                                      timeout=args.timeout,
+                                      probe=args.probe,
+                                      as_json=args.json, **options)
+        elif args.names:
+            ok = manager.test_server(args.names[0], timeout=args.timeout,
+                                     probe=args.probe, as_json=args.json, **options)
+        else:
+            test_parser.error('specify server name(s) or --all')
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'metrics':
+        manager.metrics(max_age=args.max_age, cached_only=args.cached,
+                        concurrency=args.concurrency, timeout=args.timeout,
+                        output_file=args.output, as_json=args.json)
+    
+    elif args.command == 'bench':
+        ok = manager.bench_servers(args.names,
+                                   runs=args.runs,
+                                   cold_runs=args.cold_runs,
+                                   timeout=args.timeout,
+                                   output_file=args.output,
+                                   compare_file=args.compare,
+                                   threshold=args.threshold,
+                                   resources=args.resources)
+        sys.exit(0 if ok else 1)
+    
+    elif args.command in ('prefetch', 'pin'):
+        ok = manager.prefetch_servers(args.names,
+                                      pin=args.command == 'pin',
+                                      version=args.package_version,
+                                      concurrency=args.concurrency)
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'unpin':
+        sys.exit(0 if manager.unpin_servers(args.names) else 1)
+    
+    elif args.command == 'apply':
+        ok = manager.apply_manifest(args.manifest,
+                                    prune=args.prune,
+                                    dry_run=args.dry_run,
+                                    verify=not args.skip_verify,
+                                    force=args.force,
+                                    probe=args.probe,
+                                    concurrency=args.concurrency,
+                                    timeout=args.timeout)
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'tools':
+        ok = manager.show_tools(args.names, refresh=args.refresh,
+                                concurrency=args.concurrency,
+                                timeout=args.timeout, as_json=args.json)
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'validate':
+        sys.exit(manager.validate_config(as_json=args.json, strict=args.strict,
+                                         skip=args.skip, concurrency=args.concurrency))
+    
+    elif args.command == 'serve':
+        sys.exit(0 if manager.serve(Path(args.socket)) else 1)
+    
+    elif args.command == 'pool':
+        if args.pool_command == 'serve':
+            ok = manager.serve_pool(Path(args.socket), args.max_size,
+                                    args.idle_timeout, args.warm)
+        elif args.pool_command == 'enable':
+            ok = manager.pool_servers(args.names)
+        elif args.pool_command == 'disable':
+            ok = manager.unpool_servers(args.names)
+        elif args.pool_command == 'status':
+            ok = manager.pool_status(Path(args.socket), args.json)
+        elif args.pool_command == 'stop':
+            try:
+                _pool_call({"op": "shutdown"}, Path(args.socket))
+                print(f"{Colors.GREEN}✓ Pool stopped{Colors.NC}")
+                ok = True
+            except OSError:
+                print(f"{Colors.YELLOW}Pool is not running{Colors.NC}")
+                ok = False
+        else:
+            pool_parser.print_help()
+            ok = False
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'replay':
+        sys.exit(0 if manager.replay(args.name, args.script, args.variant, args.rate,
+                                     args.concurrency, args.iterations, args.duration,
+                                     args.warmup, args.timeout, args.threshold,
+                                     args.json) else 1)
+    
+    elif args.command == 'trace':
+        if args.trace_command == 'on':
+            ok = manager.trace_servers(args.names, args.capacity, args.capture)
+        elif args.trace_command == 'off':
+            ok = manager.untrace_servers(args.names)
+        elif args.trace_command == 'report':
+            ok = manager.trace_report(args.name, args.since, args.json)
+        else:
+            trace_parser.print_help()
+            ok = False
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'lazy':
+        if args.lazy_command == 'on':
+            ok = manager.lazy_servers(args.names, args.idle_timeout, args.timeout)
+        elif args.lazy_command == 'off':
+            ok = manager.unlazy_servers(args.names)
+        else:
+            lazy_parser.print_help()
+            ok = False
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'watch':
+        sys.exit(0 if manager.watch(test=not args.no_test, initial=args.initial, skip=args.skip,
+                                    probe=args.probe, concurrency=args.concurrency,
+                                    timeout=args.timeout, poll=args.poll,
+                                    as_json=args.json) else 1)
+    
+    elif args.command == 'export':
+        manager.export_config(args.output, full=args.full)
+    
+    elif args.command == 'sync':
+        if args.sync_command == 'diff':
+            ok = manager.sync_diff(args.other, args.since, args.output)
+        elif args.sync_command == 'apply':
+            ok = manager.sync_apply(args.source, args.strategy, args.dry_run)
+        elif args.sync_command == 'pull':
+            ok = manager.sync_pull(args.source, args.strategy, args.dry_run)
+        else:
+            sync_parser.print_help()
+            ok = False
+        sys.exit(0 if ok else 1)
+    
+    elif args.command == 'import':
+        manager.import_config(args.file, merge=not args.replace)
+    
+    elif args.command == 'registry':
+        if args.registry_command == 'search':
+            sys.exit(0 if manager.search_registry(' '.join(args.terms), args.limit) else 1)
+        manager.show_registry()
+    
+    elif args.command == 'backups':
+        if args.backups_command == 'restore':
+            sys.exit(0 if manager.restore_backup(args.id, args.output) else 1)
+        elif args.backups_command == 'prune':
+            manager.prune_backups(args.keep_last, args.keep_daily)
+        else:
+            manager.list_backups(all_configs=getattr(args, 'all', False))
+    
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
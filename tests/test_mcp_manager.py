@@ -0,0 +1,540 @@
+"""
+Tests for scripts/mcp-manager.py
+
+Run with: python3 -m unittest discover tests (or pytest). Servers are
+played by scripts/mcp-stub-server.py, so no network access is needed.
+"""
+
+import contextlib
+import io
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+MANAGER = SCRIPTS / "mcp-manager.py"
+STUB = SCRIPTS / "mcp-stub-server.py"
+
+# Tests that run the manager in-process must not touch the real state directory
+_HOME = tempfile.TemporaryDirectory(prefix="mcp-manager-home-")
+os.environ["MCP_MANAGER_HOME"] = _HOME.name
+sys.path.insert(0, str(SCRIPTS))
+import mcp_manager
+
+class ManagerTestCase(unittest.TestCase):
+    """Runs mcp-manager against a scratch config and MCP_MANAGER_HOME"""
+    
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory(prefix="mcp-manager-test-")
+        self.addCleanup(scratch.cleanup)
+        self.scratch = Path(scratch.name)
+        self.config = self.scratch / "claude.json"
+        self.env = dict(os.environ, MCP_MANAGER_HOME=str(self.scratch / "home"),
+                        MCP_MANAGER_NO_DAEMON="1", MCP_REGISTRY_PATH="")
+    
+    def manager(self, *args, env=None):
+        return subprocess.run([sys.executable, str(MANAGER), "--config", str(self.config), *args],
+                              env=env or self.env, stdin=subprocess.DEVNULL,
+                              capture_output=True, text=True, timeout=60)
+
+class ConfigFileTest(ManagerTestCase):
+    
+    def test_missing_config_is_empty(self):
+        result = self.manager("list")
+        self.assertNotIn("Error", result.stdout)
+        self.assertIn("No MCP servers installed", result.stdout)
+    
+    def test_add_creates_missing_config(self):
+        result = self.manager("add", "s", "--command", sys.executable, "--args", str(STUB), "-y")
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertEqual(list(json.loads(self.config.read_text())["mcpServers"]), ["s"])
+
+class LocateKeyTest(ManagerTestCase):
+    
+    TEXT = ('{\n  "projects": {"/w": {"mcpServers": {"p": {}}}},\n'
+            '  "mcpServers": {\n    "a": {\n      "command": "a"\n    }\n  },\n'
+            '  "tips":   [1,2, 3],\n  "name": "caf\\u00e9"\n}\n')
+    
+    def test_finds_top_level_key(self):
+        found = mcp_manager._locate_key(self.TEXT, "mcpServers")
+        self.assertEqual(found["value"], {"a": {"command": "a"}})
+        self.assertEqual(found["indent"], "  ")
+        self.assertEqual(json.loads(self.TEXT[found["start"]:found["end"]]), found["value"])
+    
+    def test_ambiguous_text_is_not_located(self):
+        self.assertIsNone(mcp_manager._locate_key('{"mcpServers": {}}', "mcpServers"))
+        duplicated = '{\n  "mcpServers": {},\n  "mcpServers": {}\n}'
+        self.assertIsNone(mcp_manager._locate_key(duplicated, "mcpServers"))
+    
+    def test_save_keeps_the_rest_of_the_file(self):
+        self.config.write_text(self.TEXT)
+        result = self.manager("add", "b", "--command", sys.executable, "--args", str(STUB), "-y")
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        text = self.config.read_text()
+        found = mcp_manager._locate_key(text, "mcpServers")
+        self.assertEqual(sorted(found["value"]), ["a", "b"])
+        before = mcp_manager._locate_key(self.TEXT, "mcpServers")
+        self.assertEqual(text[:found["start"]], self.TEXT[:before["start"]])
+        self.assertEqual(text[found["end"]:], self.TEXT[before["end"]:])
+
+class ConcurrentWriteTest(ManagerTestCase):
+    
+    def parallel_adds(self, count):
+        # Slow to start, so every add has loaded the config before any saves
+        slow = self.scratch / "slow-stub.py"
+        slow.write_text("import runpy, sys, time\n"
+                        "time.sleep(1)\n"
+                        f"sys.argv = [{str(STUB)!r}]\n"
+                        "runpy.run_path(sys.argv[0], run_name='__main__')\n")
+        def add(i):
+            # A home each, so no add finds the section in another's parse cache
+            env = dict(self.env, MCP_MANAGER_HOME=str(self.scratch / f"home-{i}"))
+            return self.manager("add", f"s{i}", "--command", sys.executable,
+                                "--args", str(slow), "-y", env=env)
+        with ThreadPoolExecutor(count) as pool:
+            for result in pool.map(add, range(count)):
+                self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        return json.loads(self.config.read_text())
+    
+    def test_parallel_adds_pretty_config(self):
+        self.config.write_text(json.dumps({"x": 1, "mcpServers": {}}, indent=2))
+        config = self.parallel_adds(10)
+        self.assertEqual(sorted(config["mcpServers"]), sorted(f"s{i}" for i in range(10)))
+        self.assertEqual(config["x"], 1)
+    
+    def test_parallel_adds_compact_config(self):
+        # Not pretty-printed, so the whole document is loaded and rewritten
+        self.config.write_text('{"x":1,"mcpServers":{}}')
+        config = self.parallel_adds(10)
+        self.assertEqual(sorted(config["mcpServers"]), sorted(f"s{i}" for i in range(10)))
+        self.assertEqual(config["x"], 1)
+
+class BackupStoreTest(unittest.TestCase):
+    
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory(prefix="mcp-backups-test-")
+        self.addCleanup(scratch.cleanup)
+        self.store = mcp_manager.BackupStore(Path(scratch.name))
+    
+    def test_reused_object_survives_collection(self):
+        digest = self.store._put("{}")
+        path = self.store._object_path(digest)
+        # Old and unreferenced, as after retention dropped its snapshot
+        os.utime(path, (time.time() - 3600,) * 2)
+        self.assertEqual(self.store._put("{}"), digest)
+        self.store.collect_garbage(force=True)
+        self.assertTrue(path.exists())
+    
+    def objects(self):
+        return set((self.store.root / "objects").glob("*/*"))
+    
+    def test_snapshots_share_objects(self):
+        config = Path("claude.json")
+        servers = {name: {"command": name} for name in "abc"}
+        text = json.dumps({"x": 1, "mcpServers": servers}, indent=2)
+        first = self.store.snapshot(config, text)
+        stored = self.objects()
+        self.assertEqual(self.store.snapshot(config, text), first)
+        self.assertEqual(len(self.store.snapshots(config)), 1)
+        
+        servers["b"]["args"] = ["--verbose"]
+        second = self.store.snapshot(config, json.dumps({"x": 1, "mcpServers": servers}, indent=2))
+        self.assertNotEqual(second, first)
+        # Only the changed entry is new; the frame and other entries are shared
+        self.assertEqual(len(self.objects() - stored), 1)
+    
+    def test_restore_is_byte_exact(self):
+        servers = {"a": {"command": "a", "args": ["1"]}, "b": {"command": "b"}}
+        texts = {
+            "pretty": json.dumps({"x": 1, "mcpServers": servers}, indent=2) + "\n",
+            "compact": json.dumps({"x": 1, "mcpServers": servers}, separators=(",", ":")),
+            "custom": '{\n  "mcpServers": {"a": {"command": "a", "args": ["1"]},\n'
+                      '                 "b": {"command": "b"}},\n  "x": 1\n}\n',
+            "no servers": '{"x": 1}',
+        }
+        for kind, text in texts.items():
+            with self.subTest(kind):
+                config = Path(f"{kind}.json")
+                entry = self.store.find(self.store.snapshot(config, text), config)
+                self.assertEqual(self.store.restore_text(entry), text)
+        # Sections written the way mcp-manager writes them need no raw copy
+        self.assertNotIn("raw", self.store.snapshots(Path("pretty.json"))[0])
+        self.assertIn("raw", self.store.snapshots(Path("custom.json"))[0])
+    
+    def test_retention(self):
+        stamps = ["2026-01-01T09:00:00", "2026-01-01T10:00:00", "2026-01-01T11:00:00",
+                  "2026-01-02T09:00:00", "2026-01-03T09:00:00", "2026-01-03T10:00:00"]
+        entries = [{"id": stamp, "timestamp": stamp} for stamp in stamps]
+        def kept(keep_last, keep_daily):
+            return [entry["id"] for entry in self.store._retain(entries, keep_last, keep_daily)]
+        # The newest two, plus the newest of each of the last two days
+        self.assertEqual(kept(2, 2), stamps[3:])
+        self.assertEqual(kept(2, 3), [stamps[2]] + stamps[3:])
+        self.assertEqual(kept(0, 1), stamps[5:])
+
+class TraceRingTest(unittest.TestCase):
+    
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory(prefix="mcp-trace-test-")
+        self.addCleanup(scratch.cleanup)
+        self.path = Path(scratch.name) / "s.ring"
+    
+    def ring(self, **kwargs):
+        ring = mcp_manager.TraceRing(self.path, **kwargs)
+        self.addCleanup(ring.close)
+        return ring
+    
+    def test_wraparound_keeps_newest_in_order(self):
+        ring = self.ring(capacity=3)
+        size = self.path.stat().st_size
+        for i in range(5):
+            ring.append(float(i), 0.5, 10, 20, 0, "tools/call", f"tool{i}")
+        self.assertEqual(ring.written, 5)
+        self.assertEqual([record["tool"] for record in ring.records()], ["tool2", "tool3", "tool4"])
+        self.assertEqual([record["start"] for record in ring.records()], [2.0, 3.0, 4.0])
+        self.assertEqual(self.path.stat().st_size, size)
+    
+    def test_record_fields(self):
+        ring = self.ring(capacity=2)
+        ring.append(1.0, -1, 5, 0, ring.UNANSWERED | ring.ERROR, "m" * 60)
+        record, = ring.records()
+        self.assertIsNone(record["latency"])
+        self.assertTrue(record["unanswered"] and record["error"])
+        self.assertFalse(record["notification"])
+        self.assertEqual(record["method"], "m" * 48)
+    
+    def test_reopen_and_reset(self):
+        self.ring(capacity=2).append(1.0, 0.1, 1, 1, 0, "ping")
+        # An existing ring keeps its capacity and records
+        reopened = self.ring(capacity=8)
+        self.assertEqual((reopened.capacity, reopened.written), (2, 1))
+        self.assertEqual(self.ring(capacity=8, reset=True).records(), [])
+
+class RegistryIndexTest(ManagerTestCase):
+    
+    def test_parallel_first_runs(self):
+        # All of them find the index empty and race to build it
+        self.config.write_text(json.dumps({"mcpServers": {}}, indent=2))
+        with ThreadPoolExecutor(8) as pool:
+            for result in pool.map(lambda _: self.manager("registry", "search", "browser"), range(8)):
+                self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+                self.assertNotIn("Traceback", result.stderr)
+        db = sqlite3.connect(str(self.scratch / "home" / "registry-index.sqlite"))
+        self.addCleanup(db.close)
+        self.assertEqual(db.execute("SELECT COUNT(*) FROM sources").fetchone()[0], 1)
+
+class DaemonSaveTest(unittest.TestCase):
+    
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory(prefix="mcp-daemon-test-")
+        self.addCleanup(scratch.cleanup)
+        self.config = Path(scratch.name) / "claude.json"
+        self.config.write_text(json.dumps({"mcpServers": {"a": {"command": "a"}}}, indent=2))
+        self.daemon = mcp_manager.ManagerDaemon(mcp_manager.MCPManager(config_path=self.config))
+    
+    def call(self, method, **params):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.daemon.handle({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+    
+    def test_failed_write_is_an_error_and_rolled_back(self):
+        before = self.config.read_text()
+        with mock.patch.object(mcp_manager, "_atomic_write", side_effect=OSError("disk full")):
+            reply = self.call("add", name="b", entry={"command": "b"})
+        self.assertEqual(reply["error"]["code"], -32000)
+        self.assertIn("disk full", reply["error"]["message"])
+        self.assertEqual(list(self.daemon.manager.servers), ["a"])
+        self.assertEqual(self.config.read_text(), before)
+    
+    def test_lock_timeout_is_an_error_and_rolled_back(self):
+        with mock.patch.object(mcp_manager, "_file_lock", side_effect=TimeoutError("could not lock")):
+            reply = self.call("remove", name="a")
+        self.assertIn("could not lock", reply["error"]["message"])
+        self.assertEqual(list(self.daemon.manager.servers), ["a"])
+        # The daemon keeps working afterwards
+        self.assertIn("result", self.call("add", name="b", entry={"command": "b"}))
+        self.assertEqual(sorted(json.loads(self.config.read_text())["mcpServers"]), ["a", "b"])
+
+@unittest.skipUnless(os.name == "posix", "process groups are POSIX only")
+class ReapGroupTest(unittest.TestCase):
+    
+    def assertGroupGone(self, pid):
+        # Zombies may linger until init reaps them; they are not running
+        self.assertFalse(mcp_manager._group_members(pid))
+        self.assertNotIn(pid, mcp_manager._LIVE_GROUPS)
+    
+    def test_clean_exit(self):
+        completed, cleanup = mcp_manager._run_isolated(["sh", "-c", "echo done"], timeout=10)
+        self.assertEqual(completed.stdout, "done\n")
+        self.assertEqual(cleanup, {"stray": 0, "signal": None, "leftover": []})
+    
+    def test_stray_child_is_stopped(self):
+        completed, cleanup = mcp_manager._run_isolated(
+            ["sh", "-c", "sleep 30 >/dev/null 2>&1 & echo done"], timeout=10)
+        self.assertEqual(completed.returncode, 0)
+        self.assertEqual(cleanup, {"stray": 1, "signal": "SIGTERM", "leftover": []})
+    
+    def test_timeout_stops_the_group(self):
+        completed, cleanup = mcp_manager._run_isolated(["sh", "-c", "sleep 30 & sleep 30"],
+                                                       timeout=0.5)
+        self.assertIsNone(completed)
+        self.assertGreater(cleanup["stray"], 0)
+        self.assertEqual(cleanup["leftover"], [])
+    
+    def test_term_ignored_escalates_to_kill(self):
+        proc = mcp_manager._spawn(["sh", "-c", "trap '' TERM; sleep 30 & wait"])
+        time.sleep(0.2)
+        cleanup = mcp_manager._reap_group(proc, 0.2)
+        self.assertEqual((cleanup["signal"], cleanup["leftover"]), ("SIGKILL", []))
+        self.assertGroupGone(proc.pid)
+
+class ReplayAccountingTest(unittest.TestCase):
+    
+    SCRIPT = [{"method": "tools/list", "params": {}, "notify": False}] * 3
+    
+    def replay(self, *stub_args, timeout=1):
+        server = {"command": sys.executable, "args": [str(STUB), *stub_args]}
+        return mcp_manager._replay("stub", server, self.SCRIPT, concurrency=3, timeout=timeout)
+    
+    def test_answered(self):
+        result = self.replay()
+        self.assertEqual((result["sent"], result["completed"], result["errors"], result["timeouts"]),
+                         (3, 3, 0, 0))
+        self.assertEqual(result["error_rate"], 0)
+    
+    def test_slow_responses_count_once_as_timeouts(self):
+        result = self.replay("--call-delay", "5")
+        self.assertEqual((result["sent"], result["completed"], result["errors"], result["timeouts"]),
+                         (3, 0, 3, 3))
+        self.assertEqual(result["error_rate"], 100)
+        self.assertEqual(result["methods"], {})
+        # Waiting out the timeouts is not part of the measured run
+        self.assertLess(result["wall"], 1)
+        self.assertEqual(result["throughput"], 0)
+    
+    def test_hung_server(self):
+        result = self.replay("--hang")
+        # The handshake itself gets no answer
+        self.assertIsNotNone(result["failure"])
+        self.assertEqual((result["sent"], result["completed"], result["errors"]), (0, 0, 0))
+
+class ServerPoolTest(ManagerTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        server = {"command": sys.executable, "args": [str(STUB), "--call-delay", "0.5"]}
+        self.config.write_text(json.dumps({"mcpServers": {"s": server}}, indent=2))
+        result = self.manager("pool", "enable", "s")
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.socket = self.scratch / "pool.sock"
+        pool = subprocess.Popen([sys.executable, str(MANAGER), "--config", str(self.config),
+                                 "pool", "serve", "--socket", str(self.socket)],
+                                env=self.env, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.addCleanup(pool.wait, 10)
+        self.addCleanup(pool.terminate)
+        deadline = time.monotonic() + 10
+        while not self.socket.exists():
+            self.assertLess(time.monotonic(), deadline, "pool did not start")
+            time.sleep(0.05)
+    
+    def attach(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.settimeout(10)
+        sock.connect(str(self.socket))
+        hello = {"op": "attach", "server": "s", "config": str(self.config), "env": {}}
+        sock.sendall(json.dumps(hello).encode() + b"\n")
+        reader = sock.makefile("rb")
+        self.addCleanup(reader.close)
+        reply = json.loads(reader.readline())
+        self.assertTrue(reply["ok"], reply)
+        return sock, reader, reply["pid"]
+    
+    def test_clients_share_a_process_with_their_own_ids(self):
+        clients = [self.attach() for _ in range(2)]
+        self.assertEqual(clients[0][2], clients[1][2])
+        # Both use id 1 and are in flight at the same time
+        for i, (sock, _, _) in enumerate(clients):
+            request = {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                       "params": {"name": "stub_tool_0", "arguments": {"client": i}}}
+            sock.sendall(json.dumps(request).encode() + b"\n")
+        for i, (_, reader, _) in enumerate(clients):
+            response = json.loads(reader.readline())
+            self.assertEqual(response["id"], 1)
+            self.assertEqual(response["result"]["content"][0]["text"],
+                             f'stub_tool_0: {{"client": {i}}}')
+    
+    def test_initialize_is_answered_by_the_pool(self):
+        sock, reader, _ = self.attach()
+        request = {"jsonrpc": "2.0", "id": "init", "method": "initialize",
+                   "params": {"protocolVersion": "2024-11-05", "capabilities": {},
+                              "clientInfo": {"name": "test", "version": "0"}}}
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        response = json.loads(reader.readline())
+        self.assertEqual(response["id"], "init")
+        self.assertEqual(response["result"]["serverInfo"]["name"], "mcp-stub-server")
+
+class LazyShimTest(ManagerTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        # Notes every start of the real server
+        self.starts = self.scratch / "starts"
+        counting = self.scratch / "counting-stub.py"
+        counting.write_text("import runpy, sys\n"
+                            f"open({str(self.starts)!r}, 'a').write('start\\n')\n"
+                            f"sys.argv = [{str(STUB)!r}]\n"
+                            "runpy.run_path(sys.argv[0], run_name='__main__')\n")
+        server = {"command": sys.executable, "args": [str(counting)]}
+        self.config.write_text(json.dumps({"mcpServers": {"s": server}}, indent=2))
+        result = self.manager("lazy", "on", "s")
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+    
+    def start_count(self):
+        return len(self.starts.read_text().splitlines())
+    
+    def shim(self):
+        entry = json.loads(self.config.read_text())["mcpServers"]["s"]
+        shim = subprocess.Popen([entry["command"], *entry["args"]], env=self.env,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+        self.addCleanup(shim.wait, 10)
+        self.addCleanup(shim.stdout.close)
+        self.addCleanup(shim.stdin.close)
+        return shim
+    
+    def request(self, shim, request_id, method, **params):
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        shim.stdin.write(json.dumps(message).encode() + b"\n")
+        shim.stdin.flush()
+        response = json.loads(shim.stdout.readline())
+        self.assertEqual(response["id"], request_id)
+        return response
+    
+    def test_answers_from_snapshot_then_starts_on_call(self):
+        self.assertEqual(self.start_count(), 1)  # taking the snapshot
+        shim = self.shim()
+        init = self.request(shim, 1, "initialize", protocolVersion="2024-11-05", capabilities={},
+                            clientInfo={"name": "test", "version": "0"})
+        self.assertEqual(init["result"]["serverInfo"]["name"], "mcp-stub-server")
+        tools = self.request(shim, 2, "tools/list")["result"]["tools"]
+        self.assertEqual([tool["name"] for tool in tools],
+                         ["stub_tool_0", "stub_tool_1", "stub_tool_2"])
+        self.assertEqual(self.start_count(), 1)
+        
+        call = self.request(shim, 3, "tools/call", name="stub_tool_1", arguments={"x": 1})
+        self.assertEqual(call["result"]["content"][0]["text"], 'stub_tool_1: {"x": 1}')
+        self.assertEqual(self.start_count(), 2)
+
+class ValidateTest(ManagerTestCase):
+    
+    def validate(self, servers, *args):
+        self.config.write_text(json.dumps({"mcpServers": servers}, indent=2))
+        return self.manager(*args, "validate")
+    
+    def stub(self, **entry):
+        return dict({"command": sys.executable, "args": [str(STUB)]}, **entry)
+    
+    def test_valid(self):
+        self.assertEqual(self.validate({"s": self.stub()}).returncode, 0)
+    
+    def test_errors_exit_1(self):
+        result = self.validate({"s": self.stub(), "t": {"command": "no-such-command-here"}}, "--json")
+        self.assertEqual(result.returncode, 1, result.stdout)
+        report = json.loads(result.stdout)
+        self.assertEqual(report["status"], 1)
+        self.assertEqual([(issue["server"], issue["rule"]) for issue in report["issues"]],
+                         [("t", "command")])
+        result = self.validate({"s": self.stub(args=[str(self.scratch / "missing.py")])}, "--json")
+        self.assertEqual([issue["rule"] for issue in json.loads(result.stdout)["issues"]], ["script"])
+    
+    def test_warnings_exit_2_when_strict(self):
+        servers = {"s": self.stub(env={"API_TOKEN": "literal"})}
+        self.assertEqual(self.validate(servers).returncode, 0)
+        self.assertEqual(self.manager("validate", "--strict").returncode, 2)
+        self.assertEqual(self.manager("validate", "--strict", "--skip", "env").returncode, 0)
+
+class SyncPatchTest(ManagerTestCase):
+    
+    BASE = {"s": {"command": "node", "args": ["server.js", "--port", "1"],
+                  "env": {"LOG_LEVEL": "info"}}}
+    
+    def patch_to(self, theirs):
+        return mcp_manager._json_diff(self.BASE, theirs, ("mcpServers",))
+    
+    def test_diff_round_trip(self):
+        old = {"a/b~c": {"args": ["x", "y"], "env": {"A": "1", "B": "2"}}, "d": {"args": ["x"]}}
+        new = {"a/b~c": {"args": ["x", "z"], "env": {"A": "1"}}, "d": {"args": ["x", "y"]}}
+        patch = mcp_manager._json_diff(old, new)
+        # Changed elements and appended tails are diffed element by element
+        self.assertIn({"op": "replace", "path": "/a~1b~0c/args/1", "value": "z"}, patch)
+        self.assertIn({"op": "add", "path": "/d/args/1", "value": "y"}, patch)
+        document = json.loads(json.dumps(old))
+        for op in patch:
+            if op["op"] != "test":
+                mcp_manager._patch_step(document, op)
+        self.assertEqual(document, new)
+        self.assertFalse(any(op["op"] == "test" for op in mcp_manager._json_diff(old, new, tests=False)))
+    
+    def test_conflicts(self):
+        theirs = json.loads(json.dumps(self.BASE))
+        theirs["s"]["args"][2] = "2"
+        ours = json.loads(json.dumps(self.BASE))
+        ours["s"]["args"][2] = "3"
+        
+        servers = json.loads(json.dumps(ours))
+        result = mcp_manager._apply_servers_patch(servers, json.loads(json.dumps(ours)),
+                                                  self.patch_to(theirs))
+        self.assertEqual(len(result["conflicts"]), 1)
+        self.assertIn("was also changed here", result["conflicts"][0][1])
+        self.assertEqual(servers, ours)
+        
+        result = mcp_manager._apply_servers_patch(servers, json.loads(json.dumps(ours)),
+                                                  self.patch_to(theirs), "theirs")
+        self.assertEqual(len(result["applied"]), 1)
+        self.assertEqual(servers, theirs)
+    
+    def apply(self, strategy):
+        """Apply their args and LOG_LEVEL changes over a local args edit"""
+        ours = json.loads(json.dumps(self.BASE))
+        ours["s"]["args"][2] = "3"
+        self.config.write_text(json.dumps({"mcpServers": ours}, indent=2))
+        theirs = json.loads(json.dumps(self.BASE))
+        theirs["s"]["args"][2] = "2"
+        theirs["s"]["env"]["LOG_LEVEL"] = "debug"
+        patch = self.scratch / "patch.json"
+        patch.write_text(json.dumps(self.patch_to(theirs)))
+        result = self.manager("sync", "apply", str(patch), *(["--strategy", strategy] if strategy else []))
+        return result, json.loads(self.config.read_text())["mcpServers"]["s"]
+    
+    def test_conflict_stops_without_strategy(self):
+        result, entry = self.apply(None)
+        self.assertEqual(result.returncode, 1, result.stdout)
+        self.assertEqual((entry["args"][2], entry["env"]["LOG_LEVEL"]), ("3", "info"))
+    
+    def test_strategy_ours_keeps_whole_entry(self):
+        result, entry = self.apply("ours")
+        self.assertEqual(result.returncode, 0, result.stdout)
+        self.assertEqual((entry["args"][2], entry["env"]["LOG_LEVEL"]), ("3", "info"))
+    
+    def test_strategy_field_takes_other_fields(self):
+        result, entry = self.apply("field")
+        self.assertEqual(result.returncode, 0, result.stdout)
+        self.assertEqual((entry["args"][2], entry["env"]["LOG_LEVEL"]), ("3", "debug"))
+    
+    def test_strategy_theirs(self):
+        result, entry = self.apply("theirs")
+        self.assertEqual(result.returncode, 0, result.stdout)
+        self.assertEqual((entry["args"][2], entry["env"]["LOG_LEVEL"]), ("2", "debug"))
+
+if __name__ == "__main__":
+    unittest.main()